@@ -1,16 +1,22 @@
+import json
+import logging
 from fastapi import FastAPI, Request
 from typing import Optional
 from uvicorn import run as app_run
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from car_price.utils.main_utils import MainUtils
 
+from car_price.components.drift_monitor import DriftMonitor
+from car_price.components.inference_pool import InferencePool, InferencePoolSaturatedError
 from car_price.components.model_predictor import CarPricePredictor, CarData
-from car_price.constant import APP_HOST, APP_PORT
-from car_price.pipeline.train_pipeline import TrainPipeline
+from car_price.components.model_registry import ModelRegistry
+from car_price.components.prediction_batcher import PredictionBatcher, PredictionQueueFullError
+from car_price.constant import APP_HOST, APP_PORT, BATCH_PREDICTION_MAX_ROWS, DRIFT_MONITOR_ENABLED, MICRO_BATCHING_ENABLED
+from car_price.pipeline.train_job import TrainJobConflictError, TrainJobManager
 
 app = FastAPI()
 
@@ -29,6 +35,52 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+inference_pool = InferencePool()
+train_job_manager = TrainJobManager()
+prediction_batcher: Optional[PredictionBatcher] = None
+
+
+@app.on_event("startup")
+def load_model_registry():
+    try:
+        ModelRegistry.get_instance().start()
+
+    except Exception as e:
+        logging.exception(f"Model could not be loaded at startup, it will be loaded on first request: {e}")
+
+
+@app.on_event("startup")
+def start_drift_monitor():
+    if DRIFT_MONITOR_ENABLED:
+        DriftMonitor.get_instance().start()
+
+
+@app.on_event("startup")
+async def start_prediction_batcher():
+    global prediction_batcher
+    if MICRO_BATCHING_ENABLED:
+        prediction_batcher = PredictionBatcher(CarPricePredictor().predict, inference_pool=inference_pool)
+        await prediction_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_prediction_batcher():
+    if prediction_batcher is not None:
+        await prediction_batcher.stop()
+
+
+@app.on_event("shutdown")
+def stop_drift_monitor():
+    if DRIFT_MONITOR_ENABLED:
+        DriftMonitor.get_instance().stop()
+
+
+@app.on_event("shutdown")
+def stop_model_registry():
+    ModelRegistry.get_instance().stop()
+    inference_pool.shutdown()
+
+
 class DataForm:
     def __init__(self, request: Request):
         self.request: Request = request
@@ -57,17 +109,30 @@ class DataForm:
         self.max_power = form.get("max_power")
         self.seats = form.get("seats")
 
-@app.get("/train")
+@app.post("/train")
 async def trainRouteClient():
     try:
-        train_pipeline = TrainPipeline()
+        job_id = train_job_manager.submit()
 
-        train_pipeline.run_pipeline()
+        return JSONResponse(status_code=202, content={"status": True, "job_id": job_id})
 
-        return Response("Training successful !!")
+    except TrainJobConflictError as e:
+        return JSONResponse(status_code=409, content={"status": False, "error": f"{e}", "job_id": e.job_id})
 
     except Exception as e:
-        return Response(f"Error Occurred! {e}")
+        return JSONResponse(status_code=500, content={"status": False, "error": f"{e}"})
+
+@app.get("/train")
+async def trainGetRouteClient():
+    return await trainRouteClient()
+
+@app.get("/train/{job_id}")
+async def trainStatusRouteClient(job_id: str):
+    job_status = train_job_manager.get_status(job_id)
+    if job_status is None:
+        return JSONResponse(status_code=404, content={"status": False, "error": f"Unknown training job {job_id}"})
+
+    return job_status
 
 @app.get("/predict")
 async def predictGetRouteClient(request: Request):
@@ -103,16 +168,80 @@ async def predictRouteClient(request: Request):
                                    )
         
         car_price_df = car_price_data.get_carprice_input_data_frame()
-        car_price_predictor = CarPricePredictor()
-        car_price_value = round(car_price_predictor.predict(X=car_price_df)[0], 2)
+        if prediction_batcher is not None:
+            car_price_value = round(float(await prediction_batcher.predict(car_price_df)), 2)
+        else:
+            car_price_predictor = CarPricePredictor()
+            car_price_value = round(float((await inference_pool.run(car_price_predictor.predict, car_price_df))[0]), 2)
 
         return templates.TemplateResponse(
             "car_price.html",
             {"request": request, "context": car_price_value, "car_list": car_list}
         )
 
+    except (PredictionQueueFullError, InferencePoolSaturatedError) as e:
+        return JSONResponse(status_code=429, content={"status": False, "error": f"{e}"})
+
     except Exception as e:
         return {"status": False, "error": f"{e}"}
 
+def parse_batch_records(body: bytes, content_type: str) -> list:
+    text = body.decode("utf-8").strip()
+    if "ndjson" in content_type or not text.startswith("["):
+        records = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                records.append(None)
+        return records
+    records = json.loads(text)
+    if not isinstance(records, list):
+        raise ValueError("Request body must be a JSON array or NDJSON of car records")
+    return records
+
+@app.post("/v1/predict/batch")
+async def predictBatchRouteClient(request: Request):
+    try:
+        body = await request.body()
+        records = await inference_pool.run(parse_batch_records, body, request.headers.get("content-type", ""))
+        if len(records) > BATCH_PREDICTION_MAX_ROWS:
+            return JSONResponse(status_code=413,
+                                content={"status": False, "error": f"Batch size exceeds {BATCH_PREDICTION_MAX_ROWS} records"})
+
+        car_price_predictor = CarPricePredictor()
+        predictions = await inference_pool.run(car_price_predictor.predict_batch, records)
+
+        return {"status": True, "predictions": predictions}
+
+    except InferencePoolSaturatedError as e:
+        return JSONResponse(status_code=429, content={"status": False, "error": f"{e}"})
+
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"status": False, "error": f"{e}"})
+
+    except Exception as e:
+        # invalid records are reported per record in the predictions, so anything the predictor raises
+        # (a CarException around a missing model, a schema mismatch, ...) is a server fault
+        logging.exception(f"Batch prediction failed: {e}")
+        return JSONResponse(status_code=500, content={"status": False, "error": f"{e}"})
+
+@app.get("/v1/metrics")
+async def metricsRouteClient():
+    metrics = {"model_registry": ModelRegistry.get_instance().get_stats(),
+               "inference_pool": inference_pool.get_stats()}
+    if prediction_batcher is not None:
+        metrics["prediction_batcher"] = prediction_batcher.get_stats()
+    return metrics
+
+@app.get("/v1/drift")
+async def driftRouteClient():
+    if not DRIFT_MONITOR_ENABLED:
+        return JSONResponse(status_code=404, content={"status": False, "error": "Drift monitoring is disabled"})
+
+    return DriftMonitor.get_instance().get_report()
+
 if __name__ == "__main__":
     app_run(app, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
@@ -0,0 +1,377 @@
+import json
+import logging
+import sys
+import threading
+import uuid
+from typing import Dict, List, Mapping, Tuple, Union
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from car_price.exception import CarException
+
+logger = logging.getLogger(__name__)
+
+FeatureMatrix = Union[np.ndarray, sparse.csr_matrix]
+
+PREDICT_CHUNK_ROWS = 8192
+XGB_IDENTITY_OBJECTIVES = ("reg:squarederror", "reg:linear", "reg:absoluteerror", "reg:pseudohubererror")
+
+
+class CategoryTable:
+    """
+    Encoded output rows of one categorical column, with a row for unknown values and one for missing values.
+
+    Values are looked up in a category-to-code dict; a pandas categorical column only looks up its
+    categories once and then indexes by the category codes.
+    """
+
+    def __init__(self, column: str, categories: List, table: np.ndarray, unknown_row: np.ndarray, missing_row: np.ndarray):
+        self.column = column
+        self.categories = np.asarray(categories, dtype=object)
+        self.index = {category: code for code, category in enumerate(categories)}
+        self.unknown_code = len(categories)
+        self.missing_code = len(categories) + 1
+        self.table = np.vstack([table, unknown_row, missing_row]).astype(np.float64)
+
+
+    def _encode_values(self, values: np.ndarray) -> np.ndarray:
+        index, unknown_code, missing_code = self.index, self.unknown_code, self.missing_code
+        codes = [index.get(value, -1) for value in values]
+        has_misses = -1 in codes
+        codes = np.fromiter(codes, dtype=np.intp, count=len(codes))
+        if has_misses:
+            # pd.isna rather than value != value, which raises on pd.NA, and only for the values not in the index
+            for i in np.flatnonzero(codes < 0):
+                value = values[i]
+                codes[i] = missing_code if value is None or (pd.api.types.is_scalar(value) and pd.isna(value)) else unknown_code
+        return codes
+
+
+    def encode(self, values) -> np.ndarray:
+        categorical = getattr(values, "cat", None)
+        if categorical is not None:
+            category_codes = np.append(self._encode_values(np.asarray(categorical.categories, dtype=object)), self.missing_code)
+            return category_codes[np.asarray(categorical.codes, dtype=np.intp)]
+        return self._encode_values(np.asarray(values, dtype=object))
+
+
+def _compile_onehot_encoder(encoder: object, columns: List[str]) -> List[CategoryTable]:
+    if getattr(encoder, "drop_idx_", None) is not None or getattr(encoder, "_infrequent_enabled", False):
+        raise NotImplementedError("OneHotEncoder with drop or infrequent categories is not supported")
+    tables = []
+    for column, categories in zip(columns, encoder.categories_):
+        categories = list(categories)
+        width = len(categories)
+        missing_row = np.zeros(width)
+        known = [c for c in categories if not pd.isna(c)]
+        if len(known) != width:
+            missing_row[categories.index(next(c for c in categories if pd.isna(c)))] = 1.0
+        table = np.eye(width)[[categories.index(c) for c in known]]
+        tables.append(CategoryTable(column, known, table, np.zeros(width), missing_row))
+    return tables
+
+
+def _compile_probed_encoder(encoder: object, columns: List[str]) -> List[CategoryTable]:
+    """Builds the tables of a category_encoders encoder by transforming every known category once."""
+    mappings = {mapping["col"]: mapping["mapping"] for mapping in encoder.ordinal_encoder.mapping}
+    known = {column: [c for c in mappings[column].index if not pd.isna(c)] for column in columns}
+    unknown_value = f"__unknown_{uuid.uuid4().hex}__"
+    tables = []
+    for column in columns:
+        probe_values = known[column] + [unknown_value, np.nan]
+        probe = pd.DataFrame({other: [known[other][0]] * len(probe_values) for other in columns})
+        probe[column] = probe_values
+        encoded = encoder.transform(probe)
+        output_columns = [name for name in encoded.columns if str(name).rsplit("_", 1)[0] == column]
+        encoded = encoded[output_columns].to_numpy(dtype=np.float64)
+        tables.append(CategoryTable(column, known[column], encoded[:-2], encoded[-2], encoded[-1]))
+    return tables
+
+
+def _compile_numeric_steps(transformer: object, n_columns: int) -> Tuple[List[float], List[float], List[float], List[float]]:
+    """Folds OutlierCapper and StandardScaler steps, alone or in a Pipeline, into clip limits and a mean/scale pair."""
+    lower, upper = [-np.inf] * n_columns, [np.inf] * n_columns
+    mean, scale = [0.0] * n_columns, [1.0] * n_columns
+    steps = [step for _, step in transformer.steps] if type(transformer).__name__ == "Pipeline" else [transformer]
+    for position, step in enumerate(steps):
+        step_name = type(step).__name__ if step != "passthrough" else "passthrough"
+        if step_name == "OutlierCapper" and position == 0:
+            lower, upper = list(step.lower_), list(step.upper_)
+        elif step_name == "StandardScaler" and position == len(steps) - 1:
+            mean = list(step.mean_) if step.with_mean else mean
+            scale = list(step.scale_) if step.with_std else scale
+        elif step_name != "passthrough":
+            raise NotImplementedError(f"{step_name} in the numeric pipeline cannot be compiled")
+    return lower, upper, mean, scale
+
+
+def _pack_trees(trees: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenates per-tree node arrays; leaves point to themselves so traversal can run a fixed number of steps."""
+    offsets = np.cumsum([0] + [len(tree["feature"]) for tree in trees])
+    packed = {key: np.concatenate([tree[key] for tree in trees]) for key in ("feature", "threshold", "default_left", "value")}
+    left, right, depth = [], [], 0
+    for offset, tree in zip(offsets, trees):
+        is_leaf = tree["left"] < 0
+        nodes = np.arange(len(is_leaf))
+        left.append(np.where(is_leaf, nodes, tree["left"]) + offset)
+        right.append(np.where(is_leaf, nodes, tree["right"]) + offset)
+        node_depth = np.zeros(len(is_leaf), dtype=np.intp)
+        for node in nodes:
+            if not is_leaf[node]:
+                node_depth[tree["left"][node]] = node_depth[tree["right"][node]] = node_depth[node] + 1
+        depth = max(depth, int(node_depth.max()))
+    packed["feature"] = np.where(np.concatenate([tree["left"] for tree in trees]) < 0, 0, packed["feature"]).astype(np.intp)
+    packed.update(left=np.concatenate(left).astype(np.intp), right=np.concatenate(right).astype(np.intp),
+                  roots=offsets[:-1].astype(np.intp), max_depth=depth)
+    return packed
+
+
+def _compile_sklearn_trees(model: object) -> Tuple[Dict, float, float, bool]:
+    name = type(model).__name__
+    if name in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        estimators, offset, scale = model.estimators_, 0.0, 1.0 / len(model.estimators_)
+    elif name == "DecisionTreeRegressor":
+        estimators, offset, scale = [model], 0.0, 1.0
+    elif name == "GradientBoostingRegressor":
+        if model.init_ == "zero":
+            offset = 0.0
+        elif type(model.init_).__name__ == "DummyRegressor":
+            offset = float(np.ravel(model.init_.constant_)[0])
+        else:
+            raise NotImplementedError("GradientBoostingRegressor with a custom init estimator is not supported")
+        estimators, scale = model.estimators_[:, 0], model.learning_rate
+    else:
+        raise NotImplementedError(f"{name} cannot be compiled")
+    trees = []
+    for estimator in estimators:
+        tree = estimator.tree_
+        missing_left = getattr(tree, "missing_go_to_left", None)
+        trees.append({
+            "feature": tree.feature, "threshold": tree.threshold.astype(np.float64),
+            "left": tree.children_left, "right": tree.children_right,
+            "default_left": np.zeros(tree.node_count, dtype=bool) if missing_left is None else missing_left.astype(bool),
+            "value": tree.value[:, 0, 0].astype(np.float64),
+        })
+    return _pack_trees(trees), offset, scale, True
+
+
+def _compile_xgboost_trees(model: object) -> Tuple[Dict, float, float, bool]:
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw(raw_format="json"))["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in XGB_IDENTITY_OBJECTIVES:
+        raise NotImplementedError(f"XGBoost objective {objective} cannot be compiled")
+    if learner["gradient_booster"]["name"] != "gbtree":
+        raise NotImplementedError(f"XGBoost booster {learner['gradient_booster']['name']} cannot be compiled")
+    gbtree = learner["gradient_booster"]["model"]
+    trees_per_round = int(gbtree["gbtree_model_param"].get("num_parallel_tree", 1))
+    best_iteration = booster.attr("best_iteration")
+    n_trees = len(gbtree["trees"]) if best_iteration is None else (int(best_iteration) + 1) * trees_per_round
+    trees = []
+    for tree in gbtree["trees"][:n_trees]:
+        if tree.get("categories_nodes"):
+            raise NotImplementedError("XGBoost categorical splits cannot be compiled")
+        left = np.asarray(tree["left_children"], dtype=np.intp)
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32).astype(np.float64)
+        trees.append({
+            "feature": np.asarray(tree["split_indices"], dtype=np.intp), "threshold": conditions,
+            "left": left, "right": np.asarray(tree["right_children"], dtype=np.intp),
+            "default_left": np.asarray(tree["default_left"], dtype=bool),
+            "value": np.where(left < 0, conditions, 0.0),
+        })
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    return _pack_trees(trees), base_score, 1.0, False
+
+
+class CompiledPreprocessor:
+    """
+    NumPy lookup-table version of the fitted ColumnTransformer.
+
+    Categorical columns become CategoryTables of their encoded rows and numeric columns
+    capping limits plus a mean/scale pair, filled into one dense float64 matrix in the ColumnTransformer's column
+    order. Values never seen in training take the explicit unknown row, are counted per
+    column in unknown_counts and logged.
+    """
+
+    def __init__(self, category_tables: List[Tuple[CategoryTable, slice]], numeric_columns: List[str],
+                    numeric_slice: np.ndarray, numeric_lower: np.ndarray, numeric_upper: np.ndarray,
+                    numeric_mean: np.ndarray, numeric_scale: np.ndarray, n_features: int, sparse_output: bool = False):
+        self.category_tables = category_tables
+        self.numeric_columns = numeric_columns
+        self.numeric_slice = numeric_slice
+        self.numeric_lower = numeric_lower
+        self.numeric_upper = numeric_upper
+        self.numeric_mean = numeric_mean
+        self.numeric_scale = numeric_scale
+        self.n_features = n_features
+        self.sparse_output = sparse_output
+        self.unknown_counts = {table.column: 0 for table, _ in category_tables}
+        self._lock = threading.Lock()
+
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+    @classmethod
+    def from_fitted(cls, preprocessing_object: object) -> "CompiledPreprocessor":
+        logger.info("Entered from_fitted method of CompiledPreprocessor class")
+        try:
+            category_tables, numeric_columns, numeric_positions = [], [], []
+            numeric_lower, numeric_upper, numeric_mean, numeric_scale = [], [], [], []
+            for name, transformer, columns in preprocessing_object.transformers_:
+                if transformer == "drop" or len(columns) == 0:
+                    continue
+                output = preprocessing_object.output_indices_[name]
+                transformer_name = type(transformer).__name__ if transformer != "passthrough" else "passthrough"
+                if transformer_name in ("OneHotEncoder", "BinaryEncoder", "BaseNEncoder"):
+                    tables = (_compile_onehot_encoder(transformer, columns) if transformer_name == "OneHotEncoder"
+                              else _compile_probed_encoder(transformer, columns))
+                    start = output.start
+                    for table in tables:
+                        width = table.table.shape[1]
+                        category_tables.append((table, slice(start, start + width)))
+                        start += width
+                elif transformer_name in ("Pipeline", "OutlierCapper", "StandardScaler", "passthrough"):
+                    numeric_columns += list(columns)
+                    numeric_positions += list(range(output.start, output.stop))
+                    lower, upper, mean, scale = _compile_numeric_steps(transformer, len(columns))
+                    numeric_lower += lower
+                    numeric_upper += upper
+                    numeric_mean += mean
+                    numeric_scale += scale
+                else:
+                    raise NotImplementedError(f"{transformer_name} in the preprocessor cannot be compiled")
+
+            n_features = max(output.stop for output in preprocessing_object.output_indices_.values())
+            compiled_preprocessor = cls(category_tables, numeric_columns, np.asarray(numeric_positions, dtype=np.intp),
+                                        np.asarray(numeric_lower, dtype=np.float64), np.asarray(numeric_upper, dtype=np.float64),
+                                        np.asarray(numeric_mean, dtype=np.float64), np.asarray(numeric_scale, dtype=np.float64),
+                                        n_features, sparse_output=bool(getattr(preprocessing_object, "sparse_output_", False)))
+            logger.info(f"Compiled {len(category_tables)} category tables and {len(numeric_columns)} numeric columns "
+                        f"into {n_features} features")
+            logger.info("Exited from_fitted method of CompiledPreprocessor class")
+            return compiled_preprocessor
+
+        except NotImplementedError:
+            raise
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def transform(self, X: Mapping) -> np.ndarray:
+        n_rows = len(X[self.numeric_columns[0]] if self.numeric_columns else X[self.category_tables[0][0].column])
+        features = np.zeros((n_rows, self.n_features), dtype=np.float64)
+        for table, output in self.category_tables:
+            codes = table.encode(X[table.column])
+            unknown = codes == table.unknown_code
+            if unknown.any():
+                n_unknown = int(np.count_nonzero(unknown))
+                with self._lock:
+                    self.unknown_counts[table.column] += n_unknown
+                logger.warning(f"{n_unknown} {table.column} value(s) unseen in training, "
+                               f"e.g. {np.asarray(X[table.column], dtype=object)[unknown.argmax()]!r}, encoded as unknown")
+            features[:, output] = table.table[codes]
+        if self.numeric_columns:
+            numeric = np.column_stack([np.asarray(X[column], dtype=np.float64) for column in self.numeric_columns])
+            numeric = np.clip(numeric, self.numeric_lower, self.numeric_upper)
+            features[:, self.numeric_slice] = (numeric - self.numeric_mean) / self.numeric_scale
+        return features
+
+
+    def to_model_input(self, features: np.ndarray) -> FeatureMatrix:
+        """Returns transformed features in the layout the original preprocessor handed to the model."""
+        return sparse.csr_matrix(features) if self.sparse_output else features
+
+
+    def get_unknown_counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.unknown_counts)
+
+
+class CompiledTreeEnsemble:
+    """
+    NumPy-only scorer compiled from a fitted tree ensemble.
+
+    Every tree becomes a set of flat node arrays walked for all rows at once. Predictions match
+    the model's own predict up to float rounding of the leaf sum.
+    """
+
+    def __init__(self, trees: Dict, offset: float, scale: float, inclusive_split: bool, missing_value: float = np.nan,
+                    zero_as_missing: bool = False):
+        self.trees = trees
+        self.offset = offset
+        self.scale = scale
+        self.inclusive_split = inclusive_split
+        self.missing_value = missing_value
+        self.zero_as_missing = zero_as_missing
+
+
+    @classmethod
+    def from_fitted(cls, trained_model_object: object, sparse_input: bool = False) -> "CompiledTreeEnsemble":
+        logger.info("Entered from_fitted method of CompiledTreeEnsemble class")
+        try:
+            model_name = type(trained_model_object).__name__
+            if model_name.startswith("XGB"):
+                trees, offset, scale, inclusive_split = _compile_xgboost_trees(trained_model_object)
+                missing_value = trained_model_object.get_params().get("missing", np.nan)
+                # XGBoost treats the zeros left out of a sparse matrix as missing values
+                zero_as_missing = sparse_input
+            else:
+                trees, offset, scale, inclusive_split = _compile_sklearn_trees(trained_model_object)
+                missing_value, zero_as_missing = np.nan, False
+
+            compiled_trees = cls(trees, offset, scale, inclusive_split,
+                                 missing_value=np.nan if missing_value is None else float(missing_value),
+                                 zero_as_missing=zero_as_missing)
+            logger.info(f"Compiled {len(trees['roots'])} trees of depth <= {trees['max_depth']} from {model_name}")
+            logger.info("Exited from_fitted method of CompiledTreeEnsemble class")
+            return compiled_trees
+
+        except NotImplementedError:
+            raise
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def predict(self, features: FeatureMatrix) -> np.ndarray:
+        trees = self.trees
+        features = features.toarray() if sparse.issparse(features) else features
+        features = np.asarray(features, dtype=np.float32)
+        preds = np.empty(features.shape[0], dtype=np.float64)
+        for start in range(0, features.shape[0], PREDICT_CHUNK_ROWS):
+            chunk = features[start:start + PREDICT_CHUNK_ROWS]
+            rows = np.arange(chunk.shape[0])[:, None]
+            node = np.broadcast_to(trees["roots"], (chunk.shape[0], len(trees["roots"])))
+            for _ in range(trees["max_depth"]):
+                x = chunk[rows, trees["feature"][node]].astype(np.float64)
+                threshold = trees["threshold"][node]
+                go_left = x <= threshold if self.inclusive_split else x < threshold
+                missing = np.isnan(x)
+                if not np.isnan(self.missing_value):
+                    missing |= x == self.missing_value
+                if self.zero_as_missing:
+                    missing |= x == 0
+                go_left = np.where(missing, trees["default_left"][node], go_left)
+                node = np.where(go_left, trees["left"][node], trees["right"][node])
+            preds[start:start + PREDICT_CHUNK_ROWS] = trees["value"][node].sum(axis=1)
+        return self.offset + self.scale * preds
+
+
+def check_parity(expected: FeatureMatrix, actual: FeatureMatrix, rtol: float) -> float:
+    """Returns the largest difference relative to the scale of expected, raising ValueError when it exceeds rtol."""
+    expected = expected.toarray() if sparse.issparse(expected) else expected
+    expected, actual = np.asarray(expected, dtype=np.float64), np.asarray(actual, dtype=np.float64)
+    error = float(np.max(np.abs(actual - expected)) / max(float(np.max(np.abs(expected))), 1.0)) if len(expected) else 0.0
+    if error > rtol:
+        raise ValueError(f"Compiled output differs from the fitted object by {error:.3g} relative, more than {rtol:.3g}")
+    return error
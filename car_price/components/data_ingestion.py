@@ -1,14 +1,23 @@
 import sys
 import os
+import glob
+import shutil
 import logging
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import yaml
+from bson import ObjectId
 from pandas import DataFrame
 from sklearn.model_selection import train_test_split
-from typing import Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from car_price.exception import CarException
 from car_price.configuration.mongo_operations import MongoDBOperation
 from car_price.entity.config_entity import DataIngestionConfig
 from car_price.entity.artifacts_entity import DataIngestionArtifacts
-from car_price.constant import TEST_SIZE
+from car_price.constant import TEST_SIZE, RANDOM_STATE, SNAPSHOT_MAX_PARTS
+from car_price.utils.main_utils import DataFrameArtifactWriter
+from car_price.utils.data_profiler import DataProfiler
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +33,8 @@ class DataIngestion:
         try:
             logger.info("Getting the dataframe from mongodb")
             df = self.mongo_op.get_collection_as_dataframe(
-                self.data_ingestion_config.DB_NAME, self.data_ingestion_config.COLLECTION_NAME
+                self.data_ingestion_config.DB_NAME, self.data_ingestion_config.COLLECTION_NAME,
+                projection=self.mongo_op.get_projection(self.data_ingestion_config.DROP_COLS)
             )
             logger.info("Got the dataframe from mongodb")
             logger.info(
@@ -36,21 +46,208 @@ class DataIngestion:
             raise CarException(e, sys) from e
 
 
+    def get_data_chunks_from_mongodb(self, query: Dict = None, extra_dtypes: Dict[str, str] = None) -> Iterator[DataFrame]:
+        logger.info("Entered get_data_chunks_from_mongodb method of Data_Ingestion class")
+        try:
+            logger.info("Streaming the collection from mongodb in chunks")
+            extra_dtypes = extra_dtypes or {}
+            return self.mongo_op.get_collection_as_dataframe_chunks(
+                self.data_ingestion_config.DB_NAME, self.data_ingestion_config.COLLECTION_NAME,
+                dtypes={**self.data_ingestion_config.SCHEMA_DTYPES, **extra_dtypes},
+                projection=self.mongo_op.get_projection(self.data_ingestion_config.DROP_COLS, include_id="_id" in extra_dtypes),
+                batch_size=self.data_ingestion_config.MONGO_CURSOR_BATCH_SIZE,
+                chunk_size=self.data_ingestion_config.INGESTION_CHUNK_SIZE,
+                query=query,
+            )
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def split_data_chunks_as_train_test(self, chunks: Iterable[DataFrame]) -> Tuple[int, int]:
+        logger.info(
+            "Entered split_data_chunks_as_train_test method of Data_Ingestion class"
+        )
+        try:
+            os.makedirs(self.data_ingestion_config.TRAIN_DATA_ARTIFACT_FILE_DIR, exist_ok=True)
+            os.makedirs(self.data_ingestion_config.TEST_DATA_ARTIFACT_FILE_DIR, exist_ok=True)
+            rng = np.random.default_rng(RANDOM_STATE)
+            train_profiler, test_profiler = DataProfiler(), DataProfiler()
+            schema_config = self.data_ingestion_config.SCHEMA_CONFIG
+            with DataFrameArtifactWriter(self.data_ingestion_config.TRAIN_DATA_FILE_PATH, schema_config) as train_writer, \
+                    DataFrameArtifactWriter(self.data_ingestion_config.TEST_DATA_FILE_PATH, schema_config) as test_writer:
+                for chunk in chunks:
+                    is_test = rng.random(len(chunk)) < TEST_SIZE
+                    train_writer.write(chunk[~is_test])
+                    test_writer.write(chunk[is_test])
+                    train_profiler.update(chunk[~is_test])
+                    test_profiler.update(chunk[is_test])
+                    logger.info(f"Wrote chunk of {len(chunk)} rows, {train_writer.n_rows} train and {test_writer.n_rows} test rows so far")
+            n_train, n_test = train_writer.n_rows, test_writer.n_rows
+            if n_train == 0:
+                raise ValueError(f"The train data {self.data_ingestion_config.TRAIN_DATA_FILE_PATH} is empty, no rows were fetched from "
+                                 f"{self.data_ingestion_config.DB_NAME}.{self.data_ingestion_config.COLLECTION_NAME}")
+            self.save_data_profile(train_profiler.to_dict(), self.data_ingestion_config.TRAIN_PROFILE_FILE_PATH)
+            self.save_data_profile(test_profiler.to_dict(), self.data_ingestion_config.TEST_PROFILE_FILE_PATH)
+            logger.info(
+                "Exited split_data_chunks_as_train_test method of Data_Ingestion class"
+            )
+            return n_train, n_test
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def save_data_profile(self, profile: Dict, profile_file_path: str) -> None:
+        logger.info("Entered save_data_profile method of Data_Ingestion class")
+        try:
+            self.data_ingestion_config.UTILS.write_json_to_yaml_file(profile, profile_file_path)
+            logger.info(f"Saved the profile of {profile['n_rows']} rows to {os.path.basename(profile_file_path)}")
+            logger.info("Exited save_data_profile method of Data_Ingestion class")
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def read_watermark(self) -> Optional[object]:
+        logger.info("Entered read_watermark method of Data_Ingestion class")
+        try:
+            watermark_file_path = self.data_ingestion_config.WATERMARK_FILE_PATH
+            watermark_field = self.data_ingestion_config.WATERMARK_FIELD
+            if not os.path.exists(watermark_file_path):
+                logger.info("No watermark found, building the snapshot from scratch")
+                return None
+            watermark = self.data_ingestion_config.UTILS.read_yaml_file(watermark_file_path)
+            if watermark["field"] != watermark_field:
+                logger.info(f"Watermark field changed from {watermark['field']} to {watermark_field}, rebuilding the snapshot")
+                shutil.rmtree(self.data_ingestion_config.SNAPSHOT_DATA_DIR, ignore_errors=True)
+                return None
+            if not self.get_snapshot_part_files():
+                logger.info("Watermark found without snapshot parts, rebuilding the snapshot")
+                return None
+            logger.info(f"Read watermark {watermark}")
+            logger.info("Exited read_watermark method of Data_Ingestion class")
+            return ObjectId(watermark["value"]) if watermark_field == "_id" else watermark["value"]
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def write_watermark(self, value: object) -> None:
+        logger.info("Entered write_watermark method of Data_Ingestion class")
+        try:
+            watermark_file_path = self.data_ingestion_config.WATERMARK_FILE_PATH
+            if isinstance(value, pd.Timestamp):
+                value = value.to_pydatetime()
+            watermark = {"field": self.data_ingestion_config.WATERMARK_FIELD,
+                         "value": str(value) if isinstance(value, (str, ObjectId)) else value}
+            tmp_file_path = watermark_file_path + ".tmp"
+            with open(tmp_file_path, "w") as watermark_file:
+                yaml.safe_dump(watermark, watermark_file)
+            os.replace(tmp_file_path, watermark_file_path)
+            logger.info(f"Wrote watermark {watermark}")
+            logger.info("Exited write_watermark method of Data_Ingestion class")
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def append_chunks_to_snapshot(self, chunks: Iterable[DataFrame]) -> Tuple[int, Optional[object]]:
+        logger.info("Entered append_chunks_to_snapshot method of Data_Ingestion class")
+        try:
+            snapshot_data_dir = self.data_ingestion_config.SNAPSHOT_DATA_DIR
+            watermark_field = self.data_ingestion_config.WATERMARK_FIELD
+            os.makedirs(snapshot_data_dir, exist_ok=True)
+            run_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+            n_rows, watermark = 0, None
+            for part, chunk in enumerate(chunks):
+                chunk["_id"] = chunk["_id"].astype(str)
+                for column in chunk.columns[chunk.dtypes == "category"]:
+                    chunk[column] = chunk[column].astype(object)
+                chunk_watermark = chunk[watermark_field].max()
+                watermark = chunk_watermark if watermark is None else max(watermark, chunk_watermark)
+                chunk.to_parquet(os.path.join(snapshot_data_dir, f"part-{run_id}-{part:05d}.parquet"), index=False)
+                n_rows += len(chunk)
+            logger.info(f"Appended {n_rows} new or updated rows to the snapshot")
+            logger.info("Exited append_chunks_to_snapshot method of Data_Ingestion class")
+            return n_rows, watermark
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_snapshot_part_files(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.data_ingestion_config.SNAPSHOT_DATA_DIR, "part-*.parquet")))
+
+
+    def read_snapshot(self) -> DataFrame:
+        logger.info("Entered read_snapshot method of Data_Ingestion class")
+        try:
+            snapshot_data_dir = self.data_ingestion_config.SNAPSHOT_DATA_DIR
+            part_files = self.get_snapshot_part_files()
+            if not part_files:
+                raise ValueError(f"The snapshot in {snapshot_data_dir} is empty, no rows were fetched from "
+                                 f"{self.data_ingestion_config.DB_NAME}.{self.data_ingestion_config.COLLECTION_NAME}")
+            df = pd.concat([pd.read_parquet(part_file) for part_file in part_files], ignore_index=True)
+            df = df.drop_duplicates(subset="_id", keep="last")
+            logger.info(f"Read {len(df)} rows from {len(part_files)} snapshot parts")
+            if len(part_files) > SNAPSHOT_MAX_PARTS:
+                compacted_file = os.path.join(snapshot_data_dir, f"part-{datetime.now().strftime('%Y%m%d%H%M%S%f')}-compacted.parquet")
+                df.to_parquet(compacted_file, index=False)
+                for part_file in part_files:
+                    os.remove(part_file)
+                logger.info(f"Compacted {len(part_files)} snapshot parts into {os.path.basename(compacted_file)}")
+            extra_columns = ["_id"] + [self.data_ingestion_config.WATERMARK_FIELD]
+            df = df.drop(columns=[column for column in set(extra_columns) if column not in self.data_ingestion_config.SCHEMA_DTYPES])
+            df = self.data_ingestion_config.UTILS.cast_to_schema_dtypes(df.reset_index(drop=True), self.data_ingestion_config.SCHEMA_CONFIG)
+            logger.info("Exited read_snapshot method of Data_Ingestion class")
+            return df
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def update_snapshot_from_mongodb(self) -> DataFrame:
+        logger.info("Entered update_snapshot_from_mongodb method of Data_Ingestion class")
+        try:
+            watermark_field = self.data_ingestion_config.WATERMARK_FIELD
+            watermark = self.read_watermark()
+            # $gte refetches the rows at the watermark, a row written later with the same value is not missed
+            # and read_snapshot drops the duplicates on _id
+            query = {} if watermark is None else {watermark_field: {"$gte": watermark}}
+            extra_dtypes = {"_id": "object"}
+            if watermark_field not in self.data_ingestion_config.SCHEMA_DTYPES:
+                extra_dtypes[watermark_field] = "object"
+            chunks = self.get_data_chunks_from_mongodb(query=query, extra_dtypes=extra_dtypes)
+            n_rows, new_watermark = self.append_chunks_to_snapshot(chunks)
+            if new_watermark is not None:
+                self.write_watermark(new_watermark)
+            logger.info(f"Fetched {n_rows} rows at or after watermark {watermark}")
+            df = self.read_snapshot()
+            logger.info("Exited update_snapshot_from_mongodb method of Data_Ingestion class")
+            return df
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
     def split_data_as_train_test(self, df:DataFrame) -> Tuple[DataFrame, DataFrame]:
         logger.info(
             "Entered split_data_as_train_test method of Data_Ingestion class"
         )
         try:
             os.makedirs(self.data_ingestion_config.DATA_INGESTION_ARTIFCATS_DIR, exist_ok=True)
-            train_set, test_set = train_test_split(df, test_size=TEST_SIZE)
+            train_set, test_set = train_test_split(df, test_size=TEST_SIZE, random_state=RANDOM_STATE)
             logger.info("Performed train test split on the dataframe")
             os.makedirs(self.data_ingestion_config.TRAIN_DATA_ARTIFACT_FILE_DIR, exist_ok=True)
             logger.info(f"Created {os.path.basename(self.data_ingestion_config.TRAIN_DATA_ARTIFACT_FILE_DIR)} directory.")
             os.makedirs(self.data_ingestion_config.TEST_DATA_ARTIFACT_FILE_DIR, exist_ok=True)
             logger.info(f"Created {os.path.basename(self.data_ingestion_config.TEST_DATA_ARTIFACT_FILE_DIR)} directory.")
-            train_set.to_csv(self.data_ingestion_config.TRAIN_DATA_FILE_PATH, index=False, header=True)
-            test_set.to_csv(self.data_ingestion_config.TEST_DATA_FILE_PATH, index=False, header=True)
-            logger.info("Converted Train Dataframe and Test Dataframe into csv")            
+            self.data_ingestion_config.UTILS.save_dataframe(train_set, self.data_ingestion_config.TRAIN_DATA_FILE_PATH)
+            self.data_ingestion_config.UTILS.save_dataframe(test_set, self.data_ingestion_config.TEST_DATA_FILE_PATH)
+            logger.info("Saved Train Dataframe and Test Dataframe as artifacts")
+            self.save_data_profile(DataProfiler.profile_dataframe(train_set), self.data_ingestion_config.TRAIN_PROFILE_FILE_PATH)
+            self.save_data_profile(DataProfiler.profile_dataframe(test_set), self.data_ingestion_config.TEST_PROFILE_FILE_PATH)
             logger.info(f"Saved {os.path.basename(self.data_ingestion_config.TRAIN_DATA_FILE_PATH)},\
                  {os.path.basename(self.data_ingestion_config.TEST_DATA_FILE_PATH)} in\
                      {os.path.basename(self.data_ingestion_config.DATA_INGESTION_ARTIFCATS_DIR)}."
@@ -69,16 +266,27 @@ class DataIngestion:
             "Entered initiate_data_ingestion method of Data_Ingestion class"
         )
         try:
-            df = self.get_data_from_mongodb()
-            df1 = df.drop(self.data_ingestion_config.DROP_COLS, axis=1)
-            logger.info("Got the data from mongodb")
-            self.split_data_as_train_test(df1)
+            if self.data_ingestion_config.INGESTION_MODE == "incremental":
+                df = self.update_snapshot_from_mongodb()
+                logger.info("Updated the local snapshot with new listings from mongodb")
+                self.split_data_as_train_test(df)
+            elif self.data_ingestion_config.INGESTION_MODE == "streaming":
+                chunks = self.get_data_chunks_from_mongodb()
+                self.split_data_chunks_as_train_test(chunks)
+                logger.info("Streamed the data from mongodb into train and test files")
+            else:
+                df = self.get_data_from_mongodb()
+                df1 = df.drop(self.data_ingestion_config.DROP_COLS, axis=1, errors="ignore")
+                logger.info("Got the data from mongodb")
+                self.split_data_as_train_test(df1)
             logger.info(
                 "Exited initiate_data_ingestion method of Data_Ingestion class"
             )
 
             data_ingestion_artifacts = DataIngestionArtifacts(train_data_file_path=self.data_ingestion_config.TRAIN_DATA_FILE_PATH,
-                                                               test_data_file_path=self.data_ingestion_config.TEST_DATA_FILE_PATH)
+                                                               test_data_file_path=self.data_ingestion_config.TEST_DATA_FILE_PATH,
+                                                               train_profile_file_path=self.data_ingestion_config.TRAIN_PROFILE_FILE_PATH,
+                                                               test_profile_file_path=self.data_ingestion_config.TEST_PROFILE_FILE_PATH)
 
             return data_ingestion_artifacts
             
@@ -5,8 +5,12 @@ from pandas import DataFrame
 import numpy as np
 import pandas as pd
 from category_encoders.binary import BinaryEncoder
+from typing import List
 from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from car_price.components.outlier_capper import OutlierCapper
+from car_price.constant import CONTINUOUS_MIN_DISTINCT
 from car_price.entity.config_entity import DataTransformationConfig
 from car_price.entity.artifacts_entity import DataIngestionArtifacts, DataTransformationArtifacts
 from car_price.exception import CarException
@@ -22,10 +26,12 @@ class DataTransformation:
         self.data_ingestion_artifacts = data_ingestion_artifacts
         self.data_transformation_config = data_transformation_config
 
-        self.train_set = pd.read_csv(self.data_ingestion_artifacts.train_data_file_path)
-        self.test_set = pd.read_csv(self.data_ingestion_artifacts.test_data_file_path)
+        self.train_set = self.data_transformation_config.UTILS.load_dataframe(self.data_ingestion_artifacts.train_data_file_path,
+                                                                               self.data_transformation_config.SCHEMA_CONFIG)
+        self.test_set = self.data_transformation_config.UTILS.load_dataframe(self.data_ingestion_artifacts.test_data_file_path,
+                                                                              self.data_transformation_config.SCHEMA_CONFIG)
 
-    def get_data_transformer_object(self) -> object:
+    def get_data_transformer_object(self, continuous_columns: List[str]) -> object:
         logger.info(
             "Entered get_data_transformer_object method of Data_Ingestion class"
         )
@@ -36,10 +42,15 @@ class DataTransformation:
             logger.info(
                 "Got numerical cols,one hot cols,binary cols from schema config"
             )
-            numeric_transformer = StandardScaler()
+            numeric_transformer = Pipeline(
+                [
+                    ("OutlierCapper", OutlierCapper(cap_columns=continuous_columns)),
+                    ("StandardScaler", StandardScaler()),
+                ]
+            )
             oh_transformer = OneHotEncoder(handle_unknown='ignore')
             binary_transformer = BinaryEncoder()
-            logger.info("Initialized StandardScaler,OneHotEncoder,BinaryEncoder")
+            logger.info("Initialized OutlierCapper,StandardScaler,OneHotEncoder,BinaryEncoder")
             preprocessor = ColumnTransformer(
                 [
                     ("OneHotEncoder", oh_transformer, onehot_columns),
@@ -57,28 +68,6 @@ class DataTransformation:
             raise CarException(e, sys) from e
 
 
-    @staticmethod
-    def _outlier_capping(col, df: DataFrame) -> DataFrame:
-        logger.info("Entered _outlier_capping method of Data_Transformation class")
-        try:
-            logger.info("Performing _outlier_capping for columns in the dataframe")
-            percentile25 = df[col].quantile(0.25)
-            percentile75 = df[col].quantile(0.75)
-            iqr = percentile75 - percentile25
-            upper_limit = percentile75 + 1.5 * iqr
-            lower_limit = percentile25 - 1.5 * iqr
-            df.loc[(df[col] > upper_limit), col] = upper_limit
-            df.loc[(df[col] < lower_limit), col] = lower_limit
-            logger.info(
-                "Performed _outlier_capping method of Data_Transformation class"
-            )
-            logger.info("Exited _outlier_capping method of Data_Transformation class")
-            return df
-
-        except Exception as e:
-            raise CarException(e, sys) from e
-
-
     def initiate_data_transformation(self) -> DataTransformationArtifacts:
         logger.info(
             "Entered initiate_data_transformation method of Data_Transformation class"
@@ -86,23 +75,22 @@ class DataTransformation:
         try:
             os.makedirs(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR, exist_ok=True)
             logger.info(f"Created artifacts directory for {os.path.basename(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR)}")
-            preprocessor = self.get_data_transformer_object()
-            logger.info("Got the preprocessor object")
             target_column_name = self.data_transformation_config.SCHEMA_CONFIG["target_column"]
             numerical_columns = self.data_transformation_config.SCHEMA_CONFIG["numerical_columns"]
             logger.info(
                 "Got target column name and numerical columns from schema config"
             )
+            train_profile = self.data_transformation_config.UTILS.load_data_profile(
+                self.data_ingestion_artifacts.train_profile_file_path, self.train_set
+            )
             continuous_columns = [
                 feature
                 for feature in numerical_columns
-                if len(self.train_set[feature].unique()) >= 25
+                if train_profile["columns"][feature]["distinct_count"] >= CONTINUOUS_MIN_DISTINCT
             ]
-            logger.info("Got a list of continuous_columns")
-            [self._outlier_capping(col, self.train_set) for col in continuous_columns]
-            logger.info("Outlier capped in train df")
-            [self._outlier_capping(col, self.test_set) for col in continuous_columns]
-            logger.info("Outlier capped in test df")
+            logger.info(f"Got a list of continuous_columns from the train profile: {continuous_columns}")
+            preprocessor = self.get_data_transformer_object(continuous_columns)
+            logger.info("Got the preprocessor object, outliers are capped with limits learned on the train df")
             input_feature_train_df = self.train_set.drop(
                 columns=[target_column_name], axis=1
             )
@@ -120,17 +108,14 @@ class DataTransformation:
             )
             input_feature_test_arr = preprocessor.transform(input_feature_test_df)
             logger.info("Used the preprocessor object to transform the test features")
-            train_arr = np.c_[input_feature_train_arr, np.array(target_feature_train_df)]
-            logger.info("Created train array.")
             os.makedirs(self.data_transformation_config.TRANSFORMED_TRAIN_DATA_DIR, exist_ok=True)
-            transformed_train_file = self.data_transformation_config.UTILS.save_numpy_array_data(self.data_transformation_config.TRANSFORMED_TRAIN_FILE_PATH, train_arr)
-            logger.info(f"Saved train array to {os.path.basename(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR)}")
-            test_arr = np.c_[input_feature_test_arr, np.array(target_feature_test_df)]
-            logger.info("Created test array.")
+            transformed_train_file = self.data_transformation_config.UTILS.save_feature_matrix(self.data_transformation_config.TRANSFORMED_TRAIN_FILE_PATH, input_feature_train_arr)
+            transformed_train_target_file = self.data_transformation_config.UTILS.save_numpy_array_data(self.data_transformation_config.TRANSFORMED_TRAIN_TARGET_FILE_PATH, target_feature_train_df.to_numpy())
+            logger.info(f"Saved train features and target to {os.path.basename(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR)}")
             os.makedirs(self.data_transformation_config.TRANSFORMED_TEST_DATA_DIR, exist_ok=True)
-            transformed_test_file = self.data_transformation_config.UTILS.save_numpy_array_data(self.data_transformation_config.TRANSFORMED_TEST_FILE_PATH, test_arr)
-            logger.info(f"Saved test array to {os.path.basename(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR)}")
-            logger.info("Created train array and test array")
+            transformed_test_file = self.data_transformation_config.UTILS.save_feature_matrix(self.data_transformation_config.TRANSFORMED_TEST_FILE_PATH, input_feature_test_arr)
+            transformed_test_target_file = self.data_transformation_config.UTILS.save_numpy_array_data(self.data_transformation_config.TRANSFORMED_TEST_TARGET_FILE_PATH, target_feature_test_df.to_numpy())
+            logger.info(f"Saved test features and target to {os.path.basename(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR)}")
             preprocessor_obj_file = self.data_transformation_config.UTILS.save_object(self.data_transformation_config.PREPROCESSOR_FILE_PATH, preprocessor)
             logger.info("Saved the preprocessor object in DataTransformation artifacts directory.")
             logger.info(
@@ -138,7 +123,9 @@ class DataTransformation:
             )
             data_transformation_artifacts = DataTransformationArtifacts(transformed_object_file_path=preprocessor_obj_file, 
                                                                         transformed_train_file_path=transformed_train_file,
-                                                                        transformed_test_file_path=transformed_test_file)
+                                                                        transformed_test_file_path=transformed_test_file,
+                                                                        transformed_train_target_file_path=transformed_train_target_file,
+                                                                        transformed_test_target_file_path=transformed_test_target_file)
 
             return data_transformation_artifacts
 
@@ -1,15 +1,14 @@
-import json
 import logging
 import sys
 import os
-import pandas as pd
 from pandas import DataFrame
-from evidently.model_profile import Profile
-from evidently.model_profile.sections import DataDriftProfileSection
-from typing import Tuple, Union
+from typing import Dict, Union
+from car_price.constant import SCHEMA_FILE_PATH
 from car_price.exception import CarException
 from car_price.entity.config_entity import DataValidationConfig
 from car_price.entity.artifacts_entity import DataIngestionArtifacts, DataValidationArtifacts
+from car_price.utils.schema_validator import SchemaValidator
+from car_price.utils.drift_detector import DriftDetector
 
 logger = logging.getLogger(__name__)
 
@@ -20,111 +19,49 @@ class DataValidation:
         self.data_validation_config = data_validation_config
 
 
-    def validate_schema_columns(self, df: DataFrame) -> bool:
+    def validate_data_file(self, file_path: str) -> Dict:
+        logger.info("Entered validate_data_file method of Data_Validation class")
         try:
-            if len(df.columns) == len(self.data_validation_config.SCHEMA_CONFIG['columns']):                       
-                validation_status = True
-            else:
-                validation_status = False
-            return validation_status
+            schema_validator = SchemaValidator(self.data_validation_config.SCHEMA_CONFIG)
+            chunks = self.data_validation_config.UTILS.iter_artifact_chunks(file_path, self.data_validation_config.SCHEMA_VALIDATION_CHUNK_SIZE)
+            report = schema_validator.validate_chunks(chunks)
+            logger.info(f"Validated {report['n_rows']} rows of {os.path.basename(file_path)} in {report['n_chunks']} chunks, "
+                        f"status {report['validation_status']}")
+            for error in report["errors"]:
+                logger.info(f"Schema validation error in {os.path.basename(file_path)}: {error}")
+            logger.info("Exited validate_data_file method of Data_Validation class")
+            return report
 
         except Exception as e:
             raise CarException(e, sys) from e
 
 
-    def is_numerical_column_exists(self, df: DataFrame) -> bool:
-        try:
-            validation_status = False
-            for column in self.data_validation_config.SCHEMA_CONFIG["numerical_columns"]:
-                if column not in df.columns:
-                    logger.info(f"Numerical column - {column} not found in dataframe")
-                else:
-                    validation_status = True
-            return validation_status
-
-        except Exception as e:
-            raise CarException(e, sys) from e        
-
-
-    def is_categorical_column_exists(self, df: DataFrame) -> bool:
+    def validate_dataset_schema(self) -> bool:
+        logger.info("Entered validate_dataset_schema method of Data_Validation class")
         try:
-            validation_status = False
-            for column in self.data_validation_config.SCHEMA_CONFIG["categorical_columns"]:
-                if column not in df.columns:
-                    logger.info(f"categorical column - {column} not found in dataframe")
-                else:
-                    validation_status = True
-            return validation_status
-
-        except Exception as e:
-            raise CarException(e, sys) from e   
-
-
-    def validate_dataset_schema_columns(self) -> Tuple[bool, bool]:
-        logger.info(
-            "Entered validate_dataset_schema_columns method of Data_Validation class"
-        )
-        try:
-            logger.info("Validating dataset schema columns")
-            train_schema_status = self.validate_schema_columns(self.train_set)
-            logger.info("Validated dataset schema columns on the train set")
-            test_schema_status = self.validate_schema_columns(self.test_set)
-            logger.info("Validated dataset schema columns on the test set")
-            logger.info("Validated dataset schema columns")
-            return train_schema_status, test_schema_status
+            schema_validation_report = {
+                "train": self.validate_data_file(self.data_ingestion_atifacts.train_data_file_path),
+                "test": self.validate_data_file(self.data_ingestion_atifacts.test_data_file_path),
+            }
+            self.data_validation_config.UTILS.write_json_to_yaml_file(schema_validation_report,
+                                                                      self.data_validation_config.SCHEMA_VALIDATION_REPORT_FILE_PATH)
+            logger.info(f"Saved the schema validation report to {os.path.basename(self.data_validation_config.SCHEMA_VALIDATION_REPORT_FILE_PATH)}")
+            logger.info("Exited validate_dataset_schema method of Data_Validation class")
+            return all(report["validation_status"] for report in schema_validation_report.values())
 
         except Exception as e:
             raise CarException(e, sys) from e
 
 
-    def validate_is_numerical_column_exists(self) -> Tuple[bool, bool]:
-        logger.info(
-            "Entered validate_dataset_schema_for_numerical_datatype method of Data_Validation class"
-        )
+    def get_drift_detector(self, reference: DataFrame) -> DriftDetector:
+        logger.info("Entered get_drift_detector method of Data_Validation class")
         try:
-            logger.info("Validating dataset schema for numerical datatype")
-            train_num_datatype_status = self.is_numerical_column_exists(
-                self.train_set
-            )
-            logger.info(
-                "Validated dataset schema for numerical datatype for train set"
-            )
-            test_num_datatype_status = self.is_numerical_column_exists(
-                self.test_set
-            )
-            logger.info("Validated dataset schema for numerical datatype for test set")
-            logger.info(
-                "Exited validate_dataset_schema_for_numerical_datatype method of Data_Validation class"
-            )
-            return train_num_datatype_status, test_num_datatype_status
-
-        except Exception as e:
-            raise CarException(e, sys) from e
-
-
-    def validate_is_categorical_column_exists(self) -> Tuple[bool, bool]:
-        logger.info(
-            "Entered validate_dataset_schema_for_numerical_datatype method of Data_Validation class"
-        )
-        try:
-
-
-
-            logger.info("Validating dataset schema for numerical datatype")
-            train_cat_datatype_status = self.is_categorical_column_exists(
-                self.train_set
-            )
-            logger.info(
-                "Validated dataset schema for numerical datatype for train set"
-            )
-            test_cat_datatype_status = self.is_categorical_column_exists(
-                self.test_set
-            )
-            logger.info("Validated dataset schema for numerical datatype for test set")
-            logger.info(
-                "Exited validate_dataset_schema_for_numerical_datatype method of Data_Validation class"
-            )
-            return train_cat_datatype_status, test_cat_datatype_status
+            drift_detector = DriftDetector.from_dataframe(reference, self.data_validation_config.SCHEMA_CONFIG)
+            self.data_validation_config.UTILS.write_json_to_yaml_file(drift_detector.to_dict(),
+                                                                      self.data_validation_config.DRIFT_REFERENCE_FILE_PATH)
+            logger.info(f"Saved the drift reference summary to {os.path.basename(self.data_validation_config.DRIFT_REFERENCE_FILE_PATH)}")
+            logger.info("Exited get_drift_detector method of Data_Validation class")
+            return drift_detector
 
         except Exception as e:
             raise CarException(e, sys) from e
@@ -132,10 +69,7 @@ class DataValidation:
 
     def detect_dataset_drift(self, reference: DataFrame, production: DataFrame, get_ratio: bool = False) -> Union[bool, float]:
         try:
-            data_drift_profile = Profile(sections=[DataDriftProfileSection()])
-            data_drift_profile.calculate(reference, production)
-            report = data_drift_profile.json()
-            json_report = json.loads(report)
+            json_report = self.get_drift_detector(reference).detect(production)
             data_drift_file_path = self.data_validation_config.DATA_DRIFT_FILE_PATH
             self.data_validation_config.UTILS.write_json_to_yaml_file(json_report, data_drift_file_path)
             n_features = json_report["data_drift"]["data"]["metrics"]["n_features"]
@@ -152,55 +86,29 @@ class DataValidation:
     def initiate_data_validation(self) -> DataValidationArtifacts:
         logger.info("Entered initiate_data_validation method of Data_Validation class")
         try:
-            self.train_set = pd.read_csv(self.data_ingestion_atifacts.train_data_file_path)
-            self.test_set = pd.read_csv(self.data_ingestion_atifacts.test_data_file_path)
             logger.info("Initiated data validation for the dataset")
             os.makedirs(self.data_validation_config.DATA_VALIDATION_ARTIFACTS_DIR, exist_ok=True)
             logger.info(f"Created Artifatcs directory for {os.path.basename(self.data_validation_config.DATA_VALIDATION_ARTIFACTS_DIR)}")
+            schema_status = self.validate_dataset_schema()
+            logger.info(f"Schema validation status is {schema_status}")
+            if not schema_status:
+                # the later stages would train on data that does not match the schema, so the run stops here
+                raise ValueError(f"The ingested train and test data do not match {os.path.basename(SCHEMA_FILE_PATH)}, "
+                                 f"see the schema validation report {self.data_validation_config.SCHEMA_VALIDATION_REPORT_FILE_PATH}")
+
+            self.train_set = self.data_validation_config.UTILS.load_dataframe(self.data_ingestion_atifacts.train_data_file_path,
+                                                                              self.data_validation_config.SCHEMA_CONFIG)
+            self.test_set = self.data_validation_config.UTILS.load_dataframe(self.data_ingestion_atifacts.test_data_file_path,
+                                                                             self.data_validation_config.SCHEMA_CONFIG)
             drift = self.detect_dataset_drift(self.train_set, self.test_set)
-
-            (
-                schema_train_col_status,
-                schema_test_col_status,
-            ) = self.validate_dataset_schema_columns()
-            logger.info(
-                f"Schema train cols status is {schema_train_col_status} and schema test cols status is {schema_test_col_status}"
-            )
-            logger.info("Validated dataset schema columns")
-            (
-                schema_train_cat_cols_status,
-                schema_test_cat_cols_status,
-            ) = self.validate_is_categorical_column_exists()
-            logger.info(
-                f"Schema train cat cols status is {schema_train_cat_cols_status} and schema test cat cols status is {schema_test_cat_cols_status}"
-            )
-            logger.info("Validated dataset schema for catergorical datatype")
-            (
-                schema_train_num_cols_status,
-                schema_test_num_cols_status,
-            ) = self.validate_is_numerical_column_exists()
-            logger.info(
-                f"Schema train numerical cols status is {schema_train_num_cols_status} and schema test numerical cols status is {schema_test_num_cols_status}"
-            )
-            logger.info("Validated dataset schema for numerical datatype")
-
-            drift_status = None
-            if (
-                schema_train_cat_cols_status is True
-                and schema_test_cat_cols_status is True
-                and schema_train_num_cols_status is True
-                and schema_test_num_cols_status is True
-                and schema_train_col_status is True
-                and schema_test_col_status is True
-                and drift is False
-            ):
-                logger.info("Dataset schema validation completed")
-                drift_status == True
-            else:
-                drift_status == False
-
-            data_validation_artifacts = DataValidationArtifacts(data_drift_file_path=self.data_validation_config.DATA_DRIFT_FILE_PATH, 
-                                                                    validation_status=drift_status)
+            logger.info(f"Dataset drift is {drift}")
+            drift_status = drift is False
+            logger.info("Dataset schema validation completed")
+
+            data_validation_artifacts = DataValidationArtifacts(data_drift_file_path=self.data_validation_config.DATA_DRIFT_FILE_PATH,
+                                                                    validation_status=drift_status,
+                                                                    schema_validation_report_file_path=self.data_validation_config.SCHEMA_VALIDATION_REPORT_FILE_PATH,
+                                                                    drift_reference_file_path=self.data_validation_config.DRIFT_REFERENCE_FILE_PATH)
 
             return data_validation_artifacts
 
@@ -0,0 +1,188 @@
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from car_price.constant import DRIFT_MONITOR_WINDOW_SIZE, DRIFT_MONITOR_INTERVAL_SECONDS, DRIFT_MONITOR_MIN_ROWS, \
+    DRIFT_MONITOR_MAX_PENDING
+from car_price.components.model_registry import ModelRegistry
+from car_price.exception import CarException
+from car_price.utils.drift_detector import DriftDetector
+
+logger = logging.getLogger(__name__)
+
+
+class DriftMonitor:
+    """
+    Process-wide drift monitor of the features seen by /predict and /v1/predict/batch.
+
+    record() only appends the request frame to a bounded queue, so the request path pays for a
+    deque append. A daemon thread folds the queued frames every interval_seconds into a fixed-size
+    window of the most recent rows per schema column (floats for numeric columns, the raw values
+    for categorical ones), and compares the window with the DriftDetector reference summary the
+    serving CarPriceModel carries, using the same tests as training time validation. The window
+    is reset whenever the model registry swaps in a new model, since the reference changes with it.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, model_registry: ModelRegistry = None, window_size: int = DRIFT_MONITOR_WINDOW_SIZE,
+                    interval_seconds: int = DRIFT_MONITOR_INTERVAL_SECONDS, min_rows: int = DRIFT_MONITOR_MIN_ROWS,
+                    max_pending: int = DRIFT_MONITOR_MAX_PENDING):
+        self.model_registry = model_registry if model_registry is not None else ModelRegistry.get_instance()
+        self.window_size = window_size
+        self.interval_seconds = interval_seconds
+        self.min_rows = min_rows
+
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._monitor_thread: Optional[threading.Thread] = None
+
+        self._model = None
+        self._detector: Optional[DriftDetector] = None
+        self._window: Dict[str, np.ndarray] = {}
+        self._position = 0
+        self._filled = 0
+
+        self.rows_seen = 0
+        self.updates = 0
+        self.update_errors = 0
+        self.last_update_seconds: Optional[float] = None
+        self.updated_at: Optional[float] = None
+        self._report: Optional[Dict] = None
+
+
+    @classmethod
+    def get_instance(cls) -> "DriftMonitor":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+
+    def record(self, X: DataFrame) -> None:
+        self._pending.append(X)
+
+
+    def _reset(self, model: object) -> None:
+        reference = getattr(model, "drift_reference", None)
+        self._model = model
+        self._detector = DriftDetector(reference) if reference is not None else None
+        features = reference["features"] if reference is not None else {}
+        self._window = {column: np.full(self.window_size, np.nan) if feature["kind"] == "num"
+                        else np.full(self.window_size, None, dtype=object) for column, feature in features.items()}
+        self._position = self._filled = 0
+
+
+    def _append_rows(self, df: DataFrame) -> None:
+        n = min(len(df), self.window_size)
+        if n == 0:
+            return
+        targets = (np.arange(n) + self._position) % self.window_size
+        for column, window in self._window.items():
+            if column not in df.columns:
+                values = np.nan if window.dtype != object else None
+            elif window.dtype != object:
+                values = pd.to_numeric(df[column].iloc[-n:], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                values = df[column].iloc[-n:].to_numpy(dtype=object)
+            window[targets] = values
+        self._position = (self._position + n) % self.window_size
+        self._filled = min(self._filled + n, self.window_size)
+
+
+    def update(self) -> Dict:
+        logger.info("Entered update method of DriftMonitor class")
+        try:
+            start = time.perf_counter()
+            # updates run one at a time so reports are swapped in order, while _lock is only held to fold
+            # the pending frames and copy the window: record() and get_report() never wait for detect
+            with self._update_lock:
+                with self._lock:
+                    frames = []
+                    while self._pending:
+                        frames.append(self._pending.popleft())
+                    self.rows_seen += sum(len(frame) for frame in frames)
+                    # only the newest window_size rows can stay in the window, older frames are not concatenated
+                    n_rows, n_frames = 0, 0
+                    for frame in reversed(frames):
+                        if n_rows >= self.window_size:
+                            break
+                        n_rows += len(frame)
+                        n_frames += 1
+                    frames = frames[len(frames) - n_frames:]
+                    model = self.model_registry.get_loaded_model()
+                    if model is not self._model:
+                        self._reset(model)
+                    if frames and self._window:
+                        self._append_rows(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+                    detector, filled = self._detector, self._filled
+                    window_df = None
+                    if detector is not None and filled >= self.min_rows:
+                        window_df = DataFrame({column: window[:filled].copy() for column, window in self._window.items()})
+
+                if detector is None:
+                    report = {"status": "no_reference", "metrics": None}
+                elif window_df is None:
+                    report = {"status": "insufficient_data", "metrics": None}
+                else:
+                    report = {"status": "ok", "metrics": detector.detect(window_df)["data_drift"]["data"]["metrics"]}
+                report["window_rows"] = filled
+
+                with self._lock:
+                    self._report = report
+                    self.updates += 1
+                    self.last_update_seconds = time.perf_counter() - start
+                    self.updated_at = time.time()
+            logger.info(f"Compared {filled} recent rows with the drift reference in {self.last_update_seconds:.3f}s, "
+                        f"status {report['status']}")
+            logger.info("Exited update method of DriftMonitor class")
+            return report
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def _monitor_loop(self) -> None:
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.update()
+            except Exception as e:
+                self.update_errors += 1
+                logger.exception(f"Drift monitor update failed, keeping the previous report: {e}")
+
+
+    def start(self) -> None:
+        if self._monitor_thread is None and self.interval_seconds > 0:
+            self._stop_event.clear()
+            self._monitor_thread = threading.Thread(target=self._monitor_loop, name="drift-monitor", daemon=True)
+            self._monitor_thread.start()
+
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._monitor_thread is not None:
+            self._monitor_thread.join()
+            self._monitor_thread = None
+
+
+    def get_report(self) -> Dict:
+        with self._lock:
+            return {
+                **(self._report or {"status": "pending", "metrics": None, "window_rows": self._filled}),
+                "window_size": self.window_size,
+                "pending_requests": len(self._pending),
+                "rows_seen": self.rows_seen,
+                "updates": self.updates,
+                "update_errors": self.update_errors,
+                "updated_at": self.updated_at,
+                "last_update_seconds": self.last_update_seconds,
+                "interval_seconds": self.interval_seconds,
+            }
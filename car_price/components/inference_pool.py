@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+from car_price.constant import INFERENCE_POOL_SIZE, INFERENCE_POOL_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePoolSaturatedError(Exception):
+    pass
+
+
+class InferencePool:
+    """
+    Bounded thread pool that keeps blocking model code (S3 download, unpickling,
+    preprocessing and predict) off the event loop.
+
+    At most max_workers calls run at once and max_pending more may wait; anything beyond
+    that is rejected straight away with InferencePoolSaturatedError instead of queueing.
+    """
+
+    def __init__(self, max_workers: int = INFERENCE_POOL_SIZE, max_pending: int = INFERENCE_POOL_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+
+    def _release(self, _) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+
+    async def run(self, fn: Callable, *args, **kwargs) -> object:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise InferencePoolSaturatedError(
+                f"Inference pool is saturated ({self.max_workers} running, {self.max_pending} pending)"
+            )
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args, **kwargs)
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
@@ -43,10 +43,10 @@ class ModelEvaluation:
 
     def evaluate_model(self) -> EvaluateModelResponse:
         try:
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_data_file_path)
+            test_df = self.model_evaluation_config.UTILS.load_dataframe(self.data_ingestion_artifact.test_data_file_path)
             x, y = test_df.drop(TARGET_COLUMN, axis=1), test_df[TARGET_COLUMN]
 
-            trained_model = self.model_evaluation_config.UTILS.load_object(self.model_trainer_artifact.trained_model_file_path)
+            trained_model = self.model_evaluation_config.UTILS.load_model(self.model_trainer_artifact.trained_model_file_path)
             y_hat_trained_model = trained_model.predict(x)
             trained_model_r2_score = self.model_evaluation_config.UTILS.get_model_score(y, y_hat_trained_model)
 
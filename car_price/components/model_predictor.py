@@ -1,11 +1,14 @@
 import logging
 import sys
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from pandas import DataFrame
 import pandas as pd
 from car_price.constant import *
-from car_price.configuration.s3_operations import S3Operation
+from car_price.components.drift_monitor import DriftMonitor
+from car_price.components.model_registry import ModelRegistry
 from car_price.exception import CarException
+from car_price.utils.main_utils import MainUtils
 
 logger = logging.getLogger(__name__)
 
@@ -60,20 +63,117 @@ class CarData:
             raise CarException(e, sys) from e
 
 
+class CarBatchData:
+    def __init__(self, records: List[object], schema_config: Dict):
+        self.records = records
+        self.schema_config = schema_config
+
+
+    def get_feature_columns(self) -> List[str]:
+        target_column = self.schema_config["target_column"]
+        return [column for column in self.schema_config["columns"] if column != target_column]
+
+
+    def get_carprice_input_data_frame(self) -> Tuple[DataFrame, List[Optional[str]]]:
+        logger.info(
+            "Entered get_carprice_input_data_frame method of CarBatchData class"
+        )
+        try:
+            feature_columns = self.get_feature_columns()
+            errors: List[Optional[str]] = [None] * len(self.records)
+            for idx, record in enumerate(self.records):
+                if not isinstance(record, dict):
+                    errors[idx] = "record must be a JSON object"
+            # columns are built straight from the records, the fixed cost of per column pandas
+            # operations on a DataFrame dominated small batches
+            dicts = [record if isinstance(record, dict) else {} for record in self.records]
+            columns = {}
+            invalid = np.zeros((len(dicts), len(feature_columns)), dtype=bool)
+            for col_idx, column in enumerate(feature_columns):
+                dtype = self.schema_config["columns"][column]
+                raw_values = [record.get(column) for record in dicts]
+                if dtype == "category":
+                    values = pd.Series(raw_values, dtype=object)
+                    invalid[:, col_idx] = values.isna().to_numpy()
+                    columns[column] = values.astype(str).to_numpy()
+                else:
+                    try:
+                        values = np.array(raw_values, dtype=np.float64)
+                        if values.shape != (len(raw_values),):
+                            raise ValueError("nested values")
+                    except (TypeError, ValueError):
+                        values = pd.to_numeric(pd.Series(raw_values, dtype=object), errors="coerce") \
+                            .to_numpy(dtype=np.float64, na_value=np.nan)
+                    invalid[:, col_idx] = np.isnan(values)
+                    if dtype == "int":
+                        with np.errstate(invalid="ignore"):
+                            invalid[:, col_idx] |= values % 1 != 0
+                    columns[column] = values
+            df = DataFrame(columns, columns=feature_columns)
+            logger.info("Built batch dataframe from the records")
+
+            logger.info("Validated batch dataframe against schema config")
+
+            for idx in np.flatnonzero(invalid.any(axis=1)):
+                if errors[idx] is None:
+                    bad_columns = [feature_columns[i] for i in np.flatnonzero(invalid[idx])]
+                    errors[idx] = f"missing or invalid value for: {', '.join(bad_columns)}"
+            logger.info(
+                "Exited get_carprice_input_data_frame method of CarBatchData class"
+            )
+            return df, errors
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
 class CarPricePredictor:
-    def __init__(self):
-        self.s3 = S3Operation()
-        self.bucket_name = BUCKET_NAME
+    _schema_config: Optional[Dict] = None
+
+    def __init__(self, model_registry: ModelRegistry = None, drift_monitor: DriftMonitor = None):
+        self.model_registry = model_registry if model_registry is not None else ModelRegistry.get_instance()
+        if drift_monitor is None and DRIFT_MONITOR_ENABLED:
+            drift_monitor = DriftMonitor.get_instance()
+        self.drift_monitor = drift_monitor
+        self.utils = MainUtils()
+
+
+    def get_schema_config(self) -> Dict:
+        # schema.yaml ships with the code, so it is parsed once per process instead of on every batch
+        if CarPricePredictor._schema_config is None:
+            CarPricePredictor._schema_config = self.utils.read_schema_file_path()
+        return CarPricePredictor._schema_config
 
 
     def predict(self, X) -> None:
         logger.info("Entered predict method of CarPricePredictor class")
         try:
-            best_model = self.s3.load_model(MODEL_FILE_NAME, self.bucket_name)
-            logger.info("Loaded best model from s3 bucket")
+            best_model = self.model_registry.get_model()
+            logger.info("Got best model from the model registry")
             result = best_model.predict(X)
+            if self.drift_monitor is not None:
+                self.drift_monitor.record(X)
             logger.info("Exited predict method of CarPricePredictor class")
             return result
 
         except Exception as e:
-            raise CarException(e, sys) from e
\ No newline at end of file
+            raise CarException(e, sys) from e
+
+
+    def predict_batch(self, records: List[object]) -> List[Dict]:
+        logger.info("Entered predict_batch method of CarPricePredictor class")
+        try:
+            schema_config = self.get_schema_config()
+            df, errors = CarBatchData(records, schema_config).get_carprice_input_data_frame()
+            valid_mask = np.array([error is None for error in errors], dtype=bool)
+            prices: List[Optional[float]] = [None] * len(errors)
+            if valid_mask.any():
+                preds = self.predict(df if valid_mask.all() else df[valid_mask])
+                for idx, price in zip(np.flatnonzero(valid_mask), preds):
+                    prices[idx] = round(float(price), 2)
+            logger.info(f"Scored {int(valid_mask.sum())} of {len(errors)} records in one batch")
+            logger.info("Exited predict_batch method of CarPricePredictor class")
+            return [{"price": price, "error": error} for price, error in zip(prices, errors)]
+
+        except Exception as e:
+            raise CarException(e, sys) from e
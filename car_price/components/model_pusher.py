@@ -28,6 +28,7 @@ class ModelPusher:
                 self.model_pusher_config.S3_MODEL_KEY_PATH,
                 self.model_pusher_config.BUCKET_NAME,
                 remove=False,
+                compression=self.model_pusher_config.MODEL_TRANSFER_COMPRESSION,
             )
             logger.info("Uploaded artifacts folder to s3 bucket")
             logger.info("Exited initiate_model_pusher method of ModelTrainer class")
@@ -0,0 +1,165 @@
+import logging
+import sys
+import threading
+import time
+from typing import Dict, Optional
+from car_price.constant import BUCKET_NAME, MODEL_FILE_NAME, MODEL_REFRESH_INTERVAL_SECONDS
+from car_price.configuration.s3_operations import S3Operation
+from car_price.exception import CarException
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide holder of the serving CarPriceModel.
+
+    The model is loaded once from S3 and served from memory. A daemon thread polls the
+    ETag/LastModified of the S3 object and reloads only when it changes; the new model is
+    swapped in with a single reference assignment so in-flight requests keep the old one.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, s3: S3Operation = None, bucket_name: str = BUCKET_NAME, model_name: str = MODEL_FILE_NAME,
+                    refresh_interval: int = MODEL_REFRESH_INTERVAL_SECONDS):
+        self.s3 = s3 if s3 is not None else S3Operation()
+        self.bucket_name = bucket_name
+        self.model_name = model_name
+        self.refresh_interval = refresh_interval
+
+        self._model = None
+        self._version: Optional[Dict] = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.refresh_errors = 0
+        self.last_load_seconds: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+
+
+    @classmethod
+    def get_instance(cls) -> "ModelRegistry":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+    def _load(self, version: Optional[Dict] = None) -> None:
+        logger.info("Entered _load method of ModelRegistry class")
+        try:
+            if version is None:
+                version = self.s3.get_model_metadata(self.model_name, self.bucket_name)
+            start = time.perf_counter()
+            model = self.s3.load_model(self.model_name, self.bucket_name)
+            load_seconds = time.perf_counter() - start
+            self._model, self._version = model, version
+            with self._stats_lock:
+                self.loads += 1
+                self.last_load_seconds = load_seconds
+                self.loaded_at = time.time()
+            logger.info(f"Loaded model version {version} in {load_seconds:.3f}s")
+            logger.info("Exited _load method of ModelRegistry class")
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_model(self) -> object:
+        try:
+            model = self._model
+            if model is not None:
+                self._count("hits")
+                return model
+            with self._load_lock:
+                if self._model is None:
+                    self._count("misses")
+                    self._load()
+                else:
+                    self._count("hits")
+                return self._model
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_loaded_model(self) -> Optional[object]:
+        """The model currently served, without loading it or counting a hit."""
+        return self._model
+
+
+    def refresh(self) -> bool:
+        logger.info("Entered refresh method of ModelRegistry class")
+        try:
+            version = self.s3.get_model_metadata(self.model_name, self.bucket_name)
+            if version == self._version:
+                logger.info("Model in S3 is unchanged, keeping the loaded model")
+                return False
+            with self._load_lock:
+                if version == self._version:
+                    return False
+                self._load(version)
+            logger.info("Exited refresh method of ModelRegistry class")
+            return True
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def _refresh_loop(self) -> None:
+        while not self._stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self._count("refresh_errors")
+                logger.exception(f"Model refresh failed, serving the previously loaded model: {e}")
+
+
+    def start(self) -> None:
+        logger.info("Entered start method of ModelRegistry class")
+        try:
+            if self._refresh_thread is None and self.refresh_interval > 0:
+                self._stop_event.clear()
+                self._refresh_thread = threading.Thread(target=self._refresh_loop, name="model-registry-refresh", daemon=True)
+                self._refresh_thread.start()
+            self.get_model()
+            logger.info("Exited start method of ModelRegistry class")
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
+
+    def get_stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "model": repr(self._model) if self._model is not None else None,
+                "version": self._version,
+                "loaded_at": self.loaded_at,
+                "last_load_seconds": self.last_load_seconds,
+                "loads": self.loads,
+                "hits": self.hits,
+                "misses": self.misses,
+                "refresh_errors": self.refresh_errors,
+                "refresh_interval_seconds": self.refresh_interval,
+                "unknown_categories": (self._model.get_unknown_category_counts()
+                                       if hasattr(self._model, "get_unknown_category_counts") else {}),
+            }
@@ -1,57 +1,155 @@
 import os
 import logging
 import sys
-import pandas as pd
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from typing import Dict, List, Optional, Union
 from pandas import DataFrame
+from scipy import sparse
+from car_price.components.compiled_model import CompiledPreprocessor, CompiledTreeEnsemble, check_parity
+from car_price.utils.drift_detector import DriftDetector
+from car_price.constant import COMPILED_MODEL_PARITY_RTOL, COMPILED_TREES_MAX_ROWS
 from car_price.entity.config_entity import ModelTrainerConfig
-from car_price.entity.artifacts_entity import DataTransformationArtifacts, ModelTrainerArtifacts
+from car_price.entity.artifacts_entity import DataIngestionArtifacts, DataTransformationArtifacts, ModelSearchArtifacts, ModelTrainerArtifacts
 from car_price.exception import CarException
 
 logger = logging.getLogger(__name__)
 
+FeatureMatrix = Union[np.ndarray, sparse.csr_matrix]
+
 class CarPriceModel:
-    def __init__(self, preprocessing_object: object, trained_model_object: object):
+    def __init__(self, preprocessing_object: object, trained_model_object: object,
+                    compiled_preprocessor: Optional[CompiledPreprocessor] = None,
+                    compiled_trees: Optional[CompiledTreeEnsemble] = None, drift_reference: Optional[Dict] = None,
+                    model_type: Optional[str] = None):
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.compiled_preprocessor = compiled_preprocessor
+        self.compiled_trees = compiled_trees
+        self.drift_reference = drift_reference
+        self.model_type = model_type if model_type is not None else type(trained_model_object).__name__
 
     def predict(self, X) -> DataFrame:
         logger.info("Entered predict method of CarPriceModel class")
         try:
             logger.info("Using the trained model to get predictions")
-            transformed_feature = self.preprocessing_object.transform(X)
-            logger.info("Used the trained model to get predictions")
-            return self.trained_model_object.predict(transformed_feature)
+            compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+            compiled_trees = getattr(self, "compiled_trees", None)
+            if compiled_preprocessor is None:
+                transformed_feature = self.preprocessing_object.transform(X)
+                logger.info("Used the trained model to get predictions")
+                return self.trained_model_object.predict(transformed_feature)
+            transformed_feature = compiled_preprocessor.transform(X)
+            if compiled_trees is not None and len(transformed_feature) <= COMPILED_TREES_MAX_ROWS:
+                logger.info("Used the compiled preprocessor and trees to get predictions")
+                return compiled_trees.predict(transformed_feature)
+            logger.info("Used the compiled preprocessor and the trained model to get predictions")
+            return self.trained_model_object.predict(compiled_preprocessor.to_model_input(transformed_feature))
 
         except Exception as e:
             raise CarException(e, sys) from e
 
+    def get_unknown_category_counts(self) -> Dict[str, int]:
+        compiled_preprocessor = getattr(self, "compiled_preprocessor", None)
+        return compiled_preprocessor.get_unknown_counts() if compiled_preprocessor is not None else {}
+
+    def get_model_type(self) -> str:
+        return getattr(self, "model_type", None) or type(self.trained_model_object).__name__
+
     def __repr__(self):
-        return f"{type(self.trained_model_object).__name__}()"
+        return f"{self.get_model_type()}()"
 
     def __str__(self):
-        return f"{type(self.trained_model_object).__name__}()"
+        return f"{self.get_model_type()}()"
 
 
 class ModelTrainer:
-    def __init__(self, data_transformation_artifact: DataTransformationArtifacts, model_trainer_config: ModelTrainerConfig):
+    def __init__(self, data_transformation_artifact: DataTransformationArtifacts, model_trainer_config: ModelTrainerConfig,
+                    data_ingestion_artifact: DataIngestionArtifacts = None):
         self.data_transformation_artifact = data_transformation_artifact
         self.model_trainer_config = model_trainer_config
+        self.data_ingestion_artifact = data_ingestion_artifact
 
 
-    def get_trained_models(self, x_data: DataFrame, y_data: DataFrame) -> List[Tuple[float, object, str]]:
+    def get_compiled_preprocessor(self, preprocessing_obj: object) -> Optional[CompiledPreprocessor]:
+        logger.info("Entered get_compiled_preprocessor method of ModelTrainer class")
+        try:
+            compiled_preprocessor = CompiledPreprocessor.from_fitted(preprocessing_obj)
+            car_name_tables = [table for table, _ in compiled_preprocessor.category_tables if table.column == "car_name"]
+            if car_name_tables:
+                unseen_cars = [car for car in self.model_trainer_config.UTILS.get_car_list() if car not in car_name_tables[0].index]
+                if unseen_cars:
+                    logger.warning(f"{len(unseen_cars)} cars offered by the UI were not seen in training and will be "
+                                   f"encoded as unknown: {unseen_cars}")
+            if self.data_ingestion_artifact is not None:
+                test_df = self.get_raw_test_features()
+                error = check_parity(preprocessing_obj.transform(test_df), compiled_preprocessor.transform(test_df),
+                                     COMPILED_MODEL_PARITY_RTOL)
+                logger.info(f"Compiled preprocessor matches the fitted one on the raw test split, max relative error {error:.3g}")
+            logger.info("Exited get_compiled_preprocessor method of ModelTrainer class")
+            return compiled_preprocessor
+
+        except (NotImplementedError, ValueError) as e:
+            logger.warning(f"Serving without a compiled preprocessor: {e}")
+            return None
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_compiled_trees(self, best_model: object, x_test: FeatureMatrix) -> Optional[CompiledTreeEnsemble]:
+        logger.info("Entered get_compiled_trees method of ModelTrainer class")
+        try:
+            compiled_trees = CompiledTreeEnsemble.from_fitted(best_model, sparse_input=sparse.issparse(x_test))
+            error = check_parity(best_model.predict(x_test), compiled_trees.predict(x_test), COMPILED_MODEL_PARITY_RTOL)
+            logger.info(f"Compiled trees match the trained model on the transformed test split, max relative error {error:.3g}")
+            logger.info("Exited get_compiled_trees method of ModelTrainer class")
+            return compiled_trees
+
+        except (NotImplementedError, ValueError) as e:
+            logger.warning(f"Serving {type(best_model).__name__} without compiled trees: {e}")
+            return None
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_drift_reference(self) -> Optional[Dict]:
+        """DriftDetector summary of the raw train features, served with the model for online drift monitoring."""
+        logger.info("Entered get_drift_reference method of ModelTrainer class")
+        try:
+            if self.data_ingestion_artifact is None:
+                logger.info("No data ingestion artifact, serving without a drift reference")
+                return None
+            schema_config = self.model_trainer_config.UTILS.read_schema_file_path()
+            train_df = self.model_trainer_config.UTILS.load_dataframe(self.data_ingestion_artifact.train_data_file_path, schema_config)
+            drift_reference = DriftDetector.from_dataframe(train_df.drop(columns=[schema_config["target_column"]]), schema_config).to_dict()
+            logger.info(f"Built the drift reference of {len(drift_reference['features'])} features from {len(train_df)} train rows")
+            logger.info("Exited get_drift_reference method of ModelTrainer class")
+            return drift_reference
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_raw_test_features(self) -> DataFrame:
+        schema_config = self.model_trainer_config.UTILS.read_schema_file_path()
+        test_df = self.model_trainer_config.UTILS.load_dataframe(self.data_ingestion_artifact.test_data_file_path, schema_config)
+        return test_df.drop(columns=[schema_config["target_column"]])
+
+
+    def get_trained_models(self, x_train: FeatureMatrix, y_train: np.ndarray, x_test: FeatureMatrix, y_test: np.ndarray) -> List[ModelSearchArtifacts]:
         logger.info("Entered get_trained_models method of ModelTrainer class")
         try:
             model_config = self.model_trainer_config.UTILS.read_model_config_file()
             models_list = list(model_config["train_model"].keys())
             logger.info("Got model list from the config file")
-            x_train, y_train, x_test, y_test = (
-                x_data.drop(x_data.columns[len(x_data.columns)-1], axis=1),
-                x_data.iloc[:, -1],
-                y_data.drop(y_data.columns[len(y_data.columns)-1], axis=1),
-                y_data.iloc[:, -1],
-            )
-            tuned_model_list = [(self.model_trainer_config.UTILS.get_tuned_model(model_name, x_train, y_train, x_test, y_test)) for model_name in models_list]
+            search_config = self.model_trainer_config.UTILS.get_search_config(model_config)
+            n_concurrent, core_allocation = self.model_trainer_config.UTILS.get_core_allocation(search_config, models_list)
+            with ThreadPoolExecutor(max_workers=n_concurrent, thread_name_prefix="model-search") as executor:
+                futures = [executor.submit(self.model_trainer_config.UTILS.get_tuned_model, model_name, x_train, y_train, x_test, y_test,
+                                           *core_allocation[model_name]) for model_name in models_list]
+                tuned_model_list = [future.result() for future in futures]
             logger.info("Got trained model list")
             logger.info("Exited the get_trained_models method of ModelFinder class")
             return tuned_model_list
@@ -68,18 +166,21 @@ class ModelTrainer:
             os.makedirs(self.model_trainer_config.MODEL_TRAINER_ARTIFACTS_DIR, exist_ok=True)
             logger.info(f"Created artifacts directory for {os.path.basename(self.model_trainer_config.DATA_TRANSFORMATION_ARTIFACTS_DIR)}")
 
-            train_array = self.model_trainer_config.UTILS.load_numpy_array_data(self.data_transformation_artifact.transformed_train_file_path)
-            train_df = pd.DataFrame(train_array)
-            logger.info(f"Loaded train array from DataTransformationArtifacts directory and converted into Dataframe.")
+            x_train = self.model_trainer_config.UTILS.load_feature_matrix(self.data_transformation_artifact.transformed_train_file_path)
+            y_train = self.model_trainer_config.UTILS.load_numpy_array_data(self.data_transformation_artifact.transformed_train_target_file_path, mmap_mode="r")
+            logger.info(f"Memory-mapped train features {x_train.shape} and target from DataTransformationArtifacts directory.")
 
-            test_array = self.model_trainer_config.UTILS.load_numpy_array_data(self.data_transformation_artifact.transformed_test_file_path)
-            test_df = pd.DataFrame(test_array)
-            logger.info(f"Loaded test array from DataTransformationArtifacts directory and converted into Dataframe.")
+            x_test = self.model_trainer_config.UTILS.load_feature_matrix(self.data_transformation_artifact.transformed_test_file_path)
+            y_test = self.model_trainer_config.UTILS.load_numpy_array_data(self.data_transformation_artifact.transformed_test_target_file_path, mmap_mode="r")
+            logger.info(f"Memory-mapped test features {x_test.shape} and target from DataTransformationArtifacts directory.")
 
-            list_of_trained_models = self.get_trained_models(train_df, test_df)
+            list_of_trained_models = self.get_trained_models(x_train, y_train, x_test, y_test)
             logger.info(
-                "Got a list of tuple of model score,model and model name"
+                "Got the search artifacts of every tuned model"
             )
+            cv_results_file_path = self.model_trainer_config.UTILS.save_cv_results(self.model_trainer_config.CV_RESULTS_FILE_PATH,
+                                                                                    list_of_trained_models)
+            logger.info("Saved the cv results of every model search")
             (
                 best_model,
                 best_model_score,
@@ -93,19 +194,23 @@ class ModelTrainer:
             if best_model_score >= base_model_score:
                 self.model_trainer_config.UTILS.update_model_score(best_model_score)
                 logger.info("Updating model score in yaml file")
-                carprice_model = CarPriceModel(preprocessing_obj, best_model)
+                compiled_preprocessor = self.get_compiled_preprocessor(preprocessing_obj)
+                compiled_trees = self.get_compiled_trees(best_model, x_test)
+                drift_reference = self.get_drift_reference()
+                carprice_model = CarPriceModel(preprocessing_obj, best_model, compiled_preprocessor, compiled_trees, drift_reference)
                 logger.info(
                     "Created car price model object with preprocessor and model"
                 )
                 trained_model_path = self.model_trainer_config.TRAINED_MODEL_FILE_PATH
                 logger.info("Created best model file path")
-                model_file_path = self.model_trainer_config.UTILS.save_object(trained_model_path, carprice_model)
+                model_file_path = self.model_trainer_config.UTILS.save_model(trained_model_path, carprice_model)
                 logger.info("Saved the best model object path")
             else:
                 logger.info("No best model found with score more than base score")
                 raise "No best model found with score more than base score "
 
-            model_trainer_artifacts = ModelTrainerArtifacts(trained_model_file_path=model_file_path)
+            model_trainer_artifacts = ModelTrainerArtifacts(trained_model_file_path=model_file_path,
+                                                            cv_results_file_path=cv_results_file_path)
 
             return model_trainer_artifacts
 
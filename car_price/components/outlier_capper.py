@@ -0,0 +1,59 @@
+import logging
+import sys
+from typing import List
+import numpy as np
+from sklearn.base import BaseEstimator, TransformerMixin
+from car_price.exception import CarException
+
+logger = logging.getLogger(__name__)
+
+
+class OutlierCapper(BaseEstimator, TransformerMixin):
+    """
+    Caps the given columns to [q1 - k * iqr, q3 + k * iqr] with limits learned on the training data.
+
+    The quartiles of all capped columns come from one vectorized quantile pass in fit, and
+    transform applies the stored limits with a single clip, so test and serving inputs are
+    capped with exactly the training limits. Columns not in cap_columns pass through unchanged.
+    """
+
+    def __init__(self, cap_columns: List[str] = None, iqr_multiplier: float = 1.5):
+        self.cap_columns = cap_columns
+        self.iqr_multiplier = iqr_multiplier
+
+
+    def fit(self, X, y=None) -> "OutlierCapper":
+        logger.info("Entered fit method of OutlierCapper class")
+        try:
+            columns = list(getattr(X, "columns", range(np.shape(X)[1])))
+            self.feature_names_in_ = np.asarray(columns, dtype=object)
+            self.n_features_in_ = len(columns)
+            cap_columns = columns if self.cap_columns is None else list(self.cap_columns)
+            cap_idx = [columns.index(column) for column in cap_columns]
+            self.lower_ = np.full(len(columns), -np.inf)
+            self.upper_ = np.full(len(columns), np.inf)
+            if cap_idx:
+                # one contiguous row per column keeps the quantile partitioning cache friendly
+                if hasattr(X, "columns"):
+                    values = np.stack([X[column].to_numpy(dtype=np.float64) for column in cap_columns])
+                else:
+                    values = np.asarray(X, dtype=np.float64)[:, cap_idx].T.copy()
+                percentile25, percentile75 = np.nanquantile(values, [0.25, 0.75], axis=1)
+                iqr = percentile75 - percentile25
+                self.lower_[cap_idx] = percentile25 - self.iqr_multiplier * iqr
+                self.upper_[cap_idx] = percentile75 + self.iqr_multiplier * iqr
+            logger.info(f"Learned capping limits for {len(cap_idx)} columns")
+            logger.info("Exited fit method of OutlierCapper class")
+            return self
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def transform(self, X) -> np.ndarray:
+        values = np.array(X, dtype=np.float64)
+        return np.clip(values, self.lower_, self.upper_, out=values)
+
+
+    def get_feature_names_out(self, input_features=None) -> np.ndarray:
+        return self.feature_names_in_
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+import pandas as pd
+from pandas import DataFrame
+from car_price.components.inference_pool import InferencePool, InferencePoolSaturatedError
+from car_price.constant import MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_QUEUE_SIZE
+from car_price.exception import CarException
+from car_price.utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512]
+
+
+class PredictionQueueFullError(Exception):
+    pass
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent single-car predictions into one vectorized predict call.
+
+    Requests wait at most max_wait_ms for company, a batch is flushed as soon as it has
+    max_batch_size rows, and at most max_queue_size rows may be waiting at any time.
+    """
+
+    def __init__(self, predict_fn: Callable[[DataFrame], object], max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+                    max_batch_size: int = MICRO_BATCH_MAX_SIZE, max_queue_size: int = MICRO_BATCH_MAX_QUEUE_SIZE,
+                    inference_pool: InferencePool = None):
+        self.predict_fn = predict_fn
+        self.inference_pool = inference_pool
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+
+        self.queue_wait_seconds = Histogram(QUEUE_WAIT_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.rejected = 0
+
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+
+
+    async def start(self) -> None:
+        logger.info("Entered start method of PredictionBatcher class")
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Exited start method of PredictionBatcher class")
+
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+    async def predict(self, X: DataFrame) -> float:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((X, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise PredictionQueueFullError(f"Prediction queue is full ({self.max_queue_size} pending requests)")
+        return await future
+
+
+    async def _collect_batch(self) -> List[Tuple[DataFrame, asyncio.Future, float]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            flushed_at = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_seconds.observe(flushed_at - enqueued_at)
+            self.batch_size.observe(len(batch))
+            try:
+                X = pd.concat([item[0] for item in batch], ignore_index=True)
+                if self.inference_pool is not None:
+                    preds = await self.inference_pool.run(self.predict_fn, X)
+                else:
+                    preds = await loop.run_in_executor(None, self.predict_fn, X)
+                for (_, future, _), pred in zip(batch, preds):
+                    if not future.done():
+                        future.set_result(pred)
+
+            except InferencePoolSaturatedError as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+            except Exception as e:
+                logger.exception(f"Micro-batch of {len(batch)} rows failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(CarException(e, sys))
+
+
+    def get_stats(self) -> Dict:
+        return {
+            "max_wait_ms": self.max_wait * 1000,
+            "max_batch_size": self.max_batch_size,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "rejected": self.rejected,
+            "queue_wait_seconds": self.queue_wait_seconds.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
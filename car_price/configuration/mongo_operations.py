@@ -1,12 +1,13 @@
 import sys
 from json import loads
 from os import environ
-from typing import Collection
+from typing import Collection, Dict, Iterator, List
+import numpy as np
 from pandas import DataFrame
 from pymongo.database import Database
 import pandas as pd
 from pymongo import MongoClient
-from car_price.constant import DB_URL
+from car_price.constant import DB_URL, MONGO_CURSOR_BATCH_SIZE, INGESTION_CHUNK_SIZE
 
 import logging
 
@@ -50,7 +51,16 @@ class MongoDBOperation:
         except Exception as e:
             raise e
 
-    def get_collection_as_dataframe(self, db_name, collection_name) -> DataFrame:
+    @staticmethod
+    def get_projection(exclude_columns: List[str] = None, include_id: bool = False) -> Dict[str, int]:
+        projection = {} if include_id else {"_id": 0}
+
+        for column in exclude_columns or []:
+            projection[column] = 0
+
+        return projection
+
+    def get_collection_as_dataframe(self, db_name, collection_name, projection: Dict[str, int] = None) -> DataFrame:
 
         logging.info(
             "Entered get_collection_as_dataframe method of MongoDB_Operation class"
@@ -61,7 +71,7 @@ class MongoDBOperation:
 
             collection = database.get_collection(name=collection_name)
 
-            df = pd.DataFrame(list(collection.find()))
+            df = pd.DataFrame(list(collection.find({}, projection)))
 
             if "_id" in df.columns.to_list():
                 df = df.drop(columns=["_id"], axis=1)
@@ -77,6 +87,76 @@ class MongoDBOperation:
         except Exception as e:
             raise e
 
+    def get_collection_as_dataframe_chunks(self, db_name, collection_name, dtypes: Dict[str, str],
+                                            projection: Dict[str, int] = None, batch_size: int = MONGO_CURSOR_BATCH_SIZE,
+                                            chunk_size: int = INGESTION_CHUNK_SIZE, query: Dict = None) -> Iterator[DataFrame]:
+
+        logging.info(
+            "Entered get_collection_as_dataframe_chunks method of MongoDB_Operation class"
+        )
+
+        try:
+            database = self.get_database(db_name)
+
+            collection = database.get_collection(name=collection_name)
+
+            cursor = collection.find(query or {}, projection, batch_size=batch_size)
+
+            columns = {column: [] for column in dtypes}
+
+            n_rows = 0
+
+            for document in cursor:
+                for column, values in columns.items():
+                    values.append(document.get(column))
+
+                n_rows += 1
+
+                if n_rows == chunk_size:
+                    yield self.build_typed_chunk(columns, dtypes)
+
+                    columns = {column: [] for column in dtypes}
+
+                    n_rows = 0
+
+            if n_rows > 0:
+                yield self.build_typed_chunk(columns, dtypes)
+
+            logging.info(
+                "Exited get_collection_as_dataframe_chunks method of MongoDB_Operation class"
+            )
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def build_typed_chunk(columns: Dict[str, list], dtypes: Dict[str, str]) -> DataFrame:
+        data = {}
+
+        for column, values in columns.items():
+            dtype = dtypes[column]
+
+            if dtype == "category":
+                data[column] = pd.Categorical(values)
+
+            elif dtype == "object":
+                data[column] = pd.Series(values, dtype="object")
+
+            else:
+                try:
+                    array = np.array(values, dtype="float64")
+
+                except (TypeError, ValueError):
+                    array = None
+
+                if array is None or array.ndim != 1:
+                    # non-numeric values such as "n/a" become NaN, like cast_to_schema_dtypes does on load
+                    array = pd.to_numeric(pd.Series(values, dtype="object"), errors="coerce").to_numpy(dtype="float64")
+
+                data[column] = array if np.isnan(array).any() else array.astype(dtype)
+
+        return pd.DataFrame(data)
+
     def insert_dataframe_as_record(self, data_frame, db_name, collection_name) -> None:
 
         logging.info("Entered insert_dataframe_as_record method of MongoDB_Operation")
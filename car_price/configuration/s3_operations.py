@@ -1,13 +1,23 @@
+import io
 import os
 import pickle
+import shutil
 import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
-from typing import List, Union
+from typing import BinaryIO, Iterator, List, Union
 from car_price.constant import *
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 from mypy_boto3_s3.service_resource import Bucket
 from pandas import DataFrame, read_csv
+from car_price.utils.main_utils import MainUtils
+from car_price.utils.model_bundle import ModelBundle, ZIP_MAGIC
+from car_price.utils.compression import TransferCodec, CompressingReader, DecompressingReader
+from car_price.utils.model_cache import ModelCache
 
 import logging
 
@@ -18,6 +28,14 @@ class S3Operation:
 
         self.s3_resource = boto3.resource("s3")
 
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=S3_MAX_CONCURRENCY,
+        )
+
+        self.model_cache = ModelCache() if MODEL_CACHE_ENABLED else None
+
     @staticmethod
     def read_object(object_name: str, decode: bool = True, make_readable: bool = False) -> Union[StringIO, str]:
         """
@@ -135,11 +153,29 @@ class S3Operation:
 
             model_file = func()
 
-            f_obj = self.get_file_object(model_file, bucket_name)
+            if self.model_cache is None:
+                model_file_obj = self.open_object_stream(model_file, bucket_name)
+
+            else:
+                model_file_obj = self.get_cached_file_obj(model_file, bucket_name)
+
+            try:
+                if model_file_obj.peek(len(ZIP_MAGIC))[:len(ZIP_MAGIC)] == ZIP_MAGIC:
+                    if self.model_cache is None:
+                        # bundle arrays are memory-mapped, so the stream is spooled to a local file first
+                        model_file_obj = self.download_file_obj(model_file, bucket_name, stream=model_file_obj)
+
+                    model = self.load_model_bundle(model_file_obj)
 
-            model_obj = self.read_object(f_obj, decode=False)
+                else:
+                    model = pickle.load(model_file_obj)
 
-            model = pickle.loads(model_obj)
+                    model_file_obj.close()
+
+            except Exception:
+                model_file_obj.close()
+
+                raise
 
             logging.info("Exited the load_model method of S3Operations class")
 
@@ -148,6 +184,284 @@ class S3Operation:
         except Exception as e:
             raise e
 
+    def download_file_obj(self, filename: str, bucket_name: str, stream: BinaryIO = None) -> BinaryIO:
+        """
+        Method Name :   download_file_obj
+        Description :   This method downloads the filename object from bucket_name bucket into an anonymous temporary file,
+                        reading the rest of stream instead when the object is already open
+
+        Output      :   open temporary file positioned at the start, its path is already removed
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the download_file_obj method of S3Operations class")
+
+        try:
+            fd, file_path = tempfile.mkstemp(suffix=".download")
+
+            file_obj = os.fdopen(fd, "w+b")
+
+            try:
+                # the open file keeps the memory-mapped bundle arrays readable once the path is gone
+                os.remove(file_path)
+
+            except OSError:
+                pass
+
+            try:
+                if stream is None:
+                    self.download_to_file_obj(filename, bucket_name, file_obj)
+
+                else:
+                    with stream:
+                        shutil.copyfileobj(stream, file_obj, S3_DOWNLOAD_READ_SIZE)
+
+            except Exception:
+                file_obj.close()
+
+                raise
+
+            file_obj.seek(0)
+
+            logging.info("Exited the download_file_obj method of S3Operations class")
+
+            return file_obj
+
+        except Exception as e:
+            raise e
+
+    def iter_object_chunks(self, filename: str, bucket_name: str, etag: str = None) -> Iterator[bytes]:
+        """
+        Method Name :   iter_object_chunks
+        Description :   This method streams the filename object of bucket_name bucket in order, from one GET or from
+                        S3_DOWNLOAD_CONCURRENCY parallel ranged GETs, failing when its ETag is no longer etag
+
+        Output      :   iterator of the object bytes in order
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the iter_object_chunks method of S3Operations class")
+
+        try:
+            conditional_args = {} if etag is None else {"IfMatch": f'"{etag}"'}
+
+            if S3_DOWNLOAD_CONCURRENCY <= 1:
+                body = self.s3_client.get_object(Bucket=bucket_name, Key=filename, **conditional_args)["Body"]
+
+                yield from body.iter_chunks(S3_DOWNLOAD_READ_SIZE)
+
+            else:
+                part_size = S3_MULTIPART_CHUNK_SIZE
+
+                response = self.s3_client.get_object(Bucket=bucket_name, Key=filename, Range=f"bytes=0-{part_size - 1}",
+                                                     **conditional_args)
+
+                # every part comes from the version the first one was read from
+                conditional_args = {"IfMatch": response["ETag"]}
+
+                object_size = int(response.get("ContentRange", f"/{response['ContentLength']}").rsplit("/", 1)[1])
+
+                def get_part(start: int) -> bytes:
+                    end = min(start + part_size, object_size) - 1
+
+                    return self.s3_client.get_object(Bucket=bucket_name, Key=filename, Range=f"bytes={start}-{end}",
+                                                     **conditional_args)["Body"].read()
+
+                yield response["Body"].read()
+
+                with ThreadPoolExecutor(S3_DOWNLOAD_CONCURRENCY) as executor:
+                    # at most S3_DOWNLOAD_CONCURRENCY parts are fetched ahead of the reader
+                    parts = deque()
+
+                    for start in range(part_size, object_size, part_size):
+                        parts.append(executor.submit(get_part, start))
+
+                        if len(parts) == S3_DOWNLOAD_CONCURRENCY:
+                            yield parts.popleft().result()
+
+                    while parts:
+                        yield parts.popleft().result()
+
+            logging.info("Exited the iter_object_chunks method of S3Operations class")
+
+        except Exception as e:
+            raise e
+
+    def open_object_stream(self, filename: str, bucket_name: str, etag: str = None) -> io.BufferedReader:
+        """
+        Method Name :   open_object_stream
+        Description :   This method opens the filename object of bucket_name bucket as a buffered stream,
+                        zstd or lz4 compressed objects are decompressed as they are read
+
+        Output      :   readable stream of the decompressed object
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the open_object_stream method of S3Operations class")
+
+        try:
+            stream = io.BufferedReader(DecompressingReader(self.iter_object_chunks(filename, bucket_name, etag)),
+                                       buffer_size=S3_DOWNLOAD_READ_SIZE)
+
+            logging.info("Exited the open_object_stream method of S3Operations class")
+
+            return stream
+
+        except Exception as e:
+            raise e
+
+    def download_to_file_obj(self, filename: str, bucket_name: str, file_obj: BinaryIO, etag: str = None) -> None:
+        """
+        Method Name :   download_to_file_obj
+        Description :   This method downloads the filename object from bucket_name bucket into file_obj,
+                        zstd or lz4 compressed objects are decompressed as the chunks arrive
+
+        Output      :   file_obj holds the decompressed object
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the download_to_file_obj method of S3Operations class")
+
+        try:
+            with DecompressingReader(self.iter_object_chunks(filename, bucket_name, etag)) as reader:
+                shutil.copyfileobj(reader, file_obj, S3_DOWNLOAD_READ_SIZE)
+
+            file_obj.flush()
+
+            logging.info(
+                f"Downloaded {reader.bytes_in} bytes of {filename} from {bucket_name} bucket, "
+                f"compression {reader.compression}, {reader.bytes_out} bytes on disk"
+            )
+
+            logging.info("Exited the download_to_file_obj method of S3Operations class")
+
+        except Exception as e:
+            raise e
+
+    def get_cached_file_obj(self, filename: str, bucket_name: str) -> BinaryIO:
+        """
+        Method Name :   get_cached_file_obj
+        Description :   This method revalidates the cached filename object of bucket_name bucket with a conditional
+                        If-None-Match request on its ETag and downloads it into the model cache only when it changed
+
+        Output      :   open cache entry positioned at the start
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the get_cached_file_obj method of S3Operations class")
+
+        try:
+            cached = self.model_cache.lookup(bucket_name, filename)
+
+            conditional_args = {} if cached is None else {"IfNoneMatch": f'"{cached[0]}"'}
+
+            try:
+                response = self.s3_client.head_object(Bucket=bucket_name, Key=filename, **conditional_args)
+
+            except ClientError as e:
+                if cached is None or e.response["Error"]["Code"] not in ("304", "NotModified"):
+                    raise
+
+                response = None
+
+            if response is None:
+                file_obj = self.model_cache.open(cached[1])
+
+                if file_obj is not None:
+                    logging.info(f"{filename} in {bucket_name} bucket is unchanged, loaded ETag {cached[0]} from the model cache")
+
+                    logging.info("Exited the get_cached_file_obj method of S3Operations class")
+
+                    return file_obj
+
+                response = self.s3_client.head_object(Bucket=bucket_name, Key=filename)
+
+            etag = response["ETag"].strip('"')
+
+            def download(file_obj: BinaryIO) -> None:
+                # the cache entry is named after the ETag, so a model pushed mid-download fails the If-Match
+                # instead of being stored under it
+                self.download_to_file_obj(filename, bucket_name, file_obj, etag)
+
+            file_obj = self.model_cache.get_or_download(bucket_name, filename, etag, download)
+
+            logging.info("Exited the get_cached_file_obj method of S3Operations class")
+
+            return file_obj
+
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def load_model_bundle(model_file_obj: BinaryIO) -> object:
+        """
+        Method Name :   load_model_bundle
+        Description :   This method loads a ModelBundle downloaded from the bucket, its arrays are memory-mapped from the local file
+
+        Output      :   CarPriceModel is returned
+        On Failure  :   Write an exception log and then raise an exception
+
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the load_model_bundle method of S3Operations class")
+
+        try:
+            model_bundle = ModelBundle(model_file_obj.name, model_file_obj)
+
+            model_bundle.verify()
+
+            model = model_bundle.load_model(MainUtils().read_schema_file_path())
+
+            logging.info("Exited the load_model_bundle method of S3Operations class")
+
+            return model
+
+        except Exception as e:
+            raise e
+
+    def get_model_metadata(self, model_name: str, bucket_name: str, model_dir: str = None) -> dict:
+        """
+        Method Name :   get_model_metadata
+        Description :   This method fetches the ETag and LastModified of the model_name object without downloading it
+        
+        Output      :   dict with the etag and last_modified of the model object
+        On Failure  :   Write an exception log and then raise an exception
+        
+        Version     :   1.2
+        Revisions   :   moved setup to cloud
+        """
+        logging.info("Entered the get_model_metadata method of S3Operations class")
+
+        try:
+            func = (lambda: model_name if model_dir is None else model_dir + "/" + model_name)
+
+            model_file = func()
+
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=model_file)
+
+            metadata = {
+                "etag": response["ETag"].strip('"'),
+                "last_modified": response["LastModified"].isoformat(),
+            }
+
+            logging.info("Exited the get_model_metadata method of S3Operations class")
+
+            return metadata
+
+        except Exception as e:
+            raise e
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
         """
         Method Name :   create_folder
@@ -175,10 +489,12 @@ class S3Operation:
 
             logging.info("Exited the create_folder method of S3Operations class")
 
-    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True) -> None:
+    def upload_file(self, from_filename: str, to_filename: str, bucket_name: str, remove: bool = True,
+                    compression: str = None) -> None:
         """
         Method Name :   upload_file
-        Description :   This method uploads the from_filename file to bucket_name bucket with to_filename as bucket filename
+        Description :   This method uploads the from_filename file to bucket_name bucket with to_filename as bucket filename,
+                        multipart above S3_MULTIPART_THRESHOLD and streamed through zstd or lz4 when compression is set
         
         Output      :   Folder is created in s3 bucket
         On Failure  :   Write an exception log and then raise an exception
@@ -193,13 +509,29 @@ class S3Operation:
                 f"Uploading {from_filename} file to {to_filename} file in {bucket_name} bucket"
             )
 
-            self.s3_resource.meta.client.upload_file(
-                from_filename, bucket_name, to_filename
-            )
+            if compression in (None, "none"):
+                self.s3_resource.meta.client.upload_file(
+                    from_filename, bucket_name, to_filename, Config=self.transfer_config
+                )
 
-            logging.info(
-                f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket"
-            )
+                logging.info(
+                    f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket"
+                )
+
+            else:
+                codec = TransferCodec(compression, MODEL_TRANSFER_COMPRESSION_LEVEL)
+
+                with open(from_filename, "rb") as file_obj:
+                    reader = CompressingReader(file_obj, codec, S3_MULTIPART_CHUNK_SIZE)
+
+                    self.s3_resource.meta.client.upload_fileobj(
+                        reader, bucket_name, to_filename, Config=self.transfer_config
+                    )
+
+                logging.info(
+                    f"Uploaded {from_filename} file to {to_filename} file in {bucket_name} bucket, "
+                    f"{compression} compressed {os.path.getsize(from_filename)} to {reader.bytes_out} bytes"
+                )
 
             if remove is True:
                 os.remove(from_filename)
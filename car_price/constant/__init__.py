@@ -16,31 +16,98 @@ COLLECTION_NAME = 'car'
 DB_URL = environ["MONGODB_URL"]
 
 TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+SCHEMA_DTYPE_MAPPING = {"category": "category", "int": "int64", "float": "float64"}
+
+INGESTION_MODE = environ.get("INGESTION_MODE", "streaming")
+MONGO_CURSOR_BATCH_SIZE = 10000
+INGESTION_CHUNK_SIZE = 100000
 
 MODEL_CONFIG_FILE = 'config/model.yaml'
+MODEL_SEARCH_DEFAULTS = {"n_cores": -1, "max_concurrent_models": 2, "cv_backend": "threading", "models": {}}
+SUPPORTED_MODELS = {
+    "LinearRegression": "sklearn.linear_model:LinearRegression",
+    "Ridge": "sklearn.linear_model:Ridge",
+    "Lasso": "sklearn.linear_model:Lasso",
+    "ElasticNet": "sklearn.linear_model:ElasticNet",
+    "KNeighborsRegressor": "sklearn.neighbors:KNeighborsRegressor",
+    "SVR": "sklearn.svm:SVR",
+    "DecisionTreeRegressor": "sklearn.tree:DecisionTreeRegressor",
+    "RandomForestRegressor": "sklearn.ensemble:RandomForestRegressor",
+    "ExtraTreesRegressor": "sklearn.ensemble:ExtraTreesRegressor",
+    "GradientBoostingRegressor": "sklearn.ensemble:GradientBoostingRegressor",
+    "HistGradientBoostingRegressor": "sklearn.ensemble:HistGradientBoostingRegressor",
+    "AdaBoostRegressor": "sklearn.ensemble:AdaBoostRegressor",
+    "XGBRegressor": "xgboost:XGBRegressor",
+    "XGBRFRegressor": "xgboost:XGBRFRegressor",
+    "LGBMRegressor": "lightgbm:LGBMRegressor",
+    "CatBoostRegressor": "catboost:CatBoostRegressor",
+}
 
 ARTIFACTS_DIR = os.path.join(from_root(), 'artifacts', TIMESTAMP)
+ARTIFACT_FORMAT = environ.get("ARTIFACT_FORMAT", "parquet")
+ARTIFACT_FILE_EXTENSIONS = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
 LOGS_DIR = 'logs'
 LOGS_FILE_NAME = 'car_price.log'
 
+SNAPSHOT_DIR = os.path.join(from_root(), 'artifacts', 'snapshot')
+SNAPSHOT_DATA_DIR = 'data'
+SNAPSHOT_WATERMARK_FILE_NAME = 'watermark.yaml'
+# the default _id only increases on insert, so incremental runs pick up new listings but never edits to
+# existing ones. Point it at a field the writers set on every update (e.g. updated_at) to refetch those too.
+WATERMARK_FIELD = environ.get("WATERMARK_FIELD", "_id")
+SNAPSHOT_MAX_PARTS = 50
+
+STAGE_CACHE_ENABLED = environ.get("STAGE_CACHE_ENABLED", "true").lower() == "true"
+STAGE_CACHE_DIR = os.path.join(from_root(), 'artifacts', 'stage_cache')
+STAGE_CACHE_MAX_ENTRIES = 3
+STAGE_CACHE_MANIFEST_FILE_NAME = 'artifact.yaml'
+
 DATA_INGESTION_ARTIFACTS_DIR = 'DataIngestionArtifacts'
 DATA_INGESTION_TRAIN_DIR = 'Train'
 DATA_INGESTION_TEST_DIR = 'Test'
-DATA_INGESTION_TRAIN_FILE_NAME = 'train.csv'
-DATA_INGESTION_TEST_FILE_NAME = 'test.csv'
+DATA_INGESTION_TRAIN_FILE_NAME = 'train' + ARTIFACT_FILE_EXTENSIONS[ARTIFACT_FORMAT]
+DATA_INGESTION_TEST_FILE_NAME = 'test' + ARTIFACT_FILE_EXTENSIONS[ARTIFACT_FORMAT]
+DATA_INGESTION_TRAIN_PROFILE_FILE_NAME = 'train_profile.yaml'
+DATA_INGESTION_TEST_PROFILE_FILE_NAME = 'test_profile.yaml'
+
+# column profiling: distinct counts are exact below the limit and HyperLogLog estimates above it,
+# quantiles come from a uniform sample of PROFILE_SAMPLE_SIZE values
+PROFILE_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+PROFILE_SAMPLE_SIZE = 100000
+PROFILE_EXACT_DISTINCT_LIMIT = 100000
+PROFILE_HLL_PRECISION = 14
+CONTINUOUS_MIN_DISTINCT = 25
 
 DATA_VALIDATION_ARTIFACT_DIR = 'DataValidationArtifacts'
 DATA_DRIFT_FILE_NAME = "DataDriftReport.yaml"
+SCHEMA_VALIDATION_REPORT_FILE_NAME = "SchemaValidationReport.yaml"
+SCHEMA_VALIDATION_CHUNK_SIZE = 500000
+DRIFT_REFERENCE_FILE_NAME = "DriftReference.yaml"
+
+# data drift against persisted reference summaries, test selection and thresholds follow Evidently's defaults
+DRIFT_QUANTILE_GRID_SIZE = 1000
+DRIFT_MAX_TRACKED_VALUES = 20
+DRIFT_SMALL_REFERENCE_SIZE = 1000
+DRIFT_SAMPLE_SIZE = 500000
+DRIFT_PSI_BINS = 10
+DRIFT_SHARE = 0.5
 
 DATA_TRANSFORMATION_ARTIFCATS_DIR = 'DataTransformationArtifacts'
 TRANSFORMED_TRAIN_DATA_DIR = 'TransformedTrain'
 TRANSFORMED_TEST_DATA_DIR = 'TransformedTest'
-TRANSFORMED_TRAIN_DATA_FILE_NAME = 'transformed_train_data.npz'
-TRANSFORMED_TEST_DATA_FILE_NAME = 'transformed_test_data.npz'
+TRANSFORMED_TRAIN_DATA_FILE_NAME = 'transformed_train_features'
+TRANSFORMED_TEST_DATA_FILE_NAME = 'transformed_test_features'
+TRANSFORMED_TRAIN_TARGET_FILE_NAME = 'transformed_train_target.npy'
+TRANSFORMED_TEST_TARGET_FILE_NAME = 'transformed_test_target.npy'
 PREPROCESSOR_OBJECT_FILE_NAME = "car_price_preprocessor.pkl"
 
 MODEL_TRAINER_ARTIFACTS_DIR = 'ModelTrainerArtifacts'
 MODEL_FILE_NAME = 'car_price_model.pkl'
+MODEL_CV_RESULTS_FILE_NAME = 'cv_results.csv'
+COMPILED_MODEL_PARITY_RTOL = 1e-5
+COMPILED_TREES_MAX_ROWS = 64
 
 BUCKET_NAME = 'car-price-io-files'
 S3_MODEL_NAME = 'car_price_model.pkl'
@@ -49,5 +116,52 @@ S3_MODEL_NAME = 'car_price_model.pkl'
 
 MODEL_SAVE_FORMAT = '.pkl'
 
+# pickle-free model bundles, the S3 key and file names stay the same and loaders tell the formats apart by content
+MODEL_BUNDLE_ENABLED = environ.get("MODEL_BUNDLE_ENABLED", "true").lower() == "true"
+MODEL_BUNDLE_FORMAT = "car_price_model_bundle"
+MODEL_BUNDLE_FORMAT_VERSION = 1
+MODEL_BUNDLE_ALIGNMENT = 64
+
+# model transfers to and from S3, compression is optional ("none", "zstd" or "lz4") and downloads detect it by content
+TRANSFER_COMPRESSION_CODECS = {"zstd": "zstandard", "lz4": "lz4.frame"}
+MODEL_TRANSFER_COMPRESSION = environ.get("MODEL_TRANSFER_COMPRESSION", "none").lower()
+MODEL_TRANSFER_COMPRESSION_LEVEL = int(environ["MODEL_TRANSFER_COMPRESSION_LEVEL"]) \
+    if environ.get("MODEL_TRANSFER_COMPRESSION_LEVEL") else None
+S3_MULTIPART_THRESHOLD = int(environ.get("S3_MULTIPART_THRESHOLD", 8 * 1024 * 1024))
+S3_MULTIPART_CHUNK_SIZE = int(environ.get("S3_MULTIPART_CHUNK_SIZE", 8 * 1024 * 1024))
+S3_MAX_CONCURRENCY = int(environ.get("S3_MAX_CONCURRENCY", 8))
+# downloads are read in order by the deserializer, from one streaming GET or, above 1, from that many parallel ranged
+# GETs of S3_MULTIPART_CHUNK_SIZE
+S3_DOWNLOAD_CONCURRENCY = int(environ.get("S3_DOWNLOAD_CONCURRENCY", 1))
+S3_DOWNLOAD_READ_SIZE = 1024 * 1024
+
+# local disk cache of models loaded from S3, revalidated by ETag on every load
+MODEL_CACHE_ENABLED = environ.get("MODEL_CACHE_ENABLED", "true").lower() == "true"
+MODEL_CACHE_DIR = environ.get("MODEL_CACHE_DIR", os.path.join(from_root(), 'artifacts', 'model_cache'))
+MODEL_CACHE_MAX_BYTES = int(environ.get("MODEL_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+BATCH_PREDICTION_MAX_ROWS = 100000
+
+MODEL_REFRESH_INTERVAL_SECONDS = int(environ.get("MODEL_REFRESH_INTERVAL_SECONDS", 300))
+
+INFERENCE_POOL_SIZE = int(environ.get("INFERENCE_POOL_SIZE", 4))
+INFERENCE_POOL_MAX_PENDING = int(environ.get("INFERENCE_POOL_MAX_PENDING", 64))
+
+# the training worker process runs at a lower CPU priority so it does not take CPU time from the serving threads
+TRAIN_JOB_NICENESS = int(environ.get("TRAIN_JOB_NICENESS", 19))
+# finished training jobs whose status stays queryable, older ones are dropped
+TRAIN_JOB_MAX_HISTORY = int(environ.get("TRAIN_JOB_MAX_HISTORY", 20))
+
+MICRO_BATCHING_ENABLED = environ.get("MICRO_BATCHING_ENABLED", "false").lower() == "true"
+MICRO_BATCH_MAX_WAIT_MS = float(environ.get("MICRO_BATCH_MAX_WAIT_MS", 5))
+MICRO_BATCH_MAX_SIZE = int(environ.get("MICRO_BATCH_MAX_SIZE", 64))
+MICRO_BATCH_MAX_QUEUE_SIZE = int(environ.get("MICRO_BATCH_MAX_QUEUE_SIZE", 1024))
+
+DRIFT_MONITOR_ENABLED = environ.get("DRIFT_MONITOR_ENABLED", "true").lower() == "true"
+DRIFT_MONITOR_WINDOW_SIZE = int(environ.get("DRIFT_MONITOR_WINDOW_SIZE", 10000))
+DRIFT_MONITOR_INTERVAL_SECONDS = int(environ.get("DRIFT_MONITOR_INTERVAL_SECONDS", 60))
+DRIFT_MONITOR_MIN_ROWS = 100
+DRIFT_MONITOR_MAX_PENDING = 10000
+
 APP_HOST = '0.0.0.0'
 APP_PORT = 8080
\ No newline at end of file
@@ -5,21 +5,38 @@ from dataclasses import dataclass
 class DataIngestionArtifacts:
     train_data_file_path: str 
     test_data_file_path: str 
+    train_profile_file_path: str = None
+    test_profile_file_path: str = None
 
 @dataclass
 class DataValidationArtifacts:
     data_drift_file_path: str 
     validation_status: bool
+    schema_validation_report_file_path: str = None
+    drift_reference_file_path: str = None
 
 @dataclass
 class DataTransformationArtifacts:
     transformed_object_file_path: str
     transformed_train_file_path: str 
     transformed_test_file_path: str
+    transformed_train_target_file_path: str
+    transformed_test_target_file_path: str
+
+@dataclass
+class ModelSearchArtifacts:
+    model_name: str
+    best_model: object
+    best_params: dict
+    best_cv_score: float
+    test_score: float
+    cv_results: dict
+    search_seconds: float
 
 @dataclass
 class ModelTrainerArtifacts:
     trained_model_file_path: str
+    cv_results_file_path: str
 
 @dataclass
 class ModelEvaluationArtifact:
@@ -14,11 +14,20 @@ class DataIngestionConfig:
         self.DB_NAME = DB_NAME
         self.COLLECTION_NAME = COLLECTION_NAME
         self.DROP_COLS = list(self.SCHEMA_CONFIG["drop_columns"])
+        self.SCHEMA_DTYPES = self.UTILS.get_schema_dtypes(self.SCHEMA_CONFIG)
+        self.INGESTION_MODE: str = INGESTION_MODE
+        self.MONGO_CURSOR_BATCH_SIZE: int = MONGO_CURSOR_BATCH_SIZE
+        self.INGESTION_CHUNK_SIZE: int = INGESTION_CHUNK_SIZE
+        self.WATERMARK_FIELD: str = WATERMARK_FIELD
+        self.SNAPSHOT_DATA_DIR: str = os.path.join(SNAPSHOT_DIR, SNAPSHOT_DATA_DIR)
+        self.WATERMARK_FILE_PATH: str = os.path.join(SNAPSHOT_DIR, SNAPSHOT_WATERMARK_FILE_NAME)
         self.DATA_INGESTION_ARTIFCATS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR, DATA_INGESTION_ARTIFACTS_DIR)
         self.TRAIN_DATA_ARTIFACT_FILE_DIR: str = os.path.join(self.DATA_INGESTION_ARTIFCATS_DIR, DATA_INGESTION_TRAIN_DIR)
         self.TEST_DATA_ARTIFACT_FILE_DIR: str = os.path.join(self.DATA_INGESTION_ARTIFCATS_DIR, DATA_INGESTION_TEST_DIR)
         self.TRAIN_DATA_FILE_PATH: str = os.path.join(self.TRAIN_DATA_ARTIFACT_FILE_DIR, DATA_INGESTION_TRAIN_FILE_NAME)
         self.TEST_DATA_FILE_PATH: str = os.path.join(self.TEST_DATA_ARTIFACT_FILE_DIR, DATA_INGESTION_TEST_FILE_NAME)
+        self.TRAIN_PROFILE_FILE_PATH: str = os.path.join(self.TRAIN_DATA_ARTIFACT_FILE_DIR, DATA_INGESTION_TRAIN_PROFILE_FILE_NAME)
+        self.TEST_PROFILE_FILE_PATH: str = os.path.join(self.TEST_DATA_ARTIFACT_FILE_DIR, DATA_INGESTION_TEST_PROFILE_FILE_NAME)
 
 
 @dataclass
@@ -29,6 +38,9 @@ class DataValidationConfig:
         self.DATA_INGESTION_ARTIFCATS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR, DATA_INGESTION_ARTIFACTS_DIR)
         self.DATA_VALIDATION_ARTIFACTS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR, DATA_VALIDATION_ARTIFACT_DIR)
         self.DATA_DRIFT_FILE_PATH: str = os.path.join(self.DATA_VALIDATION_ARTIFACTS_DIR, DATA_DRIFT_FILE_NAME)
+        self.SCHEMA_VALIDATION_REPORT_FILE_PATH: str = os.path.join(self.DATA_VALIDATION_ARTIFACTS_DIR, SCHEMA_VALIDATION_REPORT_FILE_NAME)
+        self.SCHEMA_VALIDATION_CHUNK_SIZE: int = SCHEMA_VALIDATION_CHUNK_SIZE
+        self.DRIFT_REFERENCE_FILE_PATH: str = os.path.join(self.DATA_VALIDATION_ARTIFACTS_DIR, DRIFT_REFERENCE_FILE_NAME)
 
 
 @dataclass
@@ -42,6 +54,8 @@ class DataTransformationConfig:
         self.TRANSFORMED_TEST_DATA_DIR: str = os.path.join(self.DATA_TRANSFORMATION_ARTIFACTS_DIR, TRANSFORMED_TEST_DATA_DIR)
         self.TRANSFORMED_TRAIN_FILE_PATH: str = os.path.join(self.TRANSFORMED_TRAIN_DATA_DIR, TRANSFORMED_TRAIN_DATA_FILE_NAME)
         self.TRANSFORMED_TEST_FILE_PATH: str = os.path.join(self.TRANSFORMED_TEST_DATA_DIR, TRANSFORMED_TEST_DATA_FILE_NAME)
+        self.TRANSFORMED_TRAIN_TARGET_FILE_PATH: str = os.path.join(self.TRANSFORMED_TRAIN_DATA_DIR, TRANSFORMED_TRAIN_TARGET_FILE_NAME)
+        self.TRANSFORMED_TEST_TARGET_FILE_PATH: str = os.path.join(self.TRANSFORMED_TEST_DATA_DIR, TRANSFORMED_TEST_TARGET_FILE_NAME)
         self.PREPROCESSOR_FILE_PATH = os.path.join(from_root(), ARTIFACTS_DIR, DATA_TRANSFORMATION_ARTIFCATS_DIR, PREPROCESSOR_OBJECT_FILE_NAME)
 
 @dataclass
@@ -52,6 +66,7 @@ class ModelTrainerConfig:
         self.MODEL_TRAINER_ARTIFACTS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR, MODEL_TRAINER_ARTIFACTS_DIR)
         self.PREPROCESSOR_OBJECT_FILE_PATH: str = os.path.join(self.DATA_TRANSFORMATION_ARTIFACTS_DIR, PREPROCESSOR_OBJECT_FILE_NAME)
         self.TRAINED_MODEL_FILE_PATH: str = os.path.join(from_root(), ARTIFACTS_DIR, MODEL_TRAINER_ARTIFACTS_DIR, MODEL_FILE_NAME)
+        self.CV_RESULTS_FILE_PATH: str = os.path.join(from_root(), ARTIFACTS_DIR, MODEL_TRAINER_ARTIFACTS_DIR, MODEL_CV_RESULTS_FILE_NAME)
 
 @dataclass
 class ModelEvaluationConfig:
@@ -68,5 +83,6 @@ class ModelPusherConfig:
         self.BEST_MODEL_PATH: str = os.path.join(from_root(), ARTIFACTS_DIR, MODEL_TRAINER_ARTIFACTS_DIR, MODEL_FILE_NAME)
         self.BUCKET_NAME: str = BUCKET_NAME
         self.S3_MODEL_KEY_PATH: str = os.path.join(S3_MODEL_NAME)
+        self.MODEL_TRANSFER_COMPRESSION: str = MODEL_TRANSFER_COMPRESSION
 
 
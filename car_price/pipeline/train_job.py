@@ -0,0 +1,164 @@
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict
+from typing import Dict, Optional
+from car_price.constant import TRAIN_JOB_MAX_HISTORY, TRAIN_JOB_NICENESS
+from car_price.exception import CarException
+from car_price.pipeline.train_pipeline import STAGES
+
+logger = logging.getLogger(__name__)
+
+JOB_POLL_INTERVAL_SECONDS = 1
+
+
+class TrainJobConflictError(Exception):
+    def __init__(self, job_id: str):
+        super().__init__(f"Training job {job_id} is already running")
+        self.job_id = job_id
+
+
+def _run_train_job(job_id: str, events: multiprocessing.Queue) -> None:
+    """Entry point of the training worker process, reports progress back through events."""
+    from car_price.pipeline.train_pipeline import TrainPipeline
+
+    def stage_callback(stage: str, status: str, duration: Optional[float] = None) -> None:
+        events.put({"type": "stage", "stage": stage, "status": status, "duration": duration, "time": time.time()})
+
+    try:
+        model_evaluation_artifact = TrainPipeline(stage_callback=stage_callback).run_pipeline()
+        events.put({"type": "finished", "status": "succeeded", "time": time.time(),
+                    "model_evaluation_artifact": asdict(model_evaluation_artifact)})
+
+    except Exception as e:
+        events.put({"type": "finished", "status": "failed", "time": time.time(), "error": str(e)})
+
+
+class TrainJobManager:
+    """
+    Runs TrainPipeline in a separate worker process and tracks per-stage progress.
+
+    Only one job may run at a time; submitting while one is active raises TrainJobConflictError.
+    Only the max_history most recently submitted finished jobs are kept, older ones are no longer found.
+    """
+
+    def __init__(self, max_history: int = TRAIN_JOB_MAX_HISTORY):
+        self._context = multiprocessing.get_context("spawn")
+        self.max_history = max_history
+        self._jobs: Dict[str, Dict] = {}
+        self._active_job_id: Optional[str] = None
+        self._lock = threading.Lock()
+
+
+    def submit(self) -> str:
+        logger.info("Entered submit method of TrainJobManager class")
+        job_id = None
+        try:
+            with self._lock:
+                if self._active_job_id is not None:
+                    raise TrainJobConflictError(self._active_job_id)
+                job_id = uuid.uuid4().hex
+                self._jobs[job_id] = {
+                    "job_id": job_id,
+                    "status": "running",
+                    "submitted_at": time.time(),
+                    "finished_at": None,
+                    "stages": {stage: {"status": "pending", "started_at": None, "duration_seconds": None} for stage in STAGES},
+                    "model_evaluation_artifact": None,
+                    "error": None,
+                }
+                self._active_job_id = job_id
+
+            events = self._context.Queue()
+            process = self._context.Process(target=_run_train_job, args=(job_id, events), name=f"train-{job_id}")
+            process.start()
+            if TRAIN_JOB_NICENESS and hasattr(os, "setpriority"):
+                # set from here rather than in the worker so the spawned interpreter's imports already run at the
+                # lower priority, the threads and processes the model search starts inherit it
+                os.setpriority(os.PRIO_PROCESS, process.pid, TRAIN_JOB_NICENESS)
+            threading.Thread(target=self._monitor, args=(job_id, process, events), name=f"train-monitor-{job_id}",
+                             daemon=True).start()
+            logger.info(f"Started training job {job_id} in process {process.pid}")
+            logger.info("Exited submit method of TrainJobManager class")
+            return job_id
+
+        except TrainJobConflictError:
+            raise
+
+        except Exception as e:
+            with self._lock:
+                # the caller never gets the id of a job that failed to start
+                self._jobs.pop(job_id, None)
+                self._active_job_id = None
+            raise CarException(e, sys) from e
+
+
+    def _apply_event(self, job: Dict, event: Dict) -> None:
+        if event["type"] == "stage":
+            stage = job["stages"][event["stage"]]
+            stage["status"] = event["status"]
+            if event["status"] == "running":
+                stage["started_at"] = event["time"]
+            if event["duration"] is not None:
+                stage["duration_seconds"] = event["duration"]
+        else:
+            job["status"] = event["status"]
+            job["finished_at"] = event["time"]
+            job["error"] = event.get("error")
+            job["model_evaluation_artifact"] = event.get("model_evaluation_artifact")
+
+
+    def _evict_finished_jobs(self) -> None:
+        """Drops the oldest finished jobs beyond max_history, called with the lock held."""
+        finished_job_ids = [job_id for job_id in self._jobs if job_id != self._active_job_id]
+        for job_id in finished_job_ids[:max(len(finished_job_ids) - self.max_history, 0)]:
+            del self._jobs[job_id]
+
+
+    def _monitor(self, job_id: str, process: multiprocessing.Process, events: multiprocessing.Queue) -> None:
+        finished = False
+        while not finished:
+            try:
+                event = events.get(timeout=JOB_POLL_INTERVAL_SECONDS)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                # the process can put its last events and exit after the get timed out, they are still queued
+                drained = []
+                while True:
+                    try:
+                        drained.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+                with self._lock:
+                    job = self._jobs[job_id]
+                    for event in drained:
+                        self._apply_event(job, event)
+                    if not any(event["type"] == "finished" for event in drained):
+                        job["status"] = "failed"
+                        job["finished_at"] = time.time()
+                        job["error"] = f"Training process exited with code {process.exitcode}"
+                break
+            with self._lock:
+                self._apply_event(self._jobs[job_id], event)
+            finished = event["type"] == "finished"
+        process.join()
+        with self._lock:
+            if self._active_job_id == job_id:
+                self._active_job_id = None
+            status = self._jobs[job_id]["status"]
+            self._evict_finished_jobs()
+        logger.info(f"Training job {job_id} finished with status {status}")
+
+
+    def get_status(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, "stages": {stage: dict(info) for stage, info in job["stages"].items()}}
@@ -1,4 +1,6 @@
 import sys
+import time
+from typing import Callable, Dict, Optional, Type
 from car_price.configuration.mongo_operations import MongoDBOperation
 from car_price.entity.artifacts_entity import DataIngestionArtifacts, DataTransformationArtifacts, DataValidationArtifacts, ModelEvaluationArtifact, ModelPusherArtifacts, ModelTrainerArtifacts
 from car_price.entity.config_entity import DataIngestionConfig, DataTransformationConfig, DataValidationConfig, ModelEvaluationConfig, ModelPusherConfig, ModelTrainerConfig
@@ -9,13 +11,20 @@ from car_price.components.model_pusher import ModelPusher
 from car_price.components.model_trainer import ModelTrainer
 from car_price.components.model_evaluation import ModelEvaluation
 from car_price.configuration.s3_operations import S3Operation
+from car_price.constant import CONFIG_FILE_PATH, STAGE_CACHE_ENABLED
 from car_price.exception import CarException
+from car_price.utils.stage_cache import StageCache
 import logging
 
 logger = logging.getLogger(__name__)
 
+STAGES = ["data_ingestion", "data_validation", "data_transformation", "model_trainer", "model_evaluation", "model_pusher"]
+
+
 class TrainPipeline:
-    def __init__(self):
+    def __init__(self, stage_callback: Optional[Callable[..., None]] = None):
+        self.stage_callback = stage_callback
+        self.stage_durations: Dict[str, float] = {}
         self.data_ingestion_config = DataIngestionConfig()
         self.data_validation_config = DataValidationConfig()
         self.data_transformation_config = DataTransformationConfig()
@@ -24,6 +33,7 @@ class TrainPipeline:
         self.model_pusher_config = ModelPusherConfig()
         self.mongo_op = MongoDBOperation()
         self.s3_operations = S3Operation()
+        self.stage_cache = StageCache() if STAGE_CACHE_ENABLED else None
 
     def start_data_ingestion(self) -> DataIngestionArtifacts:
         logger.info("Entered the start_data_ingestion method of TrainPipeline class")
@@ -72,10 +82,12 @@ class TrainPipeline:
         except Exception as e:
             raise CarException(e, sys) from e
 
-    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifacts) -> ModelTrainerArtifacts:
+    def start_model_trainer(self, data_transformation_artifact: DataTransformationArtifacts,
+                            data_ingestion_artifact: DataIngestionArtifacts = None) -> ModelTrainerArtifacts:
         try:
             model_trainer = ModelTrainer(data_transformation_artifact=data_transformation_artifact,
-                                         model_trainer_config=self.model_trainer_config
+                                         model_trainer_config=self.model_trainer_config,
+                                         data_ingestion_artifact=data_ingestion_artifact
                                          )
             model_trainer_artifact = model_trainer.initiate_model_trainer()   
             return model_trainer_artifact
@@ -110,26 +122,103 @@ class TrainPipeline:
             raise CarException(e, sys) from e
 
 
-    def run_pipeline(self) -> None:
+    def _notify(self, stage: str, status: str, duration: Optional[float] = None) -> None:
+        if self.stage_callback is not None:
+            self.stage_callback(stage=stage, status=status, duration=duration)
+
+
+    def run_stage(self, stage: str, stage_func: Callable, **kwargs) -> object:
+        self._notify(stage, "running")
+        start_time = time.perf_counter()
+        try:
+            result = stage_func(**kwargs)
+
+        except Exception:
+            self._notify(stage, "failed", time.perf_counter() - start_time)
+            raise
+
+        duration = time.perf_counter() - start_time
+        self.stage_durations[stage] = duration
+        logger.info(f"Stage {stage} completed in {duration:.2f} seconds")
+        self._notify(stage, "succeeded", duration)
+        return result
+
+
+    def get_stage_cache_keys(self, data_ingestion_artifact: DataIngestionArtifacts) -> Dict[str, str]:
+        logger.info("Entered the get_stage_cache_keys method of TrainPipeline class")
+        try:
+            data_files = [data_ingestion_artifact.train_data_file_path, data_ingestion_artifact.test_data_file_path]
+            schema_config = self.data_transformation_config.SCHEMA_CONFIG
+            model_config = self.model_trainer_config.UTILS.read_model_config_file()
+            # base_model_score is rewritten by every successful training run, it is not an input
+            model_config = {name: value for name, value in model_config.items() if name != "base_model_score"}
+            car_list_config = self.model_trainer_config.UTILS.read_yaml_file(CONFIG_FILE_PATH)
+            data_key = StageCache.make_key("data", file_paths=data_files)
+            data_transformation_key = StageCache.make_key("data_transformation", configs=[schema_config], parent_keys=[data_key])
+            stage_cache_keys = {
+                "data_validation": StageCache.make_key("data_validation", configs=[schema_config], parent_keys=[data_key]),
+                "data_transformation": data_transformation_key,
+                "model_trainer": StageCache.make_key("model_trainer", configs=[model_config, car_list_config],
+                                                     parent_keys=[data_transformation_key]),
+            }
+            logger.info(f"Stage cache keys: { {stage: key[:12] for stage, key in stage_cache_keys.items()} }")
+            logger.info("Exited the get_stage_cache_keys method of TrainPipeline class")
+            return stage_cache_keys
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def run_cached_stage(self, stage: str, stage_cache_keys: Dict[str, str], artifact_cls: Type, stage_func: Callable,
+                            **kwargs) -> object:
+        if self.stage_cache is None:
+            return self.run_stage(stage, stage_func, **kwargs)
+        start_time = time.perf_counter()
+        artifact = self.stage_cache.load(stage, stage_cache_keys[stage], artifact_cls)
+        if artifact is not None:
+            duration = time.perf_counter() - start_time
+            self.stage_durations[stage] = duration
+            logger.info(f"Stage {stage} reused cached artifacts in {duration:.2f} seconds")
+            self._notify(stage, "cached", duration)
+            return artifact
+        artifact = self.run_stage(stage, stage_func, **kwargs)
+        self.stage_cache.save(stage, stage_cache_keys[stage], artifact)
+        return artifact
+
+
+    def run_pipeline(self) -> ModelEvaluationArtifact:
         logger.info("Entered the run_pipeline method of TrainPipeline class")
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
+            data_ingestion_artifact = self.run_stage("data_ingestion", self.start_data_ingestion)
+            stage_cache_keys = self.get_stage_cache_keys(data_ingestion_artifact) if self.stage_cache is not None else {}
             
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
+            data_validation_artifact = self.run_cached_stage("data_validation", stage_cache_keys, DataValidationArtifacts,
+                                                             self.start_data_validation,
+                                                             data_ingestion_artifact=data_ingestion_artifact)
             
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact)
+            data_transformation_artifact = self.run_cached_stage("data_transformation", stage_cache_keys, DataTransformationArtifacts,
+                                                                 self.start_data_transformation,
+                                                                 data_ingestion_artifact=data_ingestion_artifact)
             
-            model_trainer_artifact = self.start_model_trainer(data_transformation_artifact=data_transformation_artifact)
+            model_trainer_artifact = self.run_cached_stage("model_trainer", stage_cache_keys, ModelTrainerArtifacts,
+                                                           self.start_model_trainer,
+                                                           data_transformation_artifact=data_transformation_artifact,
+                                                           data_ingestion_artifact=data_ingestion_artifact)
             
-            model_evaluation_artifact = self.start_model_evaluation(data_ingestion_artifact=data_ingestion_artifact,
-                                                                    model_trainer_artifact=model_trainer_artifact)
+            model_evaluation_artifact = self.run_stage("model_evaluation", self.start_model_evaluation,
+                                                       data_ingestion_artifact=data_ingestion_artifact,
+                                                       model_trainer_artifact=model_trainer_artifact)
             if not model_evaluation_artifact.is_model_accepted:
                 logger.info("Model not accepted")
-                return None
-            model_pusher_artifact = self.start_model_pusher(model_trainer_artifacts=model_trainer_artifact, 
-                                                            s3=self.s3_operations, 
-                                                            data_transformation_artifacts=data_transformation_artifact)
+                self._notify("model_pusher", "skipped")
+                return model_evaluation_artifact
+            model_pusher_artifact = self.run_stage("model_pusher", self.start_model_pusher,
+                                                   model_trainer_artifacts=model_trainer_artifact, 
+                                                   s3=self.s3_operations, 
+                                                   data_transformation_artifacts=data_transformation_artifact)
+            logger.info(f"Pipeline stage durations in seconds: {self.stage_durations}")
             logger.info("Exited the run_pipeline method of TrainPipeline class")
+            return model_evaluation_artifact
 
         except Exception as e:
             raise CarException(e, sys) from e
\ No newline at end of file
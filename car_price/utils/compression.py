@@ -0,0 +1,135 @@
+import importlib
+import io
+import logging
+from typing import BinaryIO, Iterable, Iterator, Optional
+from car_price.constant import TRANSFER_COMPRESSION_CODECS
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MAGIC = {b"\x28\xb5\x2f\xfd": "zstd", b"\x04\x22\x4d\x18": "lz4"}
+COMPRESSION_MAGIC_SIZE = 4
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """Codec of a zstd or lz4 frame from its leading magic bytes, None for anything else."""
+    return COMPRESSION_MAGIC.get(bytes(head[:COMPRESSION_MAGIC_SIZE]))
+
+
+class TransferCodec:
+    """
+    Streaming zstd or lz4 frame compression of model transfers.
+
+    zstandard and lz4 are optional packages, only the codec in use is imported. Compressed objects
+    are single frames, so downloads recognise them by their magic bytes and no S3 metadata is needed.
+    """
+
+    def __init__(self, name: str, level: Optional[int] = None):
+        if name not in TRANSFER_COMPRESSION_CODECS:
+            raise ValueError(f"Unsupported compression {name}, expected one of {sorted(TRANSFER_COMPRESSION_CODECS)}")
+        module_name = TRANSFER_COMPRESSION_CODECS[name]
+        try:
+            self.module = importlib.import_module(module_name)
+        except ImportError as e:
+            raise ImportError(f"{name} compression needs the optional {module_name} package, install it "
+                              f"or set MODEL_TRANSFER_COMPRESSION=none") from e
+        self.name = name
+        self.level = level
+
+
+    def compress_chunks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        if self.name == "zstd":
+            compressor = self.module.ZstdCompressor(level=self.level if self.level is not None else 3).compressobj()
+        else:
+            compressor = self.module.LZ4FrameCompressor(compression_level=self.level if self.level is not None else 0)
+            yield compressor.begin()
+        for chunk in chunks:
+            yield compressor.compress(chunk)
+        yield compressor.flush()
+
+
+    def decompressor(self) -> object:
+        """Incremental decompressor with decompress(chunk) and an eof flag set once the frame is complete."""
+        if self.name == "zstd":
+            return self.module.ZstdDecompressor().decompressobj()
+        return self.module.LZ4FrameDecompressor()
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only, non-seekable stream over an iterable of byte chunks."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = memoryview(b"")
+        self.bytes_out = 0
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer) -> int:
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = memoryview(chunk)
+        n = min(len(buffer), len(self._buffer))
+        buffer[:n] = self._buffer[:n]
+        # a view rather than a copy of the rest, readers asking for little at a time stay linear in the chunk size
+        self._buffer = self._buffer[n:]
+        self.bytes_out += n
+        return n
+
+
+    def close(self) -> None:
+        # stops a generator of chunks early, which closes the download it reads from
+        close_chunks = getattr(self._chunks, "close", None)
+        if close_chunks is not None:
+            close_chunks()
+        super().close()
+
+
+class CompressingReader(ChunkReader):
+    """Stream of the compressed content of file_obj, for multipart upload_fileobj."""
+
+    def __init__(self, file_obj: BinaryIO, codec: TransferCodec, read_size: int):
+        super().__init__(codec.compress_chunks(iter(lambda: file_obj.read(read_size), b"")))
+
+
+class DecompressingReader(ChunkReader):
+    """
+    Stream of the decompressed content of an iterable of downloaded chunks.
+
+    The codec is picked from the magic bytes of the first chunk, content that is not a zstd or lz4
+    frame is read through unchanged. Chunks are decompressed as they are read, so a deserializer
+    reading from it never needs the whole object in memory.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self.compression: Optional[str] = None
+        self.bytes_in = 0
+        super().__init__(self._decompress_chunks(chunks))
+
+
+    def _decompress_chunks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        chunks = iter(chunks)
+        head = b""
+        for chunk in chunks:
+            self.bytes_in += len(chunk)
+            head += chunk
+            if len(head) >= COMPRESSION_MAGIC_SIZE:
+                break
+        self.compression = detect_compression(head)
+        if self.compression is None:
+            yield head
+            for chunk in chunks:
+                self.bytes_in += len(chunk)
+                yield chunk
+            return
+        decompressor = TransferCodec(self.compression).decompressor()
+        yield decompressor.decompress(head)
+        for chunk in chunks:
+            self.bytes_in += len(chunk)
+            yield decompressor.decompress(chunk)
+        if not decompressor.eof:
+            raise ValueError(f"Truncated {self.compression} stream after {self.bytes_in} bytes")
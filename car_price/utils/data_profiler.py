@@ -0,0 +1,165 @@
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from car_price.constant import PROFILE_QUANTILES, PROFILE_SAMPLE_SIZE, PROFILE_EXACT_DISTINCT_LIMIT, \
+    PROFILE_HLL_PRECISION, RANDOM_STATE
+
+logger = logging.getLogger(__name__)
+
+
+class HyperLogLog:
+    """Vectorized HyperLogLog sketch over 64-bit hashes, mergeable across chunks."""
+
+    def __init__(self, precision: int = PROFILE_HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        if len(hashes) == 0:
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        # rank of the first set bit in the remaining 64 - p bits; the top 53 bits are enough
+        # for an exact float64 exponent, anything further down is capped at the maximum rank
+        remainder = ((hashes << np.uint64(p)) >> np.uint64(11)).astype(np.float64)
+        rank = np.where(remainder > 0, 54 - np.frexp(remainder)[1], 64 - p + 1)
+        np.maximum.at(self.registers, index, np.minimum(rank, 64 - p + 1).astype(np.uint8))
+
+
+    def count(self) -> int:
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class ColumnProfile:
+    """
+    Running statistics of one column: nulls, distinct count, and for numeric columns min/max/mean and a sample for quantiles.
+
+    Distinct values are kept exactly until there are more than PROFILE_EXACT_DISTINCT_LIMIT of them,
+    after which they are folded into a HyperLogLog sketch that only sees the distinct values of each chunk.
+    """
+
+    def __init__(self, column: str, numeric: bool, rng: np.random.Generator):
+        self.column = column
+        self.numeric = numeric
+        self.rng = rng
+        self.count = 0
+        self.null_count = 0
+        self.distinct_values: Optional[np.ndarray] = None
+        self.hll: Optional[HyperLogLog] = None
+        self.min = self.max = None
+        self.sum = 0.0
+        self.sample = np.empty(0, dtype=np.float64)
+        self.sample_keys = np.empty(0, dtype=np.float64)
+
+
+    @staticmethod
+    def _unique_values(values: pd.Series) -> np.ndarray:
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            return np.asarray(values.cat.categories)[pd.unique(values.cat.codes.to_numpy())]
+        return pd.unique(values.to_numpy())
+
+
+    def _update_distinct(self, values: pd.Series) -> None:
+        unique_values = self._unique_values(values)
+        if self.hll is not None:
+            self.hll.add_hashes(pd.util.hash_array(unique_values))
+            return
+        if self.distinct_values is not None:
+            unique_values = pd.unique(np.concatenate([self.distinct_values, unique_values]))
+        self.distinct_values = unique_values
+        if len(self.distinct_values) > PROFILE_EXACT_DISTINCT_LIMIT:
+            self.hll = HyperLogLog()
+            self.hll.add_hashes(pd.util.hash_array(self.distinct_values))
+            self.distinct_values = None
+
+
+    def update(self, values: pd.Series) -> None:
+        is_null = values.isna().to_numpy()
+        n_null = int(is_null.sum())
+        self.null_count += n_null
+        self.count += len(values) - n_null
+        values = values[~is_null] if n_null else values
+        if len(values) == 0:
+            return
+
+        self._update_distinct(values)
+        if self.numeric:
+            numbers = values.to_numpy(dtype=np.float64)
+            chunk_min, chunk_max = float(numbers.min()), float(numbers.max())
+            self.min = chunk_min if self.min is None else min(self.min, chunk_min)
+            self.max = chunk_max if self.max is None else max(self.max, chunk_max)
+            self.sum += float(numbers.sum())
+            # bottom-k of uniform random keys is a uniform sample without replacement over all chunks
+            keys = np.concatenate([self.sample_keys, self.rng.random(len(numbers))])
+            sample = np.concatenate([self.sample, numbers])
+            if len(keys) > PROFILE_SAMPLE_SIZE:
+                keep = np.argpartition(keys, PROFILE_SAMPLE_SIZE)[:PROFILE_SAMPLE_SIZE]
+                keys, sample = keys[keep], sample[keep]
+            self.sample_keys, self.sample = keys, sample
+
+
+    def to_dict(self) -> Dict:
+        profile = {
+            "kind": "numeric" if self.numeric else "categorical",
+            "count": self.count,
+            "null_count": self.null_count,
+            "distinct_count": self.hll.count() if self.hll is not None else len(self.distinct_values if self.distinct_values is not None else []),
+            "distinct_is_exact": self.hll is None,
+        }
+        if self.numeric and self.count:
+            profile.update({
+                "min": self.min,
+                "max": self.max,
+                "mean": self.sum / self.count,
+                "quantiles": {float(q): float(v) for q, v in zip(PROFILE_QUANTILES, np.quantile(self.sample, PROFILE_QUANTILES))},
+                "quantiles_are_exact": self.count <= PROFILE_SAMPLE_SIZE,
+            })
+        return profile
+
+
+class DataProfiler:
+    """
+    One-pass column profiler for a DataFrame or a stream of DataFrame chunks.
+
+    Distinct counts are exact up to PROFILE_EXACT_DISTINCT_LIMIT values and HyperLogLog
+    estimates beyond, quantiles come from a uniform sample of PROFILE_SAMPLE_SIZE values
+    and are exact for columns that fit in it.
+    """
+
+    def __init__(self, columns: List[str] = None):
+        self.columns = columns
+        self.n_rows = 0
+        self.profiles: Dict[str, ColumnProfile] = {}
+        self.rng = np.random.default_rng(RANDOM_STATE)
+
+
+    def update(self, df: DataFrame) -> "DataProfiler":
+        for column in (self.columns or df.columns):
+            if column not in df.columns:
+                continue
+            if column not in self.profiles:
+                numeric = pd.api.types.is_numeric_dtype(df[column]) and not pd.api.types.is_bool_dtype(df[column])
+                self.profiles[column] = ColumnProfile(column, numeric, self.rng)
+            self.profiles[column].update(df[column])
+        self.n_rows += len(df)
+        return self
+
+
+    def to_dict(self) -> Dict:
+        return {
+            "n_rows": self.n_rows,
+            "columns": {column: profile.to_dict() for column, profile in self.profiles.items()},
+        }
+
+
+    @classmethod
+    def profile_dataframe(cls, df: DataFrame, columns: List[str] = None) -> Dict:
+        return cls(columns).update(df).to_dict()
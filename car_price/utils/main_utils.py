@@ -1,20 +1,133 @@
+import os
 import shutil
 import sys
-from typing import Dict, Tuple, List
+import time
+from functools import lru_cache
+from typing import Dict, Iterator, Tuple, List, Union
 import dill
-import xgboost
+import importlib
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 import yaml
 from pandas import DataFrame
+from scipy import sparse
+from joblib import parallel_backend
 from sklearn.metrics import r2_score
-from sklearn.model_selection import GridSearchCV
-from sklearn.utils import all_estimators
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import GridSearchCV, HalvingRandomSearchCV, ParameterGrid, RandomizedSearchCV
 from yaml import safe_dump
-from car_price.constant import MODEL_CONFIG_FILE, SCHEMA_FILE_PATH, CONFIG_FILE_PATH
+from car_price.constant import MODEL_CONFIG_FILE, SCHEMA_FILE_PATH, CONFIG_FILE_PATH, SCHEMA_DTYPE_MAPPING, MODEL_SEARCH_DEFAULTS, RANDOM_STATE, \
+    SUPPORTED_MODELS, MODEL_BUNDLE_ENABLED
+from car_price.entity.artifacts_entity import ModelSearchArtifacts
 from car_price.exception import CarException
+from car_price.utils.data_profiler import DataProfiler
+from car_price.utils.model_bundle import ModelBundle, is_model_bundle
+from car_price.utils.model_search import EarlyStoppingSearchCV, WarmStartSearchCV
 import logging
 
+DENSE_MATRIX_FILE_NAME = "features.npy"
+SPARSE_MATRIX_PARTS = ("data", "indices", "indptr")
+ARROW_SCHEMA_TYPES = {"category": pa.string(), "int": pa.int64(), "float": pa.float64()}
+
+
+def get_artifact_format(file_path: str) -> str:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".parquet":
+        return "parquet"
+    if extension in (".feather", ".arrow"):
+        return "feather"
+    if extension == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported artifact format for {file_path}")
+
+
+@lru_cache(maxsize=None)
+def get_model_class(model_name: str) -> type:
+    """Resolves a model.yaml model name to its class, importing only the module that defines it."""
+    if model_name not in SUPPORTED_MODELS:
+        raise ValueError(f"Unsupported model {model_name}, expected one of {sorted(SUPPORTED_MODELS)}")
+    module_name, class_name = SUPPORTED_MODELS[model_name].split(":")
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(f"{model_name} needs the optional {module_name} package, install it to train this model") from e
+    return getattr(module, class_name)
+
+
+def _to_arrow_array(values: pd.Series, arrow_type: pa.DataType) -> pa.Array:
+    if pa.types.is_string(arrow_type):
+        # categories differ from chunk to chunk, so they are written as plain strings and
+        # restored from schema.yaml on load
+        values = values.astype(object)
+        try:
+            return pa.array(values, type=arrow_type, from_pandas=True)
+        except (pa.ArrowTypeError, pa.ArrowInvalid):
+            # a category stored as a number in some documents
+            values = values.map(str, na_action="ignore")
+    elif values.dtype == object:
+        values = pd.to_numeric(values, errors="coerce")
+    # NaN becomes null, so an int column holding NaN in some chunk is stored as nullable int64, and
+    # fractional values of an int column are truncated like the astype of the chunks without NaN
+    return pa.array(values, type=arrow_type, from_pandas=True, safe=False)
+
+
+class DataFrameArtifactWriter:
+    """
+    Appends DataFrame chunks to a csv, parquet or feather (Arrow IPC) artifact file.
+
+    Parquet and feather columns take the Arrow type of their schema.yaml dtype, so every chunk is
+    written with the same schema whatever pandas inferred for it. Columns not in the schema keep the
+    type of the first chunk and columns missing from a chunk are written as nulls.
+    """
+
+    def __init__(self, file_path: str, schema_config: dict = None):
+        self.file_path = file_path
+        self.artifact_format = get_artifact_format(file_path)
+        self.schema_config = schema_config
+        self._writer = None
+        self._schema = None
+        self.n_rows = 0
+
+    def _get_arrow_schema(self, df: DataFrame) -> pa.Schema:
+        schema_dtypes = self.schema_config["columns"] if self.schema_config is not None else {}
+        fields = []
+        for column in df.columns:
+            if column in schema_dtypes:
+                fields.append(pa.field(column, ARROW_SCHEMA_TYPES[schema_dtypes[column]]))
+            else:
+                values = df[column].astype(object) if isinstance(df[column].dtype, pd.CategoricalDtype) else df[column]
+                fields.append(pa.field(column, pa.Array.from_pandas(values).type))
+        return pa.schema(fields)
+
+    def write(self, df: DataFrame) -> None:
+        if self.artifact_format == "csv":
+            df.to_csv(self.file_path, mode="w" if self.n_rows == 0 else "a", index=False, header=self.n_rows == 0)
+        else:
+            if self._writer is None:
+                self._schema = self._get_arrow_schema(df)
+                if self.artifact_format == "parquet":
+                    self._writer = pq.ParquetWriter(self.file_path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.file_path, self._schema)
+            arrays = [_to_arrow_array(df[field.name], field.type) if field.name in df.columns else pa.nulls(len(df), field.type)
+                      for field in self._schema]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self) -> "DataFrameArtifactWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
 
 class MainUtils:
 
@@ -46,6 +159,107 @@ class MainUtils:
             raise CarException(e, sys) from e
 
 
+    def get_schema_dtypes(self, schema_config: dict = None) -> Dict[str, str]:
+        try:
+            schema_config = self.read_schema_file_path() if schema_config is None else schema_config
+            return {column: SCHEMA_DTYPE_MAPPING[dtype] for column, dtype in schema_config["columns"].items()}
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def cast_to_schema_dtypes(self, df: DataFrame, schema_config: dict = None) -> DataFrame:
+        try:
+            for column, dtype in self.get_schema_dtypes(schema_config).items():
+                if column not in df.columns:
+                    continue
+                if dtype == "category":
+                    df[column] = df[column].astype("category")
+                else:
+                    values = pd.to_numeric(df[column], errors="coerce")
+                    df[column] = values if values.isna().any() else values.astype(dtype)
+            return df
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def save_dataframe(self, df: DataFrame, file_path: str) -> str:
+        logging.info("Entered the save_dataframe method of MainUtils class")
+        try:
+            start_time = time.perf_counter()
+            artifact_format = get_artifact_format(file_path)
+            if artifact_format == "parquet":
+                df.to_parquet(file_path, index=False)
+            elif artifact_format == "feather":
+                feather.write_feather(df.reset_index(drop=True), file_path, compression="uncompressed")
+            else:
+                df.to_csv(file_path, index=False, header=True)
+            logging.info(f"Saved {len(df)} rows to {os.path.basename(file_path)} ({os.path.getsize(file_path)} bytes) "
+                         f"in {time.perf_counter() - start_time:.3f}s")
+            logging.info("Exited the save_dataframe method of MainUtils class")
+            return file_path
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def load_dataframe(self, file_path: str, schema_config: dict = None) -> DataFrame:
+        logging.info("Entered the load_dataframe method of MainUtils class")
+        try:
+            start_time = time.perf_counter()
+            artifact_format = get_artifact_format(file_path)
+            if artifact_format == "parquet":
+                df = pq.read_table(file_path, memory_map=True).to_pandas()
+            elif artifact_format == "feather":
+                df = feather.read_table(file_path, memory_map=True).to_pandas()
+            else:
+                df = pd.read_csv(file_path)
+            df = self.cast_to_schema_dtypes(df, schema_config)
+            logging.info(f"Loaded {len(df)} rows from {os.path.basename(file_path)} in {time.perf_counter() - start_time:.3f}s")
+            logging.info("Exited the load_dataframe method of MainUtils class")
+            return df
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def iter_artifact_chunks(self, file_path: str, chunk_size: int) -> Iterator[Union[pa.RecordBatch, DataFrame]]:
+        """Streams a data artifact as Arrow record batches (parquet, feather) or DataFrame chunks (csv) without loading it whole."""
+        logging.info("Entered the iter_artifact_chunks method of MainUtils class")
+        try:
+            artifact_format = get_artifact_format(file_path)
+            if artifact_format == "parquet":
+                yield from pq.ParquetFile(file_path, memory_map=True).iter_batches(batch_size=chunk_size)
+            elif artifact_format == "feather":
+                with pa.memory_map(file_path) as source:
+                    reader = pa.ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        yield reader.get_batch(i)
+            else:
+                yield from pd.read_csv(file_path, chunksize=chunk_size)
+            logging.info("Exited the iter_artifact_chunks method of MainUtils class")
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def load_data_profile(self, profile_file_path: str, df: DataFrame, columns: List[str] = None) -> dict:
+        logging.info("Entered the load_data_profile method of MainUtils class")
+        try:
+            if profile_file_path is not None and os.path.exists(profile_file_path):
+                profile = self.read_yaml_file(profile_file_path)
+                logging.info(f"Loaded the data profile from {os.path.basename(profile_file_path)}")
+            else:
+                profile = DataProfiler.profile_dataframe(df, columns)
+                logging.info(f"No data profile artifact found, profiled {len(df)} rows")
+            logging.info("Exited the load_data_profile method of MainUtils class")
+            return profile
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
     def read_model_config_file(self) -> dict:
         try:
             model_config = self.read_yaml_file(MODEL_CONFIG_FILE)
@@ -58,7 +272,7 @@ class MainUtils:
     def save_numpy_array_data(self, file_path: str, array: np.array):
         try:
             with open(file_path, 'wb') as file_obj:
-                np.save(file_obj, array)
+                np.save(file_obj, np.ascontiguousarray(array))
 
             return file_path
 
@@ -66,26 +280,114 @@ class MainUtils:
             raise CarException(e, sys) from e
 
 
-    def load_numpy_array_data(self, file_path: str) -> np.array:
+    def load_numpy_array_data(self, file_path: str, mmap_mode: str = None) -> np.array:
+        try:
+            return np.load(file_path, mmap_mode=mmap_mode)
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def save_feature_matrix(self, dir_path: str, matrix: Union[np.ndarray, sparse.spmatrix]) -> str:
+        logging.info("Entered the save_feature_matrix method of MainUtils class")
         try:
-            with open(file_path, 'rb') as file_obj:
-                return np.load(file_obj)
+            os.makedirs(dir_path, exist_ok=True)
+            if sparse.issparse(matrix):
+                csr = sparse.csr_matrix(matrix)
+                for part in SPARSE_MATRIX_PARTS:
+                    self.save_numpy_array_data(os.path.join(dir_path, f"{part}.npy"), getattr(csr, part))
+                self.save_numpy_array_data(os.path.join(dir_path, "shape.npy"), np.array(csr.shape))
+            else:
+                self.save_numpy_array_data(os.path.join(dir_path, DENSE_MATRIX_FILE_NAME), matrix)
+            logging.info("Exited the save_feature_matrix method of MainUtils class")
+            return dir_path
 
         except Exception as e:
             raise CarException(e, sys) from e
 
 
-    def get_tuned_model(self, model_name: str, train_x: DataFrame, train_y: DataFrame, test_x: DataFrame, test_y: DataFrame) -> Tuple[float, object, str]:
+    def load_feature_matrix(self, dir_path: str, mmap_mode: str = "r") -> Union[np.ndarray, sparse.csr_matrix]:
+        logging.info("Entered the load_feature_matrix method of MainUtils class")
+        try:
+            dense_file_path = os.path.join(dir_path, DENSE_MATRIX_FILE_NAME)
+            if os.path.exists(dense_file_path):
+                matrix = self.load_numpy_array_data(dense_file_path, mmap_mode=mmap_mode)
+            else:
+                data, indices, indptr = (self.load_numpy_array_data(os.path.join(dir_path, f"{part}.npy"), mmap_mode=mmap_mode)
+                                         for part in SPARSE_MATRIX_PARTS)
+                shape = tuple(self.load_numpy_array_data(os.path.join(dir_path, "shape.npy")))
+                matrix = sparse.csr_matrix((data, indices, indptr), shape=shape, copy=False)
+            logging.info("Exited the load_feature_matrix method of MainUtils class")
+            return matrix
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_search_config(self, model_config: dict = None) -> dict:
+        try:
+            model_config = self.read_model_config_file() if model_config is None else model_config
+            return {**MODEL_SEARCH_DEFAULTS, **(model_config.get("search_config") or {})}
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    @staticmethod
+    def get_core_allocation(search_config: dict, models_list: List[str]) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+        logging.info("Entered the get_core_allocation method of MainUtils class")
+        try:
+            n_cores = search_config["n_cores"]
+            total_cores = (os.cpu_count() or 1) if n_cores in (None, -1) else n_cores
+            n_concurrent = max(1, min(search_config["max_concurrent_models"], len(models_list), total_cores))
+            cores_per_model = max(1, total_cores // n_concurrent)
+            model_overrides = search_config.get("models") or {}
+            core_allocation = {}
+            for model_name in models_list:
+                estimator_threads = (model_overrides.get(model_name) or {}).get("estimator_threads", 1)
+                estimator_threads = max(1, min(estimator_threads, cores_per_model))
+                core_allocation[model_name] = (max(1, cores_per_model // estimator_threads), estimator_threads)
+            logging.info(f"Running {n_concurrent} model searches at once on {total_cores} cores, "
+                         f"(cv_jobs, estimator_threads) per model: {core_allocation}")
+            logging.info("Exited the get_core_allocation method of MainUtils class")
+            return n_concurrent, core_allocation
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    @staticmethod
+    def set_estimator_threads(model: object, n_threads: int) -> object:
+        params = model.get_params()
+        for param in ("n_jobs", "nthread", "thread_count"):
+            if param in params:
+                model.set_params(**{param: n_threads})
+        return model
+
+
+    def get_tuned_model(self, model_name: str, train_x: DataFrame, train_y: DataFrame, test_x: DataFrame, test_y: DataFrame,
+                        cv_jobs: int = -1, estimator_threads: int = None) -> ModelSearchArtifacts:
         logging.info("Entered the get_tuned_model method of MainUtils class")
         try:
             model = self.get_base_model(model_name)
-            model_best_params = self.get_model_params(model, train_x, train_y)
-            model.set_params(**model_best_params)
-            model.fit(train_x, train_y)
-            preds = model.predict(test_x)
+            if estimator_threads is not None:
+                self.set_estimator_threads(model, estimator_threads)
+            start = time.perf_counter()
+            model_search = self.get_model_search(model, train_x, train_y, n_jobs=cv_jobs)
+            search_seconds = time.perf_counter() - start
+            best_model = model_search.best_estimator_
+            preds = best_model.predict(test_x)
             model_score = self.get_model_score(test_y, preds)
+            model_search_artifacts = ModelSearchArtifacts(model_name=model_name,
+                                                          best_model=best_model,
+                                                          best_params=model_search.best_params_,
+                                                          best_cv_score=float(model_search.best_score_),
+                                                          test_score=model_score,
+                                                          cv_results=model_search.cv_results_,
+                                                          search_seconds=search_seconds)
+            logging.info(f"Tuned {model_name} in {search_seconds:.2f}s with params {model_search.best_params_}")
             logging.info("Exited the get_tuned_model method of MainUtils class")
-            return model_score, model, model.__class__.__name__
+            return model_search_artifacts
 
         except Exception as e:
             raise CarException(e, sys) from e
@@ -108,11 +410,7 @@ class MainUtils:
     def get_base_model(model_name: str) -> object:
         logging.info("Entered the get_base_model method of MainUtils class")
         try:
-            if model_name.lower().startswith("xgb") is True:
-                model = xgboost.__dict__[model_name]()
-            else:
-                model_idx = [model[0] for model in all_estimators()].index(model_name)
-                model = all_estimators().__getitem__(model_idx)[1]()
+            model = get_model_class(model_name)()
             logging.info("Exited the get_base_model method of MainUtils class")
             return model
 
@@ -120,20 +418,92 @@ class MainUtils:
             raise CarException(e, sys) from e
 
 
-    def get_model_params(self, model: object, x_train: DataFrame, y_train: DataFrame) -> Dict:
-        logging.info("Entered the get_model_params method of MainUtils class")
+    @staticmethod
+    def get_search_object(model: object, param_grid: Dict, model_search_config: Dict, **search_kwargs) -> object:
+        logging.info("Entered the get_search_object method of MainUtils class")
+        try:
+            strategy = model_search_config.get("strategy", "grid")
+            if strategy == "grid":
+                search = GridSearchCV(model, param_grid, **search_kwargs)
+            elif strategy == "random":
+                search = RandomizedSearchCV(model, param_grid, n_iter=model_search_config.get("n_iter", 10),
+                                            random_state=RANDOM_STATE, **search_kwargs)
+            elif strategy == "halving":
+                resource = model_search_config.get("resource", "n_samples")
+                if resource != "n_samples":
+                    param_grid = dict(param_grid)
+                    resource_values = param_grid.pop(resource)
+                halving_kwargs = {"resource": resource,
+                                  "factor": model_search_config.get("factor", 3),
+                                  "min_resources": model_search_config.get("min_resources", "exhaust"),
+                                  "n_candidates": model_search_config.get("n_candidates", len(ParameterGrid(param_grid)))}
+                if "max_resources" in model_search_config:
+                    halving_kwargs["max_resources"] = model_search_config["max_resources"]
+                elif resource != "n_samples":
+                    halving_kwargs["max_resources"] = max(resource_values)
+                search = HalvingRandomSearchCV(model, param_grid, random_state=RANDOM_STATE, **halving_kwargs, **search_kwargs)
+            elif strategy == "warm_start":
+                search = WarmStartSearchCV(model, param_grid, **search_kwargs)
+            elif strategy == "early_stopping":
+                search = EarlyStoppingSearchCV(model, param_grid,
+                                               early_stopping_rounds=model_search_config.get("early_stopping_rounds", 10),
+                                               validation_fraction=model_search_config.get("validation_fraction", 0.2),
+                                               **search_kwargs)
+            else:
+                raise ValueError(f"Unknown search strategy {strategy} for {model.__class__.__name__}")
+            logging.info(f"Using {type(search).__name__} for {model.__class__.__name__}")
+            logging.info("Exited the get_search_object method of MainUtils class")
+            return search
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_model_search(self, model: object, x_train: DataFrame, y_train: DataFrame, n_jobs: int = -1) -> object:
+        logging.info("Entered the get_model_search method of MainUtils class")
         try:
             VERBOSE = 3
             CV = 2
-            N_JOBS = -1
 
             model_name = model.__class__.__name__
             model_config = self.read_model_config_file()
             model_param_grid = model_config["train_model"][model_name]
-            model_grid = GridSearchCV(model, model_param_grid, verbose=VERBOSE, cv=CV, n_jobs=N_JOBS)
-            model_grid.fit(x_train, y_train)
+            search_config = self.get_search_config(model_config)
+            model_search_config = (search_config.get("models") or {}).get(model_name) or {}
+            model_grid = self.get_search_object(model, model_param_grid, model_search_config,
+                                                verbose=VERBOSE, cv=CV, n_jobs=n_jobs)
+            with parallel_backend(search_config["cv_backend"]):
+                model_grid.fit(x_train, y_train)
+            logging.info("Exited the get_model_search method of MainUtils class")
+            return model_grid
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def get_model_params(self, model: object, x_train: DataFrame, y_train: DataFrame, n_jobs: int = -1) -> Dict:
+        logging.info("Entered the get_model_params method of MainUtils class")
+        try:
+            model_best_params = self.get_model_search(model, x_train, y_train, n_jobs=n_jobs).best_params_
             logging.info("Exited the get_model_params method of MainUtils class")
-            return model_grid.best_params_
+            return model_best_params
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    @staticmethod
+    def save_cv_results(file_path: str, model_search_artifacts: List[ModelSearchArtifacts]) -> str:
+        logging.info("Entered the save_cv_results method of MainUtils class")
+        try:
+            cv_results = pd.concat([pd.DataFrame(artifact.cv_results).assign(model_name=artifact.model_name)
+                                    for artifact in model_search_artifacts], ignore_index=True)
+            cv_results.insert(0, "model_name", cv_results.pop("model_name"))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            cv_results.to_csv(file_path, index=False)
+            logging.info(f"Saved {len(cv_results)} cv results rows to {file_path}")
+            logging.info("Exited the save_cv_results method of MainUtils class")
+            return file_path
 
         except Exception as e:
             raise CarException(e, sys) from e
@@ -154,14 +524,50 @@ class MainUtils:
             raise CarException(e, sys) from e
 
 
+    def save_model(self, file_path: str, model: object) -> str:
+        """Saves a CarPriceModel as a pickle-free ModelBundle, falling back to a dill pickle for models that cannot be bundled."""
+        logging.info("Entered the save_model method of MainUtils class")
+        try:
+            if MODEL_BUNDLE_ENABLED:
+                try:
+                    ModelBundle.write(file_path, model, self.read_schema_file_path())
+                    logging.info("Exited the save_model method of MainUtils class")
+                    return file_path
+
+                except NotImplementedError as e:
+                    logging.warning(f"Saving the model as a pickle: {e}")
+            return self.save_object(file_path, model)
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def load_model(self, file_path: str, verify: bool = True) -> object:
+        logging.info("Entered the load_model method of MainUtils class")
+        try:
+            if not is_model_bundle(file_path):
+                return self.load_object(file_path)
+            model_bundle = ModelBundle(file_path)
+            if verify:
+                model_bundle.verify()
+            model = model_bundle.load_model(self.read_schema_file_path())
+            logging.info("Exited the load_model method of MainUtils class")
+            return model
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
     @staticmethod
-    def get_best_model_with_name_and_score(model_list: list) -> Tuple[object, float]:
+    def get_best_model_with_name_and_score(model_list: List[ModelSearchArtifacts]) -> Tuple[object, float]:
         logging.info(
             "Entered the get_best_model_with_name_and_score method of MainUtils class"
         )
         try:
-            best_score = max(model_list)[0]
-            best_model = max(model_list)[1]
+            best_model_search = max(model_list, key=lambda model_search: model_search.test_score)
+            best_score = best_model_search.test_score
+            best_model = best_model_search.best_model
+            logging.info(f"Best model is {best_model_search.model_name} with score {best_score}")
             logging.info(
                 "Exited the get_best_model_with_name_and_score method of MainUtils class"
             )
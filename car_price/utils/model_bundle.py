@@ -0,0 +1,299 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import platform
+import struct
+import sys
+import threading
+import time
+import uuid
+import zipfile
+from typing import BinaryIO, Dict, Optional
+import numpy as np
+from car_price.components.compiled_model import CategoryTable, CompiledPreprocessor, CompiledTreeEnsemble
+from car_price.constant import MODEL_BUNDLE_FORMAT, MODEL_BUNDLE_FORMAT_VERSION, MODEL_BUNDLE_ALIGNMENT
+from car_price.exception import CarException
+from car_price.utils.stage_cache import get_code_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+BOOSTER_NAME = "booster.ubj"
+DRIFT_REFERENCE_NAME = "drift_reference.json"
+ZIP_MAGIC = b"PK\x03\x04"
+ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+ZIP_PADDING_HEADER_ID = 0xD935
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def is_model_bundle(file_path: str) -> bool:
+    with open(file_path, "rb") as f:
+        return f.read(len(ZIP_MAGIC)) == ZIP_MAGIC
+
+
+def get_schema_hash(schema_config: Dict) -> str:
+    return hashlib.sha256(json.dumps(schema_config, sort_keys=True).encode()).hexdigest()
+
+
+class BundledBooster:
+    """
+    XGBoost booster of a model bundle, read from its native UBJSON member on the first predict.
+
+    Predicts like XGBRegressor.predict: inplace prediction up to the best iteration with the
+    model's missing value. xgboost is only imported once a batch too large for the compiled trees
+    needs the booster.
+    """
+
+    def __init__(self, bundle: "ModelBundle", model_type: str, missing: float, best_iteration: Optional[int]):
+        self.bundle = bundle
+        self.model_type = model_type
+        self.missing = missing
+        self.best_iteration = best_iteration
+        self._booster = None
+        self._lock = threading.Lock()
+
+
+    def get_booster(self) -> object:
+        if self._booster is None:
+            with self._lock:
+                if self._booster is None:
+                    import xgboost as xgb
+                    booster = xgb.Booster()
+                    booster.load_model(bytearray(self.bundle.read_member(BOOSTER_NAME)))
+                    self._booster = booster
+        return self._booster
+
+
+    def predict(self, X) -> np.ndarray:
+        iteration_range = (0, 0) if self.best_iteration is None else (0, self.best_iteration + 1)
+        return self.get_booster().inplace_predict(X, iteration_range=iteration_range, missing=self.missing)
+
+
+class ModelBundle:
+    """
+    Pickle-free file format of a CarPriceModel.
+
+    The bundle is an uncompressed zip archive holding a JSON manifest, every array of the compiled
+    preprocessor and compiled trees as a .npy member, the XGBoost booster in its native UBJSON format
+    (XGBoost models only) and the drift reference as JSON. Members are stored 64-byte aligned, so
+    arrays are memory-mapped straight out of the archive instead of being read into memory. The
+    manifest records the schema hash, the code and library versions and the sha256 of every member.
+    Only models whose preprocessor and trees could be compiled can be bundled; loading never
+    executes code from the file.
+    """
+
+    def __init__(self, file_path: str, file_obj: BinaryIO = None):
+        self.file_path = file_path
+        self._file = file_obj if file_obj is not None else open(file_path, "rb")
+        self._lock = threading.Lock()
+        with zipfile.ZipFile(self._file) as archive:
+            self.members = {info.filename: info for info in archive.infolist()}
+            self.manifest = json.loads(archive.read(MANIFEST_NAME))
+        if self.manifest.get("format") != MODEL_BUNDLE_FORMAT or self.manifest.get("format_version", 0) > MODEL_BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"{file_path} is not a supported model bundle: {self.manifest.get('format')} "
+                             f"version {self.manifest.get('format_version')}")
+
+
+    def _data_offset(self, name: str) -> int:
+        info = self.members[name]
+        self._file.seek(info.header_offset)
+        header = ZIP_LOCAL_HEADER.unpack(self._file.read(ZIP_LOCAL_HEADER.size))
+        return info.header_offset + ZIP_LOCAL_HEADER.size + header[-2] + header[-1]
+
+
+    def read_member(self, name: str) -> bytes:
+        with self._lock, zipfile.ZipFile(self._file) as archive:
+            return archive.read(name)
+
+
+    def array(self, name: str) -> np.ndarray:
+        """Read-only memory map of an array member; object arrays are refused, as np.load does without allow_pickle."""
+        with self._lock:
+            self._file.seek(self._data_offset(f"arrays/{name}.npy"))
+            version = np.lib.format.read_magic(self._file)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(self._file)
+            offset = self._file.tell()
+        if dtype.hasobject:
+            raise ValueError(f"Array {name} of {self.file_path} holds Python objects")
+        if int(np.prod(shape)) == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._file, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran_order else "C")
+
+
+    def verify(self) -> None:
+        """Checks the sha256 of every member against the manifest."""
+        with self._lock, zipfile.ZipFile(self._file) as archive:
+            for name, expected in self.manifest["files"].items():
+                digest = hashlib.sha256()
+                with archive.open(name) as member:
+                    for block in iter(lambda: member.read(HASH_BLOCK_SIZE), b""):
+                        digest.update(block)
+                if digest.hexdigest() != expected:
+                    raise ValueError(f"Member {name} of {self.file_path} does not match its manifest hash")
+
+
+    def _load_compiled_preprocessor(self) -> CompiledPreprocessor:
+        spec = self.manifest["compiled_preprocessor"]
+        category_tables = []
+        for i, table_spec in enumerate(spec["category_tables"]):
+            table = self.array(f"category_table_{i}")
+            category_tables.append((CategoryTable(table_spec["column"], table_spec["categories"], table[:-2], table[-2], table[-1]),
+                                    slice(*table_spec["output"])))
+        return CompiledPreprocessor(category_tables, spec["numeric_columns"], self.array("numeric_slice"),
+                                    self.array("numeric_lower"), self.array("numeric_upper"), self.array("numeric_mean"),
+                                    self.array("numeric_scale"), spec["n_features"], sparse_output=spec["sparse_output"])
+
+
+    def _load_compiled_trees(self) -> Optional[CompiledTreeEnsemble]:
+        spec = self.manifest["compiled_trees"]
+        if spec is None:
+            return None
+        trees = {key: self.array(f"trees_{key}") for key in ("feature", "threshold", "left", "right", "default_left", "value", "roots")}
+        trees["max_depth"] = spec["max_depth"]
+        missing_value = np.nan if spec["missing_value"] is None else spec["missing_value"]
+        return CompiledTreeEnsemble(trees, spec["offset"], spec["scale"], spec["inclusive_split"],
+                                    missing_value=missing_value, zero_as_missing=spec["zero_as_missing"])
+
+
+    def load_model(self, schema_config: Dict = None) -> object:
+        # imported here, model_trainer imports the config entities which import MainUtils and this module
+        from car_price.components.model_trainer import CarPriceModel
+        logger.info("Entered load_model method of ModelBundle class")
+        try:
+            if schema_config is not None and get_schema_hash(schema_config) != self.manifest["schema_hash"]:
+                logger.warning(f"Model bundle {os.path.basename(self.file_path)} was trained with a different schema")
+            compiled_preprocessor = self._load_compiled_preprocessor()
+            compiled_trees = self._load_compiled_trees()
+            trained_model_spec = self.manifest["trained_model"]
+            if trained_model_spec["kind"] == "xgboost":
+                missing = np.nan if trained_model_spec["missing"] is None else trained_model_spec["missing"]
+                trained_model_object = BundledBooster(self, self.manifest["model_type"], missing, trained_model_spec["best_iteration"])
+            else:
+                trained_model_object = compiled_trees
+            drift_reference = json.loads(self.read_member(DRIFT_REFERENCE_NAME)) if DRIFT_REFERENCE_NAME in self.members else None
+            logger.info("Exited load_model method of ModelBundle class")
+            return CarPriceModel(None, trained_model_object, compiled_preprocessor, compiled_trees, drift_reference,
+                                 model_type=self.manifest["model_type"])
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    @staticmethod
+    def _write_member(archive: zipfile.ZipFile, name: str, data: bytes, files: Dict[str, str]) -> None:
+        info = zipfile.ZipInfo(name, date_time=time.localtime(time.time())[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        # pad the local header with an extra field so the member data starts on an aligned offset
+        header_end = archive.fp.tell() + ZIP_LOCAL_HEADER.size + len(name.encode())
+        padding = (-(header_end + 4)) % MODEL_BUNDLE_ALIGNMENT
+        info.extra = struct.pack("<HH", ZIP_PADDING_HEADER_ID, padding) + b"\0" * padding
+        archive.writestr(info, data)
+        files[name] = hashlib.sha256(data).hexdigest()
+
+
+    @staticmethod
+    def _compact(array: np.ndarray) -> np.ndarray:
+        """Narrowest dtype that holds the array exactly: int32 node indices, float32 thresholds of XGBoost trees."""
+        array = np.asarray(array)
+        if np.issubdtype(array.dtype, np.integer) and array.dtype.itemsize > 4 and \
+                (array.size == 0 or (array.min() >= np.iinfo(np.int32).min and array.max() <= np.iinfo(np.int32).max)):
+            return array.astype(np.int32)
+        if array.dtype == np.float64 and np.array_equal(array.astype(np.float32), array, equal_nan=True):
+            return array.astype(np.float32)
+        return array
+
+
+    @classmethod
+    def _write_array(cls, archive: zipfile.ZipFile, name: str, array: np.ndarray, files: Dict[str, str],
+                        compact: bool = True) -> None:
+        buffer = io.BytesIO()
+        np.lib.format.write_array(buffer, np.ascontiguousarray(cls._compact(array) if compact else array), allow_pickle=False)
+        cls._write_member(archive, f"arrays/{name}.npy", buffer.getvalue(), files)
+
+
+    @classmethod
+    def write(cls, file_path: str, model: object, schema_config: Dict) -> str:
+        """Writes model as a bundle; raises NotImplementedError for models that cannot be stored without pickle."""
+        logger.info("Entered write method of ModelBundle class")
+        compiled_preprocessor = getattr(model, "compiled_preprocessor", None)
+        compiled_trees = getattr(model, "compiled_trees", None)
+        trained_model_object = model.trained_model_object
+        model_type = model.get_model_type()
+        if compiled_preprocessor is None:
+            raise NotImplementedError("Models without a compiled preprocessor cannot be bundled")
+        if model_type.startswith("XGB"):
+            try:
+                best_iteration = int(trained_model_object.best_iteration)
+            except AttributeError:
+                best_iteration = None
+            missing = trained_model_object.get_params().get("missing", np.nan)
+            trained_model_spec = {"kind": "xgboost", "best_iteration": best_iteration,
+                                  "missing": None if missing is None or np.isnan(missing) else float(missing)}
+        elif compiled_trees is not None:
+            trained_model_spec = {"kind": "compiled_trees"}
+        else:
+            raise NotImplementedError(f"{model_type} without compiled trees cannot be bundled")
+
+        try:
+            tmp_file_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+            files: Dict[str, str] = {}
+            with zipfile.ZipFile(tmp_file_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                category_tables = []
+                for i, (table, output) in enumerate(compiled_preprocessor.category_tables):
+                    cls._write_array(archive, f"category_table_{i}", table.table, files)
+                    category_tables.append({"column": table.column, "categories": table.categories.tolist(),
+                                            "output": [output.start, output.stop]})
+                for name in ("numeric_slice", "numeric_lower", "numeric_upper", "numeric_mean", "numeric_scale"):
+                    cls._write_array(archive, name, getattr(compiled_preprocessor, name), files)
+
+                compiled_trees_spec = None
+                if compiled_trees is not None:
+                    for key in ("feature", "threshold", "left", "right", "default_left", "value", "roots"):
+                        # leaf values stay float64, the scorer sums them in their own dtype
+                        cls._write_array(archive, f"trees_{key}", compiled_trees.trees[key], files, compact=key != "value")
+                    compiled_trees_spec = {
+                        "max_depth": int(compiled_trees.trees["max_depth"]),
+                        "offset": float(compiled_trees.offset),
+                        "scale": float(compiled_trees.scale),
+                        "inclusive_split": bool(compiled_trees.inclusive_split),
+                        "missing_value": None if np.isnan(compiled_trees.missing_value) else float(compiled_trees.missing_value),
+                        "zero_as_missing": bool(compiled_trees.zero_as_missing),
+                    }
+
+                versions = {"car_price": get_code_version(), "python": platform.python_version(), "numpy": np.__version__}
+                if trained_model_spec["kind"] == "xgboost":
+                    booster = trained_model_object.get_booster()
+                    cls._write_member(archive, BOOSTER_NAME, bytes(booster.save_raw(raw_format="ubj")), files)
+                    versions["xgboost"] = sys.modules["xgboost"].__version__
+                drift_reference = getattr(model, "drift_reference", None)
+                if drift_reference is not None:
+                    cls._write_member(archive, DRIFT_REFERENCE_NAME, json.dumps(drift_reference).encode(), files)
+
+                manifest = {
+                    "format": MODEL_BUNDLE_FORMAT,
+                    "format_version": MODEL_BUNDLE_FORMAT_VERSION,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                    "model_type": model_type,
+                    "schema_hash": get_schema_hash(schema_config),
+                    "versions": versions,
+                    "compiled_preprocessor": {
+                        "category_tables": category_tables,
+                        "numeric_columns": list(compiled_preprocessor.numeric_columns),
+                        "n_features": int(compiled_preprocessor.n_features),
+                        "sparse_output": bool(compiled_preprocessor.sparse_output),
+                    },
+                    "compiled_trees": compiled_trees_spec,
+                    "trained_model": trained_model_spec,
+                    "files": files,
+                }
+                archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2))
+            os.replace(tmp_file_path, file_path)
+            logger.info(f"Wrote {model_type} model bundle of {len(files)} members to {file_path}")
+            logger.info("Exited write method of ModelBundle class")
+            return file_path
+
+        except Exception as e:
+            raise CarException(e, sys) from e
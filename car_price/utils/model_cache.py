@@ -0,0 +1,198 @@
+import atexit
+import hashlib
+import logging
+import os
+import sys
+import threading
+import uuid
+from typing import BinaryIO, Callable, Optional, Set, Tuple
+from car_price.constant import MODEL_CACHE_DIR, MODEL_CACHE_MAX_BYTES
+from car_price.exception import CarException
+
+try:
+    import fcntl
+except ImportError:
+    # no flock on Windows, entries are still renamed into place atomically but concurrent misses download twice
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_CACHE_SUFFIX = ".model"
+MODEL_CACHE_TMP_SUFFIX = ".tmp"
+MODEL_CACHE_LOCK_FILE_NAME = ".lock"
+MODEL_CACHE_COMMIT_EXIT_TIMEOUT_SECONDS = 30
+
+_pending_commits: Set[threading.Thread] = set()
+
+
+@atexit.register
+def _wait_for_commits() -> None:
+    # commit threads are daemons, a process exiting right after a download still gets its entry in place
+    for thread in list(_pending_commits):
+        thread.join(MODEL_CACHE_COMMIT_EXIT_TIMEOUT_SECONDS)
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return -1.0
+
+
+class ModelCache:
+    """
+    Local disk cache of models downloaded from S3, keyed by bucket, key and ETag.
+
+    Entries live in <cache_dir>/<sha256 of bucket/key>/<etag>.model and hold the downloaded content
+    after decompression, so a bundle is memory-mapped straight from its entry. S3Operation revalidates
+    the most recently used entry of a key with a conditional request and only downloads a new ETag.
+    Misses of a key are serialized by an flock on the .lock file of its directory, so concurrent
+    workers wait for a single download and then open its entry; the download goes to a temporary
+    file that is synced and renamed into place in the background while the caller already reads
+    it, the lock is held until then. Hits refresh the entry mtime, and the least recently used
+    entries are evicted once the cache, downloads in progress included, holds more than max_bytes.
+    Temporary files of a key whose lock is free were left by a killed worker and are removed.
+    """
+
+    def __init__(self, cache_dir: str = MODEL_CACHE_DIR, max_bytes: int = MODEL_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+
+    def _key_dir(self, bucket_name: str, key: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(f"{bucket_name}/{key}".encode()).hexdigest()[:32])
+
+
+    def lookup(self, bucket_name: str, key: str) -> Optional[Tuple[str, str]]:
+        """ETag and path of the most recently used entry of a key, None when nothing is cached."""
+        key_dir = self._key_dir(bucket_name, key)
+        if not os.path.isdir(key_dir):
+            return None
+        entries = [os.path.join(key_dir, name) for name in os.listdir(key_dir) if name.endswith(MODEL_CACHE_SUFFIX)]
+        if not entries:
+            return None
+        entry_path = max(entries, key=_mtime)
+        return os.path.basename(entry_path)[:-len(MODEL_CACHE_SUFFIX)], entry_path
+
+
+    @staticmethod
+    def open(entry_path: str) -> Optional[BinaryIO]:
+        """Opens an entry and marks it as recently used, None when it was evicted in the meantime."""
+        try:
+            file_obj = open(entry_path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(entry_path)
+        return file_obj
+
+
+    def get_or_download(self, bucket_name: str, key: str, etag: str, download: Callable[[BinaryIO], None]) -> BinaryIO:
+        logger.info("Entered get_or_download method of ModelCache class")
+        try:
+            key_dir = self._key_dir(bucket_name, key)
+            os.makedirs(key_dir, exist_ok=True)
+            entry_path = os.path.join(key_dir, etag + MODEL_CACHE_SUFFIX)
+            lock_file = open(os.path.join(key_dir, MODEL_CACHE_LOCK_FILE_NAME), "a+b")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # opened before eviction, an open entry stays readable even once it is evicted; None when another
+                # process evicted it in the meantime, it is then downloaded again
+                file_obj = self.open(entry_path)
+                if file_obj is not None:
+                    logger.info(f"Reusing cached {key} ETag {etag} downloaded by another worker")
+                    lock_file.close()
+                    self.evict(keep=entry_path)
+                else:
+                    tmp_path = f"{entry_path}.{uuid.uuid4().hex}{MODEL_CACHE_TMP_SUFFIX}"
+                    tmp_file = open(tmp_path, "w+b")
+                    try:
+                        download(tmp_file)
+                        tmp_file.flush()
+                        # a handle of the temporary file stays readable once it is renamed into place
+                        file_obj = open(tmp_path, "rb")
+                    except BaseException:
+                        tmp_file.close()
+                        os.remove(tmp_path)
+                        raise
+                    # the fsync of a large model takes a while, the caller loads it meanwhile
+                    commit_thread = threading.Thread(target=self._commit, args=(tmp_file, tmp_path, entry_path, lock_file),
+                                                     name=f"model-cache-commit-{etag}", daemon=True)
+                    _pending_commits.add(commit_thread)
+                    commit_thread.start()
+            except BaseException:
+                lock_file.close()
+                raise
+            logger.info("Exited get_or_download method of ModelCache class")
+            return file_obj
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def _commit(self, tmp_file: BinaryIO, tmp_path: str, entry_path: str, lock_file: BinaryIO) -> None:
+        """Syncs a downloaded entry and renames it into place, then lets the workers waiting on the lock in."""
+        try:
+            with tmp_file:
+                os.fsync(tmp_file.fileno())
+            os.replace(tmp_path, entry_path)
+            logger.info(f"Cached {os.path.relpath(entry_path, self.cache_dir)}, {os.path.getsize(entry_path)} bytes")
+        except Exception as e:
+            logger.warning(f"Could not cache {os.path.relpath(entry_path, self.cache_dir)}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finally:
+            lock_file.close()
+            _pending_commits.discard(threading.current_thread())
+        self.evict(keep=entry_path)
+
+
+    @staticmethod
+    def _is_downloading(key_dir: str) -> bool:
+        """Whether a worker holds the lock of a key, only then can its temporary files still be written."""
+        if fcntl is None:
+            return True
+        try:
+            with open(os.path.join(key_dir, MODEL_CACHE_LOCK_FILE_NAME), "a+b") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return False
+        except OSError:
+            return True
+
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        entries, tmp_files = [], []
+        for root, _, names in os.walk(self.cache_dir):
+            entries += [os.path.join(root, name) for name in names if name.endswith(MODEL_CACHE_SUFFIX)]
+            root_tmp_files = [os.path.join(root, name) for name in names if name.endswith(MODEL_CACHE_TMP_SUFFIX)]
+            if root_tmp_files and not self._is_downloading(root):
+                # left behind by a worker killed mid-download
+                for tmp_path in root_tmp_files:
+                    try:
+                        os.remove(tmp_path)
+                        logger.info(f"Removed stale download {os.path.relpath(tmp_path, self.cache_dir)}")
+                    except OSError:
+                        pass
+            else:
+                tmp_files += root_tmp_files
+        entries.sort(key=_mtime, reverse=True)
+        # downloads in progress take up space too
+        total_bytes = sum(_size(tmp_path) for tmp_path in tmp_files)
+        for entry_path in entries:
+            try:
+                total_bytes += os.path.getsize(entry_path)
+            except OSError:
+                continue
+            if total_bytes > self.max_bytes and entry_path != keep:
+                try:
+                    os.remove(entry_path)
+                    logger.info(f"Evicted cached model {os.path.relpath(entry_path, self.cache_dir)}")
+                except OSError:
+                    pass
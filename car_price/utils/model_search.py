@@ -0,0 +1,173 @@
+import abc
+import logging
+import sys
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterGrid, check_cv, train_test_split
+from car_price.constant import RANDOM_STATE
+from car_price.exception import CarException
+
+logger = logging.getLogger(__name__)
+
+
+class _TreeGrowthSearchCV(abc.ABC):
+    """
+    Base for searches that treat n_estimators as something grown inside one fit rather than a grid axis.
+
+    Every other parameter is searched exhaustively with cv folds scored by r2. Once fitted the
+    object exposes the same attributes as GridSearchCV: best_estimator_, best_params_,
+    best_score_, best_index_ and cv_results_, plus n_trees_fitted_ for the whole search.
+
+    X is the transformed feature matrix, a numpy array or a scipy CSR matrix, so the folds are
+    taken with X[indices].
+    """
+
+    def __init__(self, estimator: object, param_grid: Dict, cv: int = 2, n_jobs: int = None, verbose: int = 0):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_jobs = n_jobs
+        self.verbose = verbose
+
+
+    def _split_param_grid(self) -> Tuple[List[Dict], List[int]]:
+        param_grid = dict(self.param_grid)
+        n_estimators_grid = param_grid.pop("n_estimators", [self.estimator.get_params()["n_estimators"]])
+        return list(ParameterGrid(param_grid)), sorted(n_estimators_grid)
+
+
+    @abc.abstractmethod
+    def _evaluate(self, X, y: np.ndarray, params: Dict, n_estimators_grid: List[int], train: np.ndarray, test: np.ndarray) -> Dict:
+        pass
+
+
+    @abc.abstractmethod
+    def _collect_results(self, candidates: List[Dict], n_estimators_grid: List[int],
+                            fold_results: List[List[Dict]]) -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        pass
+
+
+    def _build_cv_results(self, params: List[Dict], test_scores: np.ndarray, fit_times: np.ndarray) -> Dict:
+        mean_test_score = test_scores.mean(axis=1)
+        cv_results = {
+            "mean_fit_time": fit_times.mean(axis=1),
+            "std_fit_time": fit_times.std(axis=1),
+            "params": params,
+        }
+        for name in sorted({name for p in params for name in p}):
+            cv_results[f"param_{name}"] = np.ma.masked_array([p.get(name) for p in params],
+                                                            mask=[name not in p for p in params], dtype=object)
+        for split in range(test_scores.shape[1]):
+            cv_results[f"split{split}_test_score"] = test_scores[:, split]
+        cv_results["mean_test_score"] = mean_test_score
+        cv_results["std_test_score"] = test_scores.std(axis=1)
+        cv_results["rank_test_score"] = (len(mean_test_score) - np.argsort(np.argsort(mean_test_score))).astype(np.int32)
+        return cv_results
+
+
+    def fit(self, X, y) -> "_TreeGrowthSearchCV":
+        logger.info(f"Entered fit method of {self.__class__.__name__} class")
+        try:
+            y = np.asarray(y)
+            candidates, n_estimators_grid = self._split_param_grid()
+            splits = list(check_cv(self.cv).split(X, y))
+            evaluations = Parallel(n_jobs=self.n_jobs)(
+                delayed(self._evaluate)(X, y, params, n_estimators_grid, train, test)
+                for params in candidates for train, test in splits
+            )
+            fold_results = [evaluations[i * len(splits):(i + 1) * len(splits)] for i in range(len(candidates))]
+            self.n_trees_fitted_ = sum(result["n_trees"] for result in evaluations)
+
+            params, test_scores, fit_times = self._collect_results(candidates, n_estimators_grid, fold_results)
+            self.cv_results_ = self._build_cv_results(params, test_scores, fit_times)
+            self.best_index_ = int(np.argmax(self.cv_results_["mean_test_score"]))
+            self.best_params_ = params[self.best_index_]
+            self.best_score_ = float(self.cv_results_["mean_test_score"][self.best_index_])
+
+            start = time.perf_counter()
+            self.best_estimator_ = clone(self.estimator).set_params(**self.best_params_).fit(X, y)
+            self.refit_time_ = time.perf_counter() - start
+            self.n_trees_fitted_ += self.best_params_.get("n_estimators", 0)
+            logger.info(f"Best params {self.best_params_} with cv score {self.best_score_:.4f}, "
+                        f"{self.n_trees_fitted_} trees fitted in total")
+            logger.info(f"Exited fit method of {self.__class__.__name__} class")
+            return self
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+class WarmStartSearchCV(_TreeGrowthSearchCV):
+    """
+    Grows one warm-started forest per candidate and fold through the sorted n_estimators values,
+    scoring it at every size, so a single fit covers the whole n_estimators axis of the grid.
+    """
+
+    def _evaluate(self, X, y: np.ndarray, params: Dict, n_estimators_grid: List[int], train: np.ndarray, test: np.ndarray) -> Dict:
+        x_train, y_train = X[train], y[train]
+        x_test, y_test = X[test], y[test]
+        model = clone(self.estimator).set_params(**params, warm_start=True)
+        scores, fit_times, elapsed = [], [], 0.0
+        for n_estimators in n_estimators_grid:
+            start = time.perf_counter()
+            model.set_params(n_estimators=n_estimators).fit(x_train, y_train)
+            elapsed += time.perf_counter() - start
+            scores.append(r2_score(y_test, model.predict(x_test)))
+            fit_times.append(elapsed)
+            if self.verbose:
+                logger.info(f"{params} n_estimators={n_estimators}: score={scores[-1]:.4f} total time={elapsed:.2f}s")
+        return {"scores": scores, "fit_times": fit_times, "n_trees": n_estimators_grid[-1]}
+
+
+    def _collect_results(self, candidates: List[Dict], n_estimators_grid: List[int],
+                            fold_results: List[List[Dict]]) -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        params, test_scores, fit_times = [], [], []
+        for candidate, folds in zip(candidates, fold_results):
+            for i, n_estimators in enumerate(n_estimators_grid):
+                params.append({**candidate, "n_estimators": n_estimators})
+                test_scores.append([fold["scores"][i] for fold in folds])
+                fit_times.append([fold["fit_times"][i] for fold in folds])
+        return params, np.array(test_scores), np.array(fit_times)
+
+
+class EarlyStoppingSearchCV(_TreeGrowthSearchCV):
+    """
+    Boosts each candidate up to the largest n_estimators of the grid and stops once the score on a
+    validation split carved out of the training fold has not improved for early_stopping_rounds.
+
+    The tuned n_estimators of a candidate is the mean best iteration over its folds, and the final
+    model is refit on all the data with that number of rounds and no early stopping.
+    """
+
+    def __init__(self, estimator: object, param_grid: Dict, cv: int = 2, n_jobs: int = None, verbose: int = 0,
+                    early_stopping_rounds: int = 10, validation_fraction: float = 0.2):
+        super().__init__(estimator, param_grid, cv=cv, n_jobs=n_jobs, verbose=verbose)
+        self.early_stopping_rounds = early_stopping_rounds
+        self.validation_fraction = validation_fraction
+
+
+    def _evaluate(self, X, y: np.ndarray, params: Dict, n_estimators_grid: List[int], train: np.ndarray, test: np.ndarray) -> Dict:
+        fit_idx, val_idx = train_test_split(train, test_size=self.validation_fraction, random_state=RANDOM_STATE)
+        model = clone(self.estimator).set_params(**params, n_estimators=n_estimators_grid[-1],
+                                                 early_stopping_rounds=self.early_stopping_rounds)
+        start = time.perf_counter()
+        model.fit(X[fit_idx], y[fit_idx], eval_set=[(X[val_idx], y[val_idx])], verbose=False)
+        fit_time = time.perf_counter() - start
+        score = r2_score(y[test], model.predict(X[test]))
+        n_trees = model.get_booster().num_boosted_rounds()
+        if self.verbose:
+            logger.info(f"{params}: best iteration={model.best_iteration}, score={score:.4f} total time={fit_time:.2f}s")
+        return {"score": score, "fit_time": fit_time, "best_n_estimators": model.best_iteration + 1, "n_trees": n_trees}
+
+
+    def _collect_results(self, candidates: List[Dict], n_estimators_grid: List[int],
+                            fold_results: List[List[Dict]]) -> Tuple[List[Dict], np.ndarray, np.ndarray]:
+        params = [{**candidate, "n_estimators": int(round(np.mean([fold["best_n_estimators"] for fold in folds])))}
+                  for candidate, folds in zip(candidates, fold_results)]
+        test_scores = np.array([[fold["score"] for fold in folds] for folds in fold_results])
+        fit_times = np.array([[fold["fit_time"] for fold in folds] for folds in fold_results])
+        return params, test_scores, fit_times
@@ -0,0 +1,194 @@
+import logging
+from typing import Dict, Iterable, Union
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_VALUES = 10
+
+
+class SchemaValidator:
+    """
+    Vectorized validation of data chunks against config/schema.yaml.
+
+    Every chunk is checked for missing and unexpected columns, values that do not parse as the schema
+    dtype, nulls, values outside the [min, max] range and categories outside the domain given in the
+    validation section of the schema. Chunks are Arrow record batches or tables, straight from the
+    artifact file, or DataFrames, which are converted to Arrow first; all checks run as Arrow compute
+    kernels and only per-column counters are kept between chunks, so memory is bounded by the chunk
+    size. Null ratios are judged on the totals in get_report, every other check fails as soon as a
+    single offending value is seen.
+    """
+
+    def __init__(self, schema_config: dict):
+        validation_config = schema_config.get("validation", {})
+        column_rules = validation_config.get("columns", {})
+        default_max_null_ratio = validation_config.get("max_null_ratio", 1.0)
+        self.columns = list(schema_config["columns"])
+        self.dtypes = dict(schema_config["columns"])
+        self.max_null_ratio = {column: column_rules.get(column, {}).get("max_null_ratio", default_max_null_ratio)
+                               for column in self.columns}
+        self.bounds = {column: (column_rules[column].get("min"), column_rules[column].get("max")) for column in self.columns
+                       if "min" in column_rules.get(column, {}) or "max" in column_rules.get(column, {})}
+        self.domains = {column: pa.array(column_rules[column]["domain"], type=pa.string()) for column in self.columns
+                        if "domain" in column_rules.get(column, {})}
+
+        self.n_rows = 0
+        self.n_chunks = 0
+        self.missing_columns = set()
+        self.unexpected_columns = set()
+        self.observed_dtypes: Dict[str, str] = {}
+        self.null_count = dict.fromkeys(self.columns, 0)
+        self.invalid_count = {column: 0 for column in self.columns if self.dtypes[column] != "category"}
+        self.below_min = dict.fromkeys(self.bounds, 0)
+        self.above_max = dict.fromkeys(self.bounds, 0)
+        self.out_of_domain = dict.fromkeys(self.domains, 0)
+        self.out_of_domain_values = {column: set() for column in self.domains}
+
+
+    @staticmethod
+    def _count(mask: pa.Array) -> int:
+        return pc.sum(mask).as_py() or 0
+
+
+    def _to_numbers(self, column: str, values: pa.Array) -> pa.Array:
+        """Numeric view of a column, counting values that do not parse as the schema dtype as invalid."""
+        if pa.types.is_dictionary(values.type):
+            values = values.dictionary_decode()
+        if not (pa.types.is_integer(values.type) or pa.types.is_floating(values.type)):
+            numbers = pd.to_numeric(pd.Series(values.to_numpy(zero_copy_only=False)), errors="coerce")
+            self.invalid_count[column] += int(numbers.isna().sum()) - values.null_count
+            values = pa.array(numbers.to_numpy(dtype=np.float64), from_pandas=True)
+        if self.dtypes[column] == "int" and pa.types.is_floating(values.type):
+            self.invalid_count[column] += self._count(pc.not_equal(pc.trunc(values), values))
+        return values
+
+
+    def _check_range(self, column: str, values: pa.Array) -> None:
+        lower, upper = self.bounds[column]
+        min_max = pc.min_max(values)
+        observed_min, observed_max = min_max["min"].as_py(), min_max["max"].as_py()
+        if observed_min is None:
+            return
+        if lower is not None and observed_min < lower:
+            self.below_min[column] += self._count(pc.less(values, lower))
+        if upper is not None and observed_max > upper:
+            self.above_max[column] += self._count(pc.greater(values, upper))
+
+
+    def _check_domain(self, column: str, values: pa.Array) -> None:
+        domain = self.domains[column]
+        if pa.types.is_dictionary(values.type):
+            # only the dictionary needs checking, rows are counted only when it has values outside the domain
+            if self._count(pc.invert(pc.is_in(values.dictionary.cast(pa.string()), value_set=domain))) == 0:
+                return
+            values = values.dictionary_decode()
+        values = values.cast(pa.string())
+        in_domain = pc.is_in(values, value_set=domain)
+        n_out = len(values) - values.null_count - self._count(in_domain)
+        if n_out:
+            self.out_of_domain[column] += n_out
+            if len(self.out_of_domain_values[column]) < MAX_REPORTED_VALUES:
+                bad_values = pc.unique(pc.filter(values, pc.and_(pc.invert(in_domain), pc.is_valid(values))))
+                self.out_of_domain_values[column].update(bad_values.to_pylist()[:MAX_REPORTED_VALUES])
+
+
+    @staticmethod
+    def _dataframe_to_arrow(df: DataFrame) -> pa.Table:
+        arrays = {}
+        for column in df.columns:
+            try:
+                arrays[str(column)] = pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # mixed object columns, keep them as strings and let the dtype check count what does not parse
+                arrays[str(column)] = pa.array(df[column].where(df[column].isna(), df[column].astype(str)), from_pandas=True)
+        return pa.table(arrays)
+
+
+    def update(self, chunk: Union[pa.RecordBatch, pa.Table, DataFrame]) -> "SchemaValidator":
+        if isinstance(chunk, DataFrame):
+            chunk = self._dataframe_to_arrow(chunk)
+        names = set(chunk.schema.names)
+        self.missing_columns.update(set(self.columns) - names)
+        self.unexpected_columns.update(names - set(self.columns))
+        self.n_rows += chunk.num_rows
+        self.n_chunks += 1
+        for column in self.columns:
+            if column not in names:
+                continue
+            values = chunk.column(column)
+            if isinstance(values, pa.ChunkedArray):
+                values = values.combine_chunks()
+            self.observed_dtypes.setdefault(column, str(values.type))
+            self.null_count[column] += values.null_count
+            if column in self.invalid_count:
+                values = self._to_numbers(column, values)
+            if column in self.bounds:
+                self._check_range(column, values)
+            if column in self.domains:
+                self._check_domain(column, values)
+        return self
+
+
+    def has_failed(self) -> bool:
+        """True once a check has failed that no further chunk can make pass again."""
+        return bool(self.missing_columns or self.unexpected_columns or any(self.invalid_count.values())
+                    or any(self.below_min.values()) or any(self.above_max.values()) or any(self.out_of_domain.values()))
+
+
+    def validate_chunks(self, chunks: Iterable[Union[pa.RecordBatch, pa.Table, DataFrame]], fail_fast: bool = True) -> Dict:
+        for chunk in chunks:
+            self.update(chunk)
+            if fail_fast and self.has_failed():
+                logger.info(f"Schema validation failed after {self.n_chunks} chunks ({self.n_rows} rows), stopping early")
+                break
+        return self.get_report()
+
+
+    def get_report(self) -> Dict:
+        columns, errors = {}, []
+        for column in self.columns:
+            if column in self.missing_columns:
+                errors.append(f"{column}: missing")
+                continue
+            null_ratio = self.null_count[column] / self.n_rows if self.n_rows else 0.0
+            report = {
+                "expected_dtype": self.dtypes[column],
+                "observed_dtype": self.observed_dtypes.get(column),
+                "null_count": self.null_count[column],
+                "null_ratio": null_ratio,
+            }
+            column_errors = []
+            if null_ratio > self.max_null_ratio[column]:
+                column_errors.append(f"null ratio {null_ratio:.4f} above {self.max_null_ratio[column]}")
+            if column in self.invalid_count:
+                report["invalid_count"] = self.invalid_count[column]
+                if self.invalid_count[column]:
+                    column_errors.append(f"{self.invalid_count[column]} values are not valid {self.dtypes[column]}")
+            if column in self.bounds:
+                report["below_min"] = self.below_min[column]
+                report["above_max"] = self.above_max[column]
+                if self.below_min[column] or self.above_max[column]:
+                    column_errors.append(f"{self.below_min[column]} values below min and {self.above_max[column]} above max")
+            if column in self.domains:
+                report["out_of_domain"] = self.out_of_domain[column]
+                if self.out_of_domain[column]:
+                    report["out_of_domain_values"] = sorted(self.out_of_domain_values[column])
+                    column_errors.append(f"{self.out_of_domain[column]} values outside the domain")
+            report["errors"] = column_errors
+            errors.extend(f"{column}: {error}" for error in column_errors)
+            columns[column] = report
+        errors.extend(f"{column}: not in schema" for column in sorted(self.unexpected_columns))
+        return {
+            "validation_status": not errors,
+            "n_rows": self.n_rows,
+            "n_chunks": self.n_chunks,
+            "missing_columns": sorted(self.missing_columns),
+            "unexpected_columns": sorted(self.unexpected_columns),
+            "errors": errors,
+            "columns": columns,
+        }
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import uuid
+from dataclasses import fields
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Type
+import yaml
+from car_price.constant import STAGE_CACHE_DIR, STAGE_CACHE_MAX_ENTRIES, STAGE_CACHE_MANIFEST_FILE_NAME
+from car_price.exception import CarException
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def get_path_digest(path: str) -> str:
+    """sha256 of a file, or of every file under a directory together with its relative path."""
+    digest = hashlib.sha256()
+    if os.path.isdir(path):
+        file_paths = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+    else:
+        file_paths = [path]
+    for file_path in file_paths:
+        digest.update(os.path.relpath(file_path, path).encode())
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def get_code_version() -> str:
+    """sha256 of the car_price sources, so any code change invalidates every cached stage."""
+    digest = hashlib.sha256()
+    for root, dirs, names in sorted(os.walk(PACKAGE_DIR)):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for name in sorted(names):
+            if name.endswith(".py"):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, PACKAGE_DIR).encode())
+                with open(file_path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage artifacts.
+
+    A stage's key hashes everything its output depends on: input file digests, the config it reads,
+    the keys of upstream stages and the code version. On a miss the stage runs as usual and the
+    files its artifact points to are copied (not linked, a later run may rewrite its own files in place)
+    into <cache_dir>/<stage>/<key>, next to a manifest of the artifact fields. On a hit the artifact is
+    rebuilt from the manifest with paths into the cache entry. Only the newest max_entries entries per
+    stage are kept.
+    """
+
+    def __init__(self, cache_dir: str = STAGE_CACHE_DIR, max_entries: int = STAGE_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+
+    @staticmethod
+    def make_key(stage: str, file_paths: Iterable[str] = (), configs: Iterable[Dict] = (),
+                    parent_keys: Iterable[str] = ()) -> str:
+        digest = hashlib.sha256(stage.encode())
+        for file_path in file_paths:
+            digest.update(get_path_digest(file_path).encode())
+        for config in configs:
+            digest.update(json.dumps(config, sort_keys=True, default=str).encode())
+        for parent_key in parent_keys:
+            digest.update(parent_key.encode())
+        digest.update(get_code_version().encode())
+        return digest.hexdigest()
+
+
+    def _entry_dir(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, stage, key)
+
+
+    def load(self, stage: str, key: str, artifact_cls: Type) -> Optional[object]:
+        logger.info("Entered load method of StageCache class")
+        try:
+            entry_dir = self._entry_dir(stage, key)
+            manifest_file_path = os.path.join(entry_dir, STAGE_CACHE_MANIFEST_FILE_NAME)
+            if not os.path.exists(manifest_file_path):
+                logger.info(f"No cached {stage} artifacts for key {key[:12]}")
+                return None
+            with open(manifest_file_path) as manifest_file:
+                manifest = yaml.safe_load(manifest_file)
+            values = dict(manifest["fields"])
+            for name in manifest["files"]:
+                values[name] = os.path.join(entry_dir, values[name])
+            os.utime(entry_dir)
+            logger.info(f"Reusing cached {stage} artifacts for key {key[:12]}")
+            logger.info("Exited load method of StageCache class")
+            return artifact_cls(**values)
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def save(self, stage: str, key: str, artifact: object) -> None:
+        logger.info("Entered save method of StageCache class")
+        try:
+            entry_dir = self._entry_dir(stage, key)
+            tmp_dir = f"{entry_dir}.{uuid.uuid4().hex}.tmp"
+            os.makedirs(tmp_dir)
+            manifest = {"fields": {}, "files": []}
+            for field in fields(artifact):
+                value = getattr(artifact, field.name)
+                if isinstance(value, str) and os.path.exists(value):
+                    relative_path = os.path.join(field.name, os.path.basename(value))
+                    if os.path.isdir(value):
+                        shutil.copytree(value, os.path.join(tmp_dir, relative_path))
+                    else:
+                        os.makedirs(os.path.join(tmp_dir, field.name))
+                        shutil.copy2(value, os.path.join(tmp_dir, relative_path))
+                    manifest["fields"][field.name] = relative_path
+                    manifest["files"].append(field.name)
+                else:
+                    manifest["fields"][field.name] = value
+            with open(os.path.join(tmp_dir, STAGE_CACHE_MANIFEST_FILE_NAME), "w") as manifest_file:
+                yaml.safe_dump(manifest, manifest_file)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            os.replace(tmp_dir, entry_dir)
+            logger.info(f"Cached {stage} artifacts under key {key[:12]}")
+            self.evict(stage)
+            logger.info("Exited save method of StageCache class")
+
+        except Exception as e:
+            raise CarException(e, sys) from e
+
+
+    def evict(self, stage: str) -> None:
+        stage_dir = os.path.join(self.cache_dir, stage)
+        entries = [os.path.join(stage_dir, name) for name in os.listdir(stage_dir) if not name.endswith(".tmp")]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for entry in entries[self.max_entries:]:
+            shutil.rmtree(entry, ignore_errors=True)
+            logger.info(f"Evicted cached {stage} artifacts {os.path.basename(entry)[:12]}")
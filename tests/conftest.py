@@ -0,0 +1,4 @@
+import os
+
+# car_price.constant reads the connection string at import time, the tests never connect
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
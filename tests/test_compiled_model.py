@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+from typing import Tuple
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from sklearn.ensemble import RandomForestRegressor
+from xgboost import XGBRegressor
+from car_price.components.compiled_model import CompiledPreprocessor, CompiledTreeEnsemble, check_parity
+from car_price.components.data_transformation import DataTransformation
+from car_price.components.model_trainer import CarPriceModel
+from car_price.constant import COMPILED_MODEL_PARITY_RTOL, COMPILED_TREES_MAX_ROWS, SCHEMA_FILE_PATH
+
+CARS = ["Maruti Alto", "Hyundai i20", "Honda City", "BMW 5", "Audi A4", "Tata Nexon", "Kia Seltos"]
+CONTINUOUS_COLUMNS = ["km_driven", "mileage", "engine", "max_power"]
+
+
+def make_frame(n_rows: int, seed: int) -> Tuple[pd.DataFrame, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "car_name": rng.choice(CARS, n_rows),
+        "vehicle_age": rng.integers(0, 20, n_rows),
+        "km_driven": rng.integers(100, 200000, n_rows),
+        "seller_type": rng.choice(["Dealer", "Individual", "Trustmark Dealer"], n_rows),
+        "fuel_type": rng.choice(["Petrol", "Diesel", "CNG"], n_rows),
+        "transmission_type": rng.choice(["Manual", "Automatic"], n_rows),
+        "mileage": rng.uniform(8, 30, n_rows).round(2),
+        "engine": rng.integers(800, 3000, n_rows),
+        "max_power": rng.uniform(40, 300, n_rows).round(1),
+        "seats": rng.choice([4, 5, 7], n_rows),
+    })
+    # a few extreme values so the outlier capping limits are exercised
+    df.loc[:4, "km_driven"] = 3000000
+    selling_price = 500000 + df.max_power * 3000 - df.vehicle_age * 20000 - df.km_driven * 0.5
+    return df, (selling_price + rng.normal(0, 50000, n_rows)).to_numpy()
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    with open(SCHEMA_FILE_PATH, "rb") as yaml_file:
+        return yaml.safe_load(yaml_file)
+
+
+@pytest.fixture(scope="module")
+def train_frame():
+    return make_frame(400, seed=0)
+
+
+@pytest.fixture(scope="module")
+def preprocessor(schema_config, train_frame):
+    # the ColumnTransformer the training pipeline builds, without loading the ingestion artifacts
+    data_transformation = DataTransformation.__new__(DataTransformation)
+    data_transformation.data_transformation_config = SimpleNamespace(SCHEMA_CONFIG=schema_config)
+    preprocessor = data_transformation.get_data_transformer_object(CONTINUOUS_COLUMNS)
+    preprocessor.fit(train_frame[0])
+    return preprocessor
+
+
+@pytest.fixture(scope="module", params=["XGBRegressor", "RandomForestRegressor"])
+def trained_model(request, preprocessor, train_frame):
+    if request.param == "XGBRegressor":
+        model = XGBRegressor(n_estimators=30, max_depth=4, random_state=42)
+    else:
+        model = RandomForestRegressor(n_estimators=10, max_depth=8, random_state=42)
+    return model.fit(preprocessor.transform(train_frame[0]), train_frame[1])
+
+
+def with_unseen_values(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["car_name"] = df["car_name"].astype(object)
+    df["fuel_type"] = df["fuel_type"].astype(object)
+    df.loc[0, "car_name"] = "Unknown Car"
+    df.loc[1, "fuel_type"] = "Electric"
+    df.loc[2, "car_name"] = np.nan
+    df.loc[3, "seller_type"] = np.nan
+    return df
+
+
+def test_compiled_preprocessor_matches_fitted(preprocessor):
+    compiled_preprocessor = CompiledPreprocessor.from_fitted(preprocessor)
+    test_df, _ = make_frame(200, seed=1)
+    assert check_parity(preprocessor.transform(test_df), compiled_preprocessor.transform(test_df),
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+
+
+def test_compiled_preprocessor_matches_fitted_on_categorical_dtype(preprocessor):
+    compiled_preprocessor = CompiledPreprocessor.from_fitted(preprocessor)
+    test_df, _ = make_frame(200, seed=2)
+    categorical_df = test_df.astype({column: "category" for column in ["car_name", "seller_type", "fuel_type", "transmission_type"]})
+    assert check_parity(preprocessor.transform(test_df), compiled_preprocessor.transform(categorical_df),
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+
+
+def test_compiled_preprocessor_encodes_unknown_and_missing_categories(preprocessor):
+    compiled_preprocessor = CompiledPreprocessor.from_fitted(preprocessor)
+    test_df = with_unseen_values(make_frame(20, seed=3)[0])
+    assert check_parity(preprocessor.transform(test_df), compiled_preprocessor.transform(test_df),
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+    unknown_counts = compiled_preprocessor.get_unknown_counts()
+    assert unknown_counts["car_name"] == 1
+    assert unknown_counts["fuel_type"] == 1
+    assert unknown_counts["seller_type"] == 0
+
+
+def test_compiled_preprocessor_encodes_missing_values_of_string_dtype(preprocessor):
+    compiled_preprocessor = CompiledPreprocessor.from_fitted(preprocessor)
+    test_df = with_unseen_values(make_frame(20, seed=7)[0])
+    string_df = test_df.astype({column: "string" for column in ["car_name", "seller_type", "fuel_type", "transmission_type"]})
+    assert string_df["car_name"].iloc[2] is pd.NA
+    assert check_parity(preprocessor.transform(test_df), compiled_preprocessor.transform(string_df),
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+
+
+def test_compiled_trees_match_trained_model(trained_model, preprocessor):
+    compiled_trees = CompiledTreeEnsemble.from_fitted(trained_model)
+    features = preprocessor.transform(with_unseen_values(make_frame(300, seed=4)[0]))
+    assert check_parity(trained_model.predict(features), compiled_trees.predict(features),
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+
+
+def test_compiled_trees_match_trained_model_on_missing_features(trained_model, preprocessor):
+    compiled_trees = CompiledTreeEnsemble.from_fitted(trained_model)
+    features = np.array(preprocessor.transform(make_frame(100, seed=5)[0]), dtype=np.float64)
+    features[::7, 0] = np.nan
+    features[::5, -1] = np.nan
+    assert check_parity(trained_model.predict(features), compiled_trees.predict(features),
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+
+
+@pytest.mark.parametrize("n_rows", [1, COMPILED_TREES_MAX_ROWS, COMPILED_TREES_MAX_ROWS + 1, 500])
+def test_car_price_model_switches_to_trained_model_above_max_rows(trained_model, preprocessor, n_rows, monkeypatch):
+    compiled_trees = CompiledTreeEnsemble.from_fitted(trained_model)
+    car_price_model = CarPriceModel(preprocessor, trained_model, compiled_preprocessor=CompiledPreprocessor.from_fitted(preprocessor),
+                                    compiled_trees=compiled_trees)
+    compiled_calls = []
+    compiled_predict = compiled_trees.predict
+    monkeypatch.setattr(compiled_trees, "predict", lambda features: compiled_calls.append(len(features)) or compiled_predict(features))
+    test_df = with_unseen_values(make_frame(max(n_rows, 4), seed=6)[0]).iloc[:n_rows]
+
+    predictions = car_price_model.predict(test_df)
+
+    assert compiled_calls == ([n_rows] if n_rows <= COMPILED_TREES_MAX_ROWS else [])
+    assert check_parity(trained_model.predict(preprocessor.transform(test_df)), predictions,
+                        COMPILED_MODEL_PARITY_RTOL) <= COMPILED_MODEL_PARITY_RTOL
+
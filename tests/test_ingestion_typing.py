@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from car_price.configuration.mongo_operations import MongoDBOperation
+from car_price.utils.main_utils import DataFrameArtifactWriter, MainUtils
+
+DOCUMENT = {"car_name": "Honda City", "vehicle_age": 3, "km_driven": 41000, "seller_type": "Dealer", "fuel_type": "Petrol",
+            "transmission_type": "Manual", "mileage": 18.5, "engine": 1197, "max_power": 88.5, "seats": 5,
+            "selling_price": 550000}
+
+
+@pytest.fixture(scope="module")
+def schema_config():
+    return MainUtils().read_schema_file_path()
+
+
+def build_chunk(documents, schema_config):
+    dtypes = MainUtils().get_schema_dtypes(schema_config)
+    return MongoDBOperation.build_typed_chunk({column: [document.get(column) for document in documents] for column in dtypes}, dtypes)
+
+
+def test_build_typed_chunk_coerces_non_numeric_values(schema_config):
+    chunk = build_chunk([DOCUMENT, {**DOCUMENT, "engine": "n/a", "mileage": None}], schema_config)
+    assert chunk["engine"].isna().tolist() == [False, True]
+    assert chunk["mileage"].isna().tolist() == [False, True]
+    assert chunk["km_driven"].dtype == np.int64
+
+
+@pytest.mark.parametrize("file_name", ["train.parquet", "train.feather"])
+def test_writer_types_chunks_from_the_schema(tmp_path, schema_config, file_name):
+    chunks = [build_chunk([DOCUMENT, DOCUMENT], schema_config),
+              build_chunk([DOCUMENT, {**DOCUMENT, "seats": None, "car_name": 7}], schema_config)]
+    with DataFrameArtifactWriter(str(tmp_path / file_name), schema_config) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+
+    df = MainUtils().load_dataframe(str(tmp_path / file_name), schema_config)
+
+    assert len(df) == 4
+    assert df["seats"].isna().tolist() == [False, False, False, True]
+    assert df["car_name"].astype(str).tolist() == ["Honda City", "Honda City", "Honda City", "7"]